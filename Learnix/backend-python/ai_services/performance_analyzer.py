@@ -1,8 +1,12 @@
 from google.cloud import firestore
+from analytics.performance_aggregates import PerformanceAggregates
+from data_access.repository import Repository
+from data_access.write_behind import record_attempt
 
 class PerformanceAnalyzer:
     def __init__(self):
-        self.db = firestore.Client()
+        self.repository = Repository()
+        self.aggregates = PerformanceAggregates(self.repository)
 
     def record_quiz_attempt(self, user_id, quiz_id, score, total_questions, attempt_time):
         attempt_data = {
@@ -13,22 +17,13 @@ class PerformanceAnalyzer:
             'attempt_time': attempt_time,
             'timestamp': firestore.SERVER_TIMESTAMP
         }
-        self.db.collection('quiz_attempts').add(attempt_data)
+        record_attempt(self.aggregates, attempt_data)
 
     def analyze_performance(self, user_id):
-        attempts_ref = self.db.collection('quiz_attempts').where('user_id', '==', user_id)
-        attempts = attempts_ref.stream()
-
-        total_score = 0
-        total_attempts = 0
-        for attempt in attempts:
-            total_score += attempt.to_dict()['score']
-            total_attempts += 1
-
-        average_score = total_score / total_attempts if total_attempts > 0 else 0
+        performance_data = self.aggregates.get(user_id)
         return {
-            'average_score': average_score,
-            'total_attempts': total_attempts
+            'average_score': performance_data['average_score'],
+            'total_attempts': performance_data['total_attempts']
         }
 
     def generate_report(self, user_id):
@@ -1,9 +1,13 @@
 from google.cloud import firestore
+from analytics.performance_aggregates import PerformanceAggregates
+from data_access.repository import Repository
+from data_access.write_behind import record_attempt
 import random
 
 class QuizGenerator:
     def __init__(self):
-        self.db = firestore.Client()
+        self.repository = Repository()
+        self.aggregates = PerformanceAggregates(self.repository)
 
     def generate_quiz(self, user_id, topic, difficulty_level):
         questions = self.fetch_questions(topic, difficulty_level)
@@ -18,13 +22,13 @@ class QuizGenerator:
         return quiz
 
     def fetch_questions(self, topic, difficulty_level):
-        questions_ref = self.db.collection('questions')
+        questions_ref = self.repository.questions()
         query = questions_ref.where('topic', '==', topic).where('difficulty', '==', difficulty_level)
         questions = query.stream()
         return [question.to_dict() for question in questions]
 
     def save_quiz_to_db(self, quiz):
-        quizzes_ref = self.db.collection('quizzes')
+        quizzes_ref = self.repository.quizzes()
         quizzes_ref.add(quiz)
 
     def record_attempt(self, user_id, quiz_id, answers):
@@ -35,8 +39,7 @@ class QuizGenerator:
             'score': self.calculate_score(answers, quiz_id),
             'timestamp': firestore.SERVER_TIMESTAMP
         }
-        attempts_ref = self.db.collection('quiz_attempts')
-        attempts_ref.add(attempt)
+        record_attempt(self.aggregates, attempt)
 
     def calculate_score(self, answers, quiz_id):
         correct_answers = self.get_correct_answers(quiz_id)
@@ -44,29 +47,17 @@ class QuizGenerator:
         return score
 
     def get_correct_answers(self, quiz_id):
-        quiz_ref = self.db.collection('quizzes').document(quiz_id)
+        quiz_ref = self.repository.quizzes().document(quiz_id)
         quiz = quiz_ref.get()
         return [question['correct_answer'] for question in quiz.to_dict()['questions']]
 
     def analyze_performance(self, user_id):
-        attempts_ref = self.db.collection('quiz_attempts').where('user_id', '==', user_id)
-        attempts = attempts_ref.stream()
+        aggregate = self.aggregates.get(user_id)
         performance_data = {
-            'total_attempts': 0,
-            'average_score': 0,
-            'highest_score': 0
+            'total_attempts': aggregate['total_attempts'],
+            'average_score': aggregate['average_score'],
+            'highest_score': aggregate['highest_score']
         }
-        scores = []
-
-        for attempt in attempts:
-            data = attempt.to_dict()
-            performance_data['total_attempts'] += 1
-            scores.append(data['score'])
-            performance_data['highest_score'] = max(performance_data['highest_score'], data['score'])
-
-        if scores:
-            performance_data['average_score'] = sum(scores) / len(scores)
-
         return performance_data
 
     def generate_adaptive_quiz(self, user_id):
@@ -97,6 +88,6 @@ class QuizGenerator:
             'performance_data': performance_data,
             'timestamp': firestore.SERVER_TIMESTAMP
         }
-        reports_ref = self.db.collection('reports')
+        reports_ref = self.repository.reports()
         reports_ref.add(report)
         return report
\ No newline at end of file
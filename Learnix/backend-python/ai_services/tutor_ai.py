@@ -1,11 +1,18 @@
 from flask import Blueprint, request, jsonify
 from google.cloud import firestore
-from your_project_name.ai_services.performance_analyzer import analyze_performance
-from your_project_name.ai_services.quiz_generator import generate_quiz
-from your_project_name.models.analytics_models import LearningAnalytics
+from ai_services.performance_analyzer import PerformanceAnalyzer
+from ai_services.quiz_generator import QuizGenerator
+from data_access.repository import Repository
 
 tutor_ai = Blueprint('tutor_ai', __name__)
-db = firestore.Client()
+repository = Repository()
+performance_analyzer = PerformanceAnalyzer()
+quiz_generator = QuizGenerator()
+
+
+class TutorAI:
+    def generate_response(self, user_input):
+        return generate_ai_response(user_input)
 
 @tutor_ai.route('/tutor/conversation', methods=['POST'])
 def ai_tutor_conversation():
@@ -21,7 +28,7 @@ def ai_tutor_conversation():
         'input': user_input,
         'response': response
     }
-    db.collection('tutor_conversations').add(conversation_data)
+    repository.tutor_conversations().add(conversation_data)
     
     return jsonify({'response': response})
 
@@ -29,11 +36,8 @@ def ai_tutor_conversation():
 def performance_analysis():
     user_id = request.args.get('user_id')
     
-    # Fetch user performance data
-    performance_data = db.collection('user_performance').document(user_id).get().to_dict()
-    
-    # Analyze performance
-    analysis = analyze_performance(performance_data)
+    # Analyze performance (a single read of the user's performance aggregate)
+    analysis = performance_analyzer.analyze_performance(user_id)
     
     return jsonify(analysis)
 
@@ -42,10 +46,10 @@ def adaptive_quiz_generation():
     user_id = request.json.get('user_id')
     
     # Generate adaptive quiz based on user performance
-    quiz = generate_quiz(user_id)
+    quiz = quiz_generator.generate_adaptive_quiz(user_id)
     
-    # Store quiz attempt in Firestore
-    db.collection('quiz_attempts').add({
+    # Record that the quiz was issued; it only becomes an attempt, with a score, once answered
+    repository.adaptive_quizzes().add({
         'user_id': user_id,
         'quiz_id': quiz['id'],
         'timestamp': firestore.SERVER_TIMESTAMP
@@ -58,7 +62,7 @@ def get_learning_analytics():
     user_id = request.args.get('user_id')
     
     # Fetch learning analytics data
-    analytics_data = db.collection('learning_analytics').document(user_id).get().to_dict()
+    analytics_data = repository.learning_analytics().document(user_id).get().to_dict()
     
     return jsonify(analytics_data)
 
@@ -0,0 +1,116 @@
+import threading
+import time
+
+
+class _Load:
+    # One backend fetch in flight; concurrent misses for the same key wait on it
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class UserAnalyticsCache:
+    """Read-through cache of per-user analytics, each entry kept for ttl seconds.
+
+    get(kind, user_id, load) returns the cached value or calls load() once,
+    however many requests miss on the same key at the same time.
+    invalidate(user_ids) drops a user's entries; it is called when that
+    user's new attempts reach the database, and a load that was running
+    across an invalidation is returned but not cached. Invalidation is
+    per process: other processes see a new attempt once their entry's
+    TTL runs out.
+    """
+
+    def __init__(self, ttl=30.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (kind, user_id) -> (value, expires_at)
+        self._entries = {}
+        self._loads = {}
+        # user_id -> number of invalidations while a load of theirs was running, to spot loads that raced one
+        self._versions = {}
+        self._kinds = set()
+        self.counters = {'hits': 0, 'misses': 0, 'stale': 0, 'coalesced': 0, 'invalidations': 0, 'evictions': 0}
+
+    def get(self, kind, user_id, load):
+        key = (kind, str(user_id))
+        leader = False
+        with self._lock:
+            self._kinds.add(kind)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self.counters['hits'] += 1
+                    return entry[0]
+                # Expired: counted as stale, then reloaded like a miss
+                self.counters['stale'] += 1
+                del self._entries[key]
+            else:
+                self.counters['misses'] += 1
+            pending = self._loads.get(key)
+            if pending is not None:
+                self.counters['coalesced'] += 1
+            else:
+                pending = self._loads[key] = _Load()
+                version = self._versions.get(key[1], 0)
+                leader = True
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = load()
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._loads[key]
+                if pending.error is None and self._versions.get(key[1], 0) == version:
+                    if len(self._entries) >= self.max_entries:
+                        self._evict()
+                    self._entries[key] = (pending.value, time.monotonic() + self.ttl)
+                if not self._loading(key[1]):
+                    self._versions.pop(key[1], None)
+            pending.done.set()
+        return pending.value
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                user_id = str(user_id)
+                # A version only matters to loads still running; without one nothing needs tracking
+                if self._loading(user_id):
+                    self._versions[user_id] = self._versions.get(user_id, 0) + 1
+                for kind in self._kinds:
+                    self._entries.pop((kind, user_id), None)
+                self.counters['invalidations'] += 1
+
+    def _loading(self, user_id):
+        return any(key[1] == user_id for key in self._loads)
+
+    def _evict(self):
+        # Expired entries first, then the ones closest to expiring
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+        if not expired:
+            expired = sorted(self._entries, key=lambda key: self._entries[key][1])[:max(1, len(self._entries) // 10)]
+        for key in expired:
+            del self._entries[key]
+        self.counters['evictions'] += len(expired)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses'] + self.counters['stale']
+            return {
+                'entries': len(self._entries),
+                'ttl_seconds': self.ttl,
+                'hit_rate': self.counters['hits'] / lookups if lookups else None,
+                'miss_rate': self.counters['misses'] / lookups if lookups else None,
+                'stale_rate': self.counters['stale'] / lookups if lookups else None,
+                **self.counters
+            }
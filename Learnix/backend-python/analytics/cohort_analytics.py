@@ -0,0 +1,243 @@
+import argparse
+import math
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from data_access.repository import Repository
+
+PERCENTILES = (0.25, 0.5, 0.9)
+ATTEMPT_FIELDS = ['user_id', 'quiz_id', 'score', 'timestamp']
+TABLES = ('users', 'quizzes', 'topics', 'days')
+
+# Firestore's limit on writes in one batch
+MAX_BATCH_WRITES = 500
+
+
+def attempts_frame(user_ids, quiz_ids, scores, timestamps, topics=None):
+    """Attempts in columnar form: categorical user_id/quiz_id/topic, float score, UTC timestamp"""
+    frame = pd.DataFrame({
+        'user_id': pd.Categorical(user_ids),
+        'quiz_id': pd.Categorical(quiz_ids),
+        'score': pd.to_numeric(pd.Series(scores, dtype=object), errors='coerce').astype('float64'),
+        'timestamp': pd.to_datetime(pd.Series(timestamps, dtype=object), utc=True, errors='coerce')
+    })
+    # One topic lookup per distinct quiz, then spread over the rows by category code
+    quiz_topics = pd.Categorical([(topics or {}).get(quiz_id) or 'unknown' for quiz_id in frame['quiz_id'].cat.categories])
+    quiz_codes = frame['quiz_id'].cat.codes.to_numpy()
+    topic_codes = np.where(quiz_codes >= 0, quiz_topics.codes[np.maximum(quiz_codes, 0)], -1) if len(quiz_topics) else quiz_codes
+    frame['topic'] = pd.Categorical.from_codes(topic_codes, quiz_topics.categories if len(quiz_topics) else ['unknown'])
+    return frame
+
+
+def load_attempts(repository):
+    """Every quiz attempt, read in one pass over the collection with only the fields analytics needs"""
+    topics = {quiz.id: (quiz.to_dict() or {}).get('topic') for quiz in repository.quizzes().select(['topic']).stream()}
+    user_ids, quiz_ids, scores, timestamps = [], [], [], []
+    for attempt in repository.quiz_attempts().select(ATTEMPT_FIELDS).stream():
+        data = attempt.to_dict()
+        user_ids.append(data.get('user_id'))
+        quiz_ids.append(data.get('quiz_id'))
+        scores.append(data.get('score'))
+        timestamps.append(data.get('timestamp'))
+    return attempts_frame(user_ids, quiz_ids, scores, timestamps, topics)
+
+
+def _group_stats(codes, group_count, scores, days):
+    """Score statistics for every group code in [0, group_count), computed with bincounts and one sort.
+
+    Rows with a negative code or a missing score are left out; the trend
+    (least-squares slope of score against time, per day) only uses rows
+    with a timestamp.
+    """
+    keep = (codes >= 0) & ~np.isnan(scores)
+    codes, scores, days = codes[keep], scores[keep], days[keep]
+    if not len(scores):
+        columns = ['attempts', 'mean', 'std', 'min', 'max'] + [f'p{int(q * 100)}' for q in PERCENTILES] + ['trend_per_day', 'first_day', 'last_day']
+        return pd.DataFrame({column: np.zeros(group_count, 'int64') if column == 'attempts' else np.full(group_count, np.nan)
+                             for column in columns})
+
+    counts = np.bincount(codes, minlength=group_count).astype('float64')
+    sums = np.bincount(codes, weights=scores, minlength=group_count)
+    sums_sq = np.bincount(codes, weights=scores * scores, minlength=group_count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+        variances = (sums_sq - sums * means) / (counts - 1)
+    stats = {
+        'attempts': counts.astype('int64'),
+        'mean': means,
+        'std': np.sqrt(np.maximum(variances, 0)),
+    }
+
+    # Sorted by group, then score: each group's scores are one contiguous, ordered run
+    order = np.lexsort((scores, codes))
+    sorted_scores = scores[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype('int64')
+    present = counts > 0
+    # Empty groups point at a valid index; their values are masked out
+    last_index = len(sorted_scores) - 1
+    stats['min'] = np.where(present, sorted_scores[np.minimum(starts, last_index)], np.nan)
+    stats['max'] = np.where(present, sorted_scores[np.clip(starts + counts.astype('int64') - 1, 0, last_index)], np.nan)
+    for q in PERCENTILES:
+        # Linear interpolation between closest ranks, as pandas' quantile does
+        position = starts + q * np.maximum(counts - 1, 0)
+        lower = np.minimum(np.floor(position).astype('int64'), last_index)
+        upper = np.minimum(np.ceil(position).astype('int64'), last_index)
+        values = sorted_scores[lower] + (sorted_scores[upper] - sorted_scores[lower]) * (position - np.floor(position))
+        stats[f'p{int(q * 100)}'] = np.where(present, values, np.nan)
+
+    timed = ~np.isnan(days)
+    timed_codes, timed_days, timed_scores = codes[timed], days[timed], scores[timed]
+    n = np.bincount(timed_codes, minlength=group_count).astype('float64')
+    sum_t = np.bincount(timed_codes, weights=timed_days, minlength=group_count)
+    sum_tt = np.bincount(timed_codes, weights=timed_days * timed_days, minlength=group_count)
+    sum_s = np.bincount(timed_codes, weights=timed_scores, minlength=group_count)
+    sum_ts = np.bincount(timed_codes, weights=timed_days * timed_scores, minlength=group_count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        spread = sum_tt - sum_t * sum_t / n
+        stats['trend_per_day'] = np.where(spread > 1e-9, (sum_ts - sum_t * sum_s / n) / spread, np.nan)
+
+    first_last = pd.Series(timed_days).groupby(timed_codes).agg(['min', 'max']).reindex(range(group_count))
+    stats['first_day'] = first_last['min'].to_numpy()
+    stats['last_day'] = first_last['max'].to_numpy()
+    return pd.DataFrame(stats)
+
+
+def _distinct_per_group(codes, other_codes, group_count, other_count):
+    # Distinct (group, other) pairs, counted per group
+    valid = (codes >= 0) & (other_codes >= 0)
+    pairs = np.unique(codes[valid].astype('int64') * other_count + other_codes[valid])
+    return np.bincount(pairs // other_count, minlength=group_count) if other_count else np.zeros(group_count, 'int64')
+
+
+def compute_cohort_stats(frame):
+    """Per-user, per-quiz, per-topic and per-day score statistics over every attempt.
+
+    Each table is indexed by its key and holds attempt count, mean,
+    standard deviation, min, max, 25th/50th/90th percentiles and the
+    score trend in points per day; per-quiz, per-topic and per-day tables
+    also count distinct users. Times are days since the Unix epoch.
+    """
+    scores = frame['score'].to_numpy(dtype='float64')
+    days = ((frame['timestamp'] - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(days=1)).to_numpy(dtype='float64')
+    user_codes = frame['user_id'].cat.codes.to_numpy()
+    user_count = len(frame['user_id'].cat.categories)
+    day_codes, day_labels = pd.factorize(frame['timestamp'].dt.floor('D'), sort=True)
+
+    dimensions = {
+        'users': (user_codes, frame['user_id'].cat.categories.astype(str)),
+        'quizzes': (frame['quiz_id'].cat.codes.to_numpy(), frame['quiz_id'].cat.categories.astype(str)),
+        'topics': (frame['topic'].cat.codes.to_numpy(), frame['topic'].cat.categories.astype(str)),
+        'days': (day_codes, pd.Index(day_labels.strftime('%Y-%m-%d'))),
+    }
+    tables = {}
+    for name, (codes, labels) in dimensions.items():
+        table = _group_stats(codes, len(labels), scores, days)
+        if name != 'users':
+            table['users'] = _distinct_per_group(codes, user_codes, len(labels), user_count)
+        table.index = labels
+        tables[name] = table[table['attempts'] > 0]
+    return tables
+
+
+def overall_summary(frame):
+    scores = frame['score'].dropna()
+    return {
+        'attempts': int(len(frame)),
+        'users': int(frame['user_id'].nunique()),
+        'quizzes': int(frame['quiz_id'].nunique()),
+        'mean_score': float(scores.mean()) if len(scores) else None,
+        **{f'p{int(q * 100)}': float(scores.quantile(q)) if len(scores) else None for q in PERCENTILES}
+    }
+
+
+def _records(table):
+    # NaN (e.g. the trend of a single attempt) is stored as null
+    for key, row in zip(table.index, table.to_dict('records')):
+        yield key, {field: None if isinstance(value, float) and math.isnan(value) else value for field, value in row.items()}
+
+
+def _delete_stale(repository, name, keys):
+    # Rows of cohorts this run no longer has (e.g. deleted users or quizzes)
+    collection = repository.cohort_table(name)
+    stale = [document.id for document in collection.select([]).stream() if document.id not in keys]
+    for start in range(0, len(stale), MAX_BATCH_WRITES):
+        batch = repository.batch()
+        for document_id in stale[start:start + MAX_BATCH_WRITES]:
+            batch.delete(collection.document(document_id))
+        batch.commit()
+    return len(stale)
+
+
+def materialize(repository, tables, summary):
+    """Write the tables for the dashboard: one document per row in cohort_<table>, plus cohort_analytics/latest.
+
+    Rows left by an earlier run for cohorts this run didn't see are
+    deleted. The latest document also carries the small per-topic and
+    per-day tables, so the dashboard's overview is a single read.
+    """
+    writes = deleted = 0
+    for name, table in tables.items():
+        rows = list(_records(table))
+        for start in range(0, len(rows), MAX_BATCH_WRITES):
+            batch = repository.batch()
+            for key, row in rows[start:start + MAX_BATCH_WRITES]:
+                batch.set(repository.cohort_table(name).document(str(key)), {'key': str(key), **row})
+            batch.commit()
+        writes += len(rows)
+        deleted += _delete_stale(repository, name, {str(key) for key, _ in rows})
+    repository.cohort_analytics().document('latest').set({
+        **summary,
+        'generated_at': datetime.now(timezone.utc),
+        'by_topic': [{'topic': key, **row} for key, row in _records(tables['topics'])],
+        'by_day': [{'day': key, **row} for key, row in _records(tables['days'])],
+    })
+    return writes, deleted
+
+
+def synthetic_attempts(count, users=50000, quizzes=2000, topics=('Math', 'Science', 'History', 'Language', 'Art'), seed=0):
+    """Random attempts over a year, for benchmarking compute_cohort_stats without a database"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01', tz='UTC')
+    user_ids = pd.Categorical.from_codes(rng.integers(0, users, count), [f'user{i}' for i in range(users)])
+    quiz_codes = rng.integers(0, quizzes, count)
+    quiz_ids = pd.Categorical.from_codes(quiz_codes, [f'quiz{i}' for i in range(quizzes)])
+    frame = pd.DataFrame({
+        'user_id': user_ids,
+        'quiz_id': quiz_ids,
+        'score': rng.normal(70, 15, count).clip(0, 100),
+        'timestamp': start + pd.to_timedelta(rng.integers(0, 365 * 86400, count), unit='s')
+    })
+    frame['topic'] = pd.Categorical.from_codes(quiz_codes % len(topics), list(topics))
+    return frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute cohort analytics over every quiz attempt and store them for the dashboard')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='benchmark on N random attempts instead of the database')
+    parser.add_argument('--no-materialize', action='store_true', help='compute only, write nothing')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.synthetic:
+        frame = synthetic_attempts(args.synthetic)
+    else:
+        repository = Repository()
+        frame = load_attempts(repository)
+    loaded = time.perf_counter()
+    tables = compute_cohort_stats(frame)
+    summary = overall_summary(frame)
+    computed = time.perf_counter()
+    print(f"{len(frame)} attempts: loaded in {loaded - start:.1f}s, computed in {computed - loaded:.1f}s "
+          f"({', '.join(f'{len(table)} {name}' for name, table in tables.items())})")
+    if not args.synthetic and not args.no_materialize:
+        writes, deleted = materialize(repository, tables, summary)
+        print(f"Materialized {writes} rows, deleted {deleted} stale ones in {time.perf_counter() - computed:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,11 @@
-from google.cloud import firestore
+from analytics.performance_aggregates import PerformanceAggregates
+from data_access.repository import Repository
+from data_access.write_behind import record_attempt
 
 class LearningAnalytics:
     def __init__(self):
-        self.db = firestore.Client()
+        self.repository = Repository()
+        self.aggregates = PerformanceAggregates(self.repository)
 
     def record_quiz_attempt(self, user_id, quiz_id, score, total_questions, timestamp):
         attempt_data = {
@@ -12,39 +15,29 @@ class LearningAnalytics:
             'total_questions': total_questions,
             'timestamp': timestamp
         }
-        self.db.collection('quiz_attempts').add(attempt_data)
+        record_attempt(self.aggregates, attempt_data)
 
     def analyze_performance(self, user_id):
-        attempts_ref = self.db.collection('quiz_attempts').where('user_id', '==', user_id)
-        attempts = attempts_ref.stream()
-
-        total_score = 0
-        total_attempts = 0
-
-        for attempt in attempts:
-            data = attempt.to_dict()
-            total_score += data['score']
-            total_attempts += 1
-
-        if total_attempts > 0:
-            average_score = total_score / total_attempts
-            return {
-                'average_score': average_score,
-                'total_attempts': total_attempts
-            }
+        # One document read, whatever the length of the user's history
+        performance_data = self.aggregates.get(user_id)
         return {
-            'average_score': 0,
-            'total_attempts': 0
+            'average_score': performance_data['average_score'],
+            'total_attempts': performance_data['total_attempts'],
+            'highest_score': performance_data['highest_score'],
+            'score_stddev': performance_data['score_stddev'],
+            'last_attempt_at': performance_data['last_attempt_at']
         }
 
-    def generate_report(self, user_id):
-        performance_data = self.analyze_performance(user_id)
+    def generate_report(self, user_id, performance_data=None):
+        if performance_data is None:
+            performance_data = self.analyze_performance(user_id)
         report_data = {
             'user_id': user_id,
             'average_score': performance_data['average_score'],
             'total_attempts': performance_data['total_attempts']
         }
-        self.db.collection('reports').add(report_data)
+        self.repository.reports().add(report_data)
+        return report_data
 
     def adaptive_quiz_generation(self, user_id):
         # Placeholder for adaptive quiz generation logic
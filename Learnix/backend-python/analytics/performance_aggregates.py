@@ -0,0 +1,156 @@
+import math
+import sys
+from datetime import datetime, timezone
+
+from google.cloud import firestore
+from data_access.repository import Repository
+
+# Firestore's limit on writes in one batch
+MAX_BATCH_WRITES = 500
+
+
+def attempt_timestamp(value):
+    """An attempt's timestamp as an aware UTC datetime; SERVER_TIMESTAMP is kept for the server to fill in.
+
+    Naive datetimes are taken as UTC and ISO 8601 strings are parsed;
+    anything else raises ValueError, so mixed types never reach the
+    aggregates, where comparing them would fail every flush.
+    """
+    if value is firestore.SERVER_TIMESTAMP:
+        return value
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"Not an ISO 8601 timestamp: {value!r}") from None
+    if not isinstance(value, datetime):
+        raise ValueError(f"Unsupported attempt timestamp: {type(value).__name__}")
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def normalize_attempt(attempt_data):
+    return {**attempt_data, 'timestamp': attempt_timestamp(attempt_data.get('timestamp', firestore.SERVER_TIMESTAMP))}
+
+
+def _stored_timestamp(value):
+    # Attempts stored before timestamps were normalized may hold anything; those are left out
+    try:
+        return attempt_timestamp(value)
+    except ValueError:
+        return None
+
+
+def aggregate_update(scores, timestamp=firestore.SERVER_TIMESTAMP):
+    # Field transforms are applied server-side, so concurrent attempts never overwrite each other
+    return {
+        'attempt_count': firestore.Increment(len(scores)),
+        'score_sum': firestore.Increment(sum(scores)),
+        'score_sum_squares': firestore.Increment(sum(score * score for score in scores)),
+        'max_score': firestore.Maximum(max(scores)),
+        'last_attempt_at': timestamp
+    }
+
+
+def summarize(aggregate):
+    count = aggregate.get('attempt_count', 0) if aggregate else 0
+    if not count:
+        return {
+            'total_attempts': 0,
+            'average_score': 0,
+            'highest_score': 0,
+            'score_stddev': 0,
+            'last_attempt_at': None
+        }
+    mean = aggregate['score_sum'] / count
+    variance = max(0.0, aggregate['score_sum_squares'] / count - mean * mean)
+    return {
+        'total_attempts': count,
+        'average_score': mean,
+        'highest_score': aggregate.get('max_score', 0),
+        'score_stddev': math.sqrt(variance),
+        'last_attempt_at': aggregate.get('last_attempt_at')
+    }
+
+
+class PerformanceAggregates:
+    """Per-user running totals of quiz scores, one document per user in user_performance.
+
+    Every attempt is written together with the update of its user's totals
+    in one atomic batch, so analytics read a single document instead of
+    streaming the user's whole attempt history.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def record_attempt(self, attempt_data):
+        attempt_ref = self.repository.quiz_attempts().document()
+        batch = self.repository.batch()
+        self.add_to_batch(batch, attempt_ref, normalize_attempt(attempt_data))
+        batch.commit()
+        return attempt_ref.id
+
+    def add_to_batch(self, batch, attempt_ref, attempt_data):
+        self.add_many_to_batch(batch, [(attempt_ref, attempt_data)])
+
+    def add_many_to_batch(self, batch, attempts):
+        """Add (attempt reference, attempt data) pairs to a batch, with one aggregate update per user"""
+        by_user = {}
+        for attempt_ref, attempt_data in attempts:
+            batch.set(attempt_ref, attempt_data)
+            if attempt_data.get('score') is None:
+                continue  # not a scored attempt; backfill skips it too
+            by_user.setdefault(str(attempt_data['user_id']), []).append(attempt_data)
+        for user_id, user_attempts in by_user.items():
+            timestamps = [_stored_timestamp(data.get('timestamp', firestore.SERVER_TIMESTAMP)) for data in user_attempts]
+            # Attempts carrying their own time set last_attempt_at to the latest of them
+            timestamp = max(timestamps) if all(isinstance(t, datetime) for t in timestamps) else firestore.SERVER_TIMESTAMP
+            batch.set(self.repository.user_performance().document(user_id),
+                      aggregate_update([data['score'] for data in user_attempts], timestamp), merge=True)
+
+    def get(self, user_id):
+        snapshot = self.repository.user_performance().document(str(user_id)).get()
+        return summarize(snapshot.to_dict() if snapshot.exists else None)
+
+    def backfill(self):
+        """Recompute every user's aggregate from quiz_attempts.
+
+        Run it once before reads switch to the aggregates, while attempts
+        are not being recorded: the totals are overwritten, so an attempt
+        recorded during the scan can be lost from them. Re-running it
+        later repairs any drift.
+        """
+        totals = {}
+        for attempt in self.repository.quiz_attempts().stream():
+            data = attempt.to_dict()
+            # Documents without a score (e.g. adaptive quizzes issued before they moved to their own collection) are not attempts
+            if 'user_id' not in data or data.get('score') is None:
+                continue
+            score = data['score']
+            total = totals.setdefault(str(data['user_id']), {
+                'attempt_count': 0, 'score_sum': 0, 'score_sum_squares': 0, 'max_score': score, 'last_attempt_at': None
+            })
+            total['attempt_count'] += 1
+            total['score_sum'] += score
+            total['score_sum_squares'] += score * score
+            total['max_score'] = max(total['max_score'], score)
+            timestamp = _stored_timestamp(data.get('timestamp'))
+            if timestamp is not None and (total['last_attempt_at'] is None or timestamp > total['last_attempt_at']):
+                total['last_attempt_at'] = timestamp
+
+        users = list(totals.items())
+        for start in range(0, len(users), MAX_BATCH_WRITES):
+            batch = self.repository.batch()
+            for user_id, total in users[start:start + MAX_BATCH_WRITES]:
+                batch.set(self.repository.user_performance().document(user_id), total)
+            batch.commit()
+        return len(users)
+
+
+if __name__ == '__main__':
+    # python -m analytics.performance_aggregates backfill
+    if sys.argv[1:] != ['backfill']:
+        sys.exit('usage: python -m analytics.performance_aggregates backfill')
+    print(f"Backfilled aggregates for {PerformanceAggregates(Repository()).backfill()} users")
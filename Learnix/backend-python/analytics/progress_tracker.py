@@ -1,8 +1,12 @@
 from google.cloud import firestore
+from analytics.performance_aggregates import PerformanceAggregates
+from data_access.repository import Repository
+from data_access.write_behind import record_attempt
 
 class ProgressTracker:
     def __init__(self):
-        self.db = firestore.Client()
+        self.repository = Repository()
+        self.aggregates = PerformanceAggregates(self.repository)
 
     def record_quiz_attempt(self, user_id, quiz_id, score, total_questions, attempt_time):
         attempt_data = {
@@ -13,10 +17,10 @@ class ProgressTracker:
             'attempt_time': attempt_time,
             'timestamp': firestore.SERVER_TIMESTAMP
         }
-        self.db.collection('quiz_attempts').add(attempt_data)
+        record_attempt(self.aggregates, attempt_data)
 
     def get_user_progress(self, user_id):
-        attempts_ref = self.db.collection('quiz_attempts').where('user_id', '==', user_id)
+        attempts_ref = self.repository.quiz_attempts().where('user_id', '==', user_id)
         attempts = attempts_ref.stream()
 
         progress = []
@@ -25,14 +29,10 @@ class ProgressTracker:
         return progress
 
     def analyze_performance(self, user_id):
-        progress = self.get_user_progress(user_id)
-        total_score = sum(attempt['score'] for attempt in progress)
-        total_attempts = len(progress)
-        average_score = total_score / total_attempts if total_attempts > 0 else 0
-
+        performance_data = self.aggregates.get(user_id)
         return {
-            'total_attempts': total_attempts,
-            'average_score': average_score
+            'total_attempts': performance_data['total_attempts'],
+            'average_score': performance_data['average_score']
         }
 
     def generate_report(self, user_id):
@@ -1,11 +1,12 @@
 from google.cloud import firestore
+from data_access.repository import Repository
 
 class RecommendationEngine:
     def __init__(self):
-        self.db = firestore.Client()
+        self.repository = Repository()
 
     def get_user_performance(self, user_id):
-        user_ref = self.db.collection('users').document(user_id)
+        user_ref = self.repository.users().document(user_id)
         user_data = user_ref.get()
         return user_data.to_dict() if user_data.exists else None
 
@@ -24,7 +25,7 @@ class RecommendationEngine:
         return recommendations
 
     def save_recommendations(self, user_id, recommendations):
-        recommendations_ref = self.db.collection('recommendations').document(user_id)
+        recommendations_ref = self.repository.recommendations().document(user_id)
         recommendations_ref.set({
             'recommendations': recommendations,
             'timestamp': firestore.SERVER_TIMESTAMP
@@ -0,0 +1,246 @@
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+
+# Firestore's limit on writes in one batch
+MAX_BATCH_WRITES = 500
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a is not None and a < b,
+    '<=': lambda a, b: a is not None and a <= b,
+    '>': lambda a, b: a is not None and a > b,
+    '>=': lambda a, b: a is not None and a >= b,
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a not in b,
+    'array-contains': lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__} in a document")
+
+
+def _decode(value):
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    return value
+
+
+def _apply(existing, data):
+    # Resolve the sentinels and field transforms the app writes
+    result = dict(existing)
+    for field, value in data.items():
+        if value is firestore.SERVER_TIMESTAMP:
+            value = datetime.now(timezone.utc)
+        elif isinstance(value, firestore.Increment):
+            value = (result.get(field) or 0) + value.value
+        elif isinstance(value, firestore.Maximum):
+            value = value.value if result.get(field) is None else max(result[field], value.value)
+        elif isinstance(value, firestore.Minimum):
+            value = value.value if result.get(field) is None else min(result[field], value.value)
+        elif value is firestore.DELETE_FIELD:
+            result.pop(field, None)
+            continue
+        result[field] = value
+    return result
+
+
+class LocalClient:
+    """The subset of firestore.Client the app uses, stored in SQLite.
+
+    path=':memory:' keeps everything in the process, for tests and for
+    load-testing the Flask app without network access; a file path
+    persists documents between runs. One connection is shared by all
+    threads behind a lock.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS documents ('
+                           'collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, '
+                           'PRIMARY KEY (collection, id))')
+
+    def collection(self, name):
+        return LocalCollection(self, name)
+
+    def batch(self):
+        return LocalBatch(self)
+
+    def close(self):
+        self._conn.close()
+
+    def _read(self, collection, document_id):
+        row = self._conn.execute('SELECT data FROM documents WHERE collection = ? AND id = ?',
+                                 (collection, document_id)).fetchone()
+        return None if row is None else json.loads(row[0], object_hook=_decode)
+
+    def _write(self, collection, document_id, data, merge=False, must_exist=False):
+        existing = self._read(collection, document_id)
+        if must_exist and existing is None:
+            raise NotFound(f"No document to update: {collection}/{document_id}")
+        data = _apply((existing or {}) if merge else {}, data)
+        self._conn.execute('INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)',
+                           (collection, document_id, json.dumps(data, default=_encode)))
+
+    def _delete(self, collection, document_id):
+        self._conn.execute('DELETE FROM documents WHERE collection = ? AND id = ?', (collection, document_id))
+
+    def _commit(self, writes):
+        # All of a batch's writes land together or not at all
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for write in writes:
+                    write()
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def _rows(self, collection, equal_filters):
+        sql = 'SELECT id, data FROM documents WHERE collection = ?'
+        params = [collection]
+        # Plain equality filters run in SQLite; everything else is checked on the decoded documents
+        for field, value in equal_filters:
+            sql += ' AND json_extract(data, ?) = ?'
+            params += [f'$."{field}"', int(value) if isinstance(value, bool) else value]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [(document_id, json.loads(data, object_hook=_decode)) for document_id, data in rows]
+
+
+class LocalDocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return None if self._data is None else dict(self._data)
+
+    def get(self, field):
+        return self._data.get(field) if self._data else None
+
+
+class LocalDocumentReference:
+    def __init__(self, client, collection, document_id):
+        self._client = client
+        self.collection_name = collection
+        self.id = document_id
+
+    def get(self, transaction=None):
+        with self._client._lock:
+            return LocalDocumentSnapshot(self, self._client._read(self.collection_name, self.id))
+
+    def set(self, data, merge=False):
+        self._client._commit([lambda: self._client._write(self.collection_name, self.id, data, merge)])
+        return datetime.now(timezone.utc)
+
+    def update(self, data):
+        self._client._commit([lambda: self._client._write(self.collection_name, self.id, data, True, True)])
+        return datetime.now(timezone.utc)
+
+    def delete(self):
+        self._client._commit([lambda: self._client._delete(self.collection_name, self.id)])
+
+
+class LocalQuery:
+    def __init__(self, client, collection, filters=(), order=(), limit=None, fields=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._order = tuple(order)
+        self._limit = limit
+        self._fields = fields
+
+    def _with(self, **changes):
+        state = {'filters': self._filters, 'order': self._order, 'limit': self._limit, 'fields': self._fields, **changes}
+        return LocalQuery(self._client, self._collection, **state)
+
+    def where(self, field, op, value):
+        if op not in _OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        return self._with(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction='ASCENDING'):
+        return self._with(order=self._order + ((field, direction),))
+
+    def limit(self, count):
+        return self._with(limit=count)
+
+    def select(self, field_paths):
+        return self._with(fields=tuple(field_paths))
+
+    def stream(self, transaction=None):
+        equal = [(field, value) for field, op, value in self._filters
+                 if op == '==' and isinstance(value, (str, int, float, bool))]
+        rows = [(document_id, data) for document_id, data in self._client._rows(self._collection, equal)
+                if all(field in data and _OPERATORS[op](data[field], value) for field, op, value in self._filters)]
+        for field, direction in reversed(self._order):
+            rows = [row for row in rows if field in row[1]]
+            rows.sort(key=lambda row: row[1][field], reverse=direction == 'DESCENDING')
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        for document_id, data in rows:
+            if self._fields is not None:
+                data = {field: data[field] for field in self._fields if field in data}
+            yield LocalDocumentSnapshot(LocalDocumentReference(self._client, self._collection, document_id), data)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class LocalCollection(LocalQuery):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, document_id=None):
+        return LocalDocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, data, document_id=None):
+        reference = self.document(document_id)
+        return reference.set(data), reference
+
+
+class LocalBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def _add(self, write):
+        if len(self._writes) >= MAX_BATCH_WRITES:
+            raise ValueError(f"A batch holds at most {MAX_BATCH_WRITES} writes")
+        self._writes.append(write)
+
+    def set(self, reference, data, merge=False):
+        self._add(lambda: self._client._write(reference.collection_name, reference.id, data, merge))
+
+    def update(self, reference, data):
+        self._add(lambda: self._client._write(reference.collection_name, reference.id, data, True, True))
+
+    def delete(self, reference):
+        self._add(lambda: self._client._delete(reference.collection_name, reference.id))
+
+    def commit(self):
+        self._client._commit(self._writes)
+        self._writes = []
+        return []
+
+    def __len__(self):
+        return len(self._writes)
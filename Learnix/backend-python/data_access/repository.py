@@ -0,0 +1,105 @@
+import os
+import threading
+
+QUIZ_ATTEMPTS = 'quiz_attempts'
+ADAPTIVE_QUIZZES = 'adaptive_quizzes'
+QUIZZES = 'quizzes'
+QUESTIONS = 'questions'
+REPORTS = 'reports'
+USERS = 'users'
+USER_PERFORMANCE = 'user_performance'
+RECOMMENDATIONS = 'recommendations'
+TUTOR_CONVERSATIONS = 'tutor_conversations'
+LEARNING_ANALYTICS = 'learning_analytics'
+COHORT_ANALYTICS = 'cohort_analytics'
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+
+def create_client():
+    """A new client for the backend chosen by LEARNIX_DB_BACKEND.
+
+    'firestore' (the default) talks to Cloud Firestore; 'local' stores
+    documents in SQLite at LEARNIX_DB_PATH (in memory by default), so the
+    app runs and can be load-tested with no network.
+    """
+    backend = os.getenv('LEARNIX_DB_BACKEND', 'firestore')
+    if backend == 'firestore':
+        from google.cloud import firestore
+        return firestore.Client()
+    if backend == 'local':
+        from data_access.local_store import LocalClient
+        return LocalClient(os.getenv('LEARNIX_DB_PATH', ':memory:'))
+    raise ValueError(f"Unknown LEARNIX_DB_BACKEND: {backend}")
+
+
+def get_db():
+    """The process's database client, created on first use and shared by every service.
+
+    A client's gRPC channel does not survive fork(), so a forked worker
+    gets its own client the first time it asks.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = create_client()
+                _client_pid = os.getpid()
+    return _client
+
+
+def set_db(client):
+    """Use the given client for this process (tests, scripts)"""
+    global _client, _client_pid
+    with _lock:
+        _client = client
+        _client_pid = os.getpid()
+
+
+class Repository:
+    """Named accessors for the app's collections, over one shared client"""
+
+    def __init__(self, db=None):
+        self.db = db if db is not None else get_db()
+
+    def batch(self):
+        return self.db.batch()
+
+    def quiz_attempts(self):
+        return self.db.collection(QUIZ_ATTEMPTS)
+
+    def adaptive_quizzes(self):
+        return self.db.collection(ADAPTIVE_QUIZZES)
+
+    def quizzes(self):
+        return self.db.collection(QUIZZES)
+
+    def questions(self):
+        return self.db.collection(QUESTIONS)
+
+    def reports(self):
+        return self.db.collection(REPORTS)
+
+    def users(self):
+        return self.db.collection(USERS)
+
+    def user_performance(self):
+        return self.db.collection(USER_PERFORMANCE)
+
+    def recommendations(self):
+        return self.db.collection(RECOMMENDATIONS)
+
+    def tutor_conversations(self):
+        return self.db.collection(TUTOR_CONVERSATIONS)
+
+    def learning_analytics(self):
+        return self.db.collection(LEARNING_ANALYTICS)
+
+    def cohort_analytics(self):
+        return self.db.collection(COHORT_ANALYTICS)
+
+    def cohort_table(self, table):
+        # Materialized rows of one cohort table: users, quizzes, topics or days
+        return self.db.collection(f'{COHORT_ANALYTICS}_{table}')
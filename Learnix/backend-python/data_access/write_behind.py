@@ -0,0 +1,403 @@
+import atexit
+import collections
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from google.cloud import firestore
+
+from analytics.performance_aggregates import PerformanceAggregates, normalize_attempt
+from data_access.repository import Repository
+
+# Firestore's limit on writes in one batch
+MAX_BATCH_WRITES = 500
+# A log that never empties under sustained load is rewritten with only the pending attempts past this size
+LOG_COMPACT_BYTES = 64 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFull(Exception):
+    """More attempts are waiting to be written than the buffer holds"""
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Cannot log {type(value).__name__} in an attempt")
+
+
+def _decode(value):
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    return value
+
+
+class AttemptLog:
+    """Append-only log of acknowledged attempts, one JSON line each, plus markers of what has been committed.
+
+    Each process writes its own file and holds an exclusive lock on it, so
+    a file nobody holds belongs to a process that died and can be replayed.
+    """
+
+    def __init__(self, directory, fsync=False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        # Unique even when a restarted process gets a dead one's pid; locked before it takes a name recover() looks at
+        self.path = os.path.join(directory, f'attempts-{os.getpid()}-{uuid.uuid4().hex[:8]}.log')
+        self.fsync = fsync
+        temp_path = os.path.join(directory, f'new-{os.getpid()}.tmp')
+        self._file = self._open_locked(temp_path)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _open_locked(path):
+        handle = open(path, 'a', encoding='utf-8')
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return handle
+
+    def append(self, entry):
+        self._write(self._file, [entry])
+
+    def _write(self, handle, entries):
+        handle.write(''.join(json.dumps(entry, default=_encode) + '\n' for entry in entries))
+        handle.flush()
+        if self.fsync:
+            os.fsync(handle.fileno())
+
+    def size(self):
+        return self._file.tell()
+
+    def truncate(self):
+        # Only called once every logged attempt has been committed
+        self._file.truncate(0)
+        self._file.seek(0)
+
+    def rewrite(self, entries):
+        """Replace the log with just these entries; the new file is locked before it takes the log's name"""
+        temp_path = os.path.join(self.directory, f'compact-{os.getpid()}.tmp')
+        handle = self._open_locked(temp_path)
+        handle.truncate(0)
+        self._write(handle, entries)
+        os.replace(temp_path, self.path)
+        self._file.close()
+        self._file = handle
+
+    def close(self):
+        self._file.close()
+
+    def dead_letter(self, entries):
+        """Set attempts that could not be written aside in a file of their own, always fsynced.
+
+        It has the log's format, so renaming it to attempts-<anything>.log
+        replays its attempts at the next start.
+        """
+        path = os.path.join(self.directory, f'dead-letter-{os.getpid()}-{uuid.uuid4().hex[:8]}.log')
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(''.join(json.dumps(entry, default=_encode) + '\n' for entry in entries))
+            handle.flush()
+            os.fsync(handle.fileno())
+        return path
+
+    @staticmethod
+    def recover(directory):
+        """(attempts logged but never committed by processes that are gone, the logs they came from).
+
+        The logs stay locked, so no other process replays them too, until
+        discard() removes them; call it once the attempts are safe in a
+        live log.
+        """
+        pending = []
+        claimed = []
+        for path in sorted(glob.glob(os.path.join(directory, 'attempts-*.log'))):
+            handle = open(path, 'r+', encoding='utf-8')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                continue  # a live process's log
+            claimed.append(handle)
+            committed = 0
+            entries = []
+            for line in handle:
+                try:
+                    entry = json.loads(line, object_hook=_decode)
+                except ValueError:
+                    break  # torn last line: that attempt was never acknowledged
+                if 'committed' in entry:
+                    committed = max(committed, entry['committed'])
+                else:
+                    entries.append(entry)
+            pending.extend(entry for entry in entries if entry['seq'] > committed)
+        return pending, claimed
+
+    @staticmethod
+    def discard(claimed):
+        for handle in claimed:
+            try:
+                os.unlink(handle.name)
+            except FileNotFoundError:
+                pass
+            handle.close()
+
+
+class AttemptWriter:
+    """Write-behind buffer for quiz attempts.
+
+    record() logs the attempt locally and returns its id right away; a
+    background thread commits buffered attempts in batches of at most
+    MAX_BATCH_WRITES writes (each attempt plus one aggregate update per
+    user in the batch), as soon as a batch is full or every
+    flush_interval seconds. Attempt ids are assigned up front, so a
+    replayed attempt overwrites itself rather than being stored twice;
+    only a crash between a commit and its log marker can count an
+    attempt twice in its user's aggregate.
+
+    A batch that fails max_batch_failures times in a row is moved to a
+    dead-letter file (see AttemptLog.dead_letter), so one bad batch can't
+    hold back everything queued behind it.
+
+    Flush latency and buffer depth are kept for stats(). Listeners added
+    with on_flush are called with the user ids of every committed batch.
+    """
+
+    def __init__(self, aggregates, log_directory, flush_interval=0.5, max_pending=100000, fsync=False,
+                 max_batch_failures=10):
+        self.aggregates = aggregates
+        self.log_directory = log_directory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.max_batch_failures = max_batch_failures
+        self._batch_failures = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = collections.deque()
+        self._seq = 0
+        self._pid = None
+        self._log = None
+        self._thread = None
+        self._closed = False
+        self._listeners = []
+        self._latencies = collections.deque(maxlen=1024)
+        self.counters = {'recorded': 0, 'committed': 0, 'batches': 0, 'failed_flushes': 0, 'recovered': 0, 'rejected': 0,
+                         'dead_lettered': 0}
+        self.max_depth = 0
+
+    def on_flush(self, listener):
+        self._listeners.append(listener)
+
+    def start(self):
+        """Replay what dead processes left in the log and start flushing; record() does it too if not done"""
+        self._ensure_started()
+
+    def record(self, attempt_data):
+        self._ensure_started()
+        # Rejected here, before it is acknowledged, rather than failing its batch later
+        attempt_data = normalize_attempt(attempt_data)
+        attempt_ref = self.aggregates.repository.quiz_attempts().document()
+        if attempt_data.get('timestamp', firestore.SERVER_TIMESTAMP) is firestore.SERVER_TIMESTAMP:
+            # Stamped now: the flush may be a while later
+            attempt_data = {**attempt_data, 'timestamp': datetime.now(timezone.utc)}
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.counters['rejected'] += 1
+                raise BufferFull(f"{len(self._pending)} attempts are waiting to be written")
+            self._enqueue(attempt_ref.id, attempt_data)
+            self.counters['recorded'] += 1
+            # Each attempt takes at most two writes (itself and its user's aggregate)
+            full = len(self._pending) * 2 >= MAX_BATCH_WRITES
+        if full:
+            self._wake.set()
+        return attempt_ref.id
+
+    def _enqueue(self, attempt_id, attempt_data):
+        self._seq += 1
+        self._log.append({'seq': self._seq, 'id': attempt_id, 'attempt': attempt_data})
+        self._pending.append((self._seq, attempt_id, attempt_data))
+        self.max_depth = max(self.max_depth, len(self._pending))
+
+    def _ensure_started(self):
+        # The flusher thread and the log lock don't survive fork, so each process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pending.clear()
+            recovered, dead_logs = AttemptLog.recover(self.log_directory)
+            self._log = AttemptLog(self.log_directory, self.fsync)
+            self._pid = os.getpid()
+            for entry in recovered:
+                self._enqueue(entry['id'], entry['attempt'])
+            # Only now that this process's log holds them
+            AttemptLog.discard(dead_logs)
+            self.counters['recovered'] += len(recovered)
+            if recovered:
+                logger.warning("Recovered %d unwritten quiz attempts from the attempt log", len(recovered))
+            self._thread = threading.Thread(target=self._run, name='attempt-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        failures = 0
+        while not self._closed:
+            self._wake.wait(self.flush_interval * min(2 ** failures, 64))
+            self._wake.clear()
+            try:
+                self.flush()
+                failures = 0
+            except Exception:
+                failures += 1
+                logger.exception("Flushing quiz attempts failed; retrying")
+
+    def flush(self):
+        """Commit everything buffered so far; returns the number of attempts written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch_entries = self._next_batch()
+                if not batch_entries:
+                    return written
+                start = time.perf_counter()
+                try:
+                    batch = self.aggregates.repository.batch()
+                    self.aggregates.add_many_to_batch(batch, [
+                        (self.aggregates.repository.quiz_attempts().document(attempt_id), data)
+                        for _, attempt_id, data in batch_entries
+                    ])
+                    batch.commit()
+                    dead_letter = None
+                except Exception:
+                    self.counters['failed_flushes'] += 1
+                    self._batch_failures += 1
+                    if self._batch_failures < self.max_batch_failures:
+                        raise
+                    dead_letter = self._log.dead_letter([{'seq': seq, 'id': attempt_id, 'attempt': data}
+                                                         for seq, attempt_id, data in batch_entries])
+                    logger.exception("Writing %d quiz attempts failed %d times; moved them to %s",
+                                     len(batch_entries), self._batch_failures, dead_letter)
+                self._batch_failures = 0
+                with self._lock:
+                    for _ in batch_entries:
+                        self._pending.popleft()
+                    self._log.append({'committed': batch_entries[-1][0]})
+                    if not self._pending:
+                        self._log.truncate()
+                    elif self._log.size() > LOG_COMPACT_BYTES:
+                        self._log.rewrite([{'seq': seq, 'id': attempt_id, 'attempt': data}
+                                           for seq, attempt_id, data in self._pending])
+                    if dead_letter is not None:
+                        self.counters['dead_lettered'] += len(batch_entries)
+                    else:
+                        self.counters['committed'] += len(batch_entries)
+                        self.counters['batches'] += 1
+                if dead_letter is not None:
+                    continue
+                self._latencies.append(time.perf_counter() - start)
+                written += len(batch_entries)
+                user_ids = {str(data['user_id']) for _, _, data in batch_entries}
+                for listener in self._listeners:
+                    listener(user_ids)
+
+    def _next_batch(self):
+        # Oldest attempts first, as many as fit in one batch's write limit
+        entries = []
+        users = set()
+        for entry in self._pending:
+            user_id = str(entry[2]['user_id'])
+            if len(entries) + 1 + len(users | {user_id}) > MAX_BATCH_WRITES:
+                break
+            entries.append(entry)
+            users.add(user_id)
+        return entries
+
+    def close(self):
+        """Flush what is left and stop the flusher; called at exit"""
+        if self._pid != os.getpid():
+            return
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2 + 1)
+        try:
+            self.flush()
+        finally:
+            self._log.close()
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+
+        return {
+            'buffer_depth': len(self._pending),
+            'max_buffer_depth': self.max_depth,
+            'flush_interval_seconds': self.flush_interval,
+            'log_bytes': self._log.size() if self._log is not None and self._pid == os.getpid() else 0,
+            'flush_latency_seconds': {
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': latencies[-1] if latencies else None
+            },
+            **self.counters
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+_listeners = []
+
+
+def on_attempts_written(listener):
+    """Call listener(user_ids) whenever attempts of those users have reached the database"""
+    _listeners.append(listener)
+
+
+def _notify(user_ids):
+    for listener in _listeners:
+        listener(user_ids)
+
+
+def get_attempt_writer():
+    """The write-behind buffer shared by the app, or None when LEARNIX_WRITE_BEHIND=0 (attempts written in the request)"""
+    global _writer
+    if os.getenv('LEARNIX_WRITE_BEHIND', '1') != '1':
+        return None
+    with _writer_lock:
+        if _writer is None:
+            _writer = _create_attempt_writer(PerformanceAggregates(Repository()))
+    return _writer
+
+
+def record_attempt(aggregates, attempt_data):
+    """Record an attempt through the write-behind buffer, or with its own batch commit when the buffer is off"""
+    writer = get_attempt_writer()
+    if writer is None:
+        attempt_id = aggregates.record_attempt(attempt_data)
+        _notify({str(attempt_data['user_id'])})
+        return attempt_id
+    return writer.record(attempt_data)
+
+
+def _create_attempt_writer(aggregates):
+    writer = AttemptWriter(
+        aggregates,
+        os.getenv('LEARNIX_ATTEMPT_LOG_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.attempt_log')),
+        flush_interval=float(os.getenv('LEARNIX_WRITE_BEHIND_INTERVAL', '0.5')),
+        max_pending=int(os.getenv('LEARNIX_WRITE_BEHIND_MAX_PENDING', '100000')),
+        # Off by default: a process crash loses nothing, but a machine crash can lose the last acknowledged attempts
+        fsync=os.getenv('LEARNIX_ATTEMPT_LOG_FSYNC', '0') == '1',
+        max_batch_failures=int(os.getenv('LEARNIX_WRITE_BEHIND_MAX_FAILURES', '10'))
+    )
+    writer.on_flush(_notify)
+    atexit.register(writer.close)
+    return writer
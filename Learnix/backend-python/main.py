@@ -1,34 +1,58 @@
+import os
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from ai_services.tutor_ai import TutorAI
 from ai_services.quiz_generator import QuizGenerator
 from analytics.learning_analytics import LearningAnalytics
 from models.quiz_models import QuizAttempt
-from models.user_models import UserProgress
-from models.analytics_models import LearningAnalytics as AnalyticsModel
-from firebase_admin import firestore
+from analytics.performance_aggregates import PerformanceAggregates
+from data_access.repository import Repository
+from data_access.write_behind import BufferFull, get_attempt_writer, on_attempts_written, record_attempt
+from analytics.analytics_cache import UserAnalyticsCache
+from analytics.cohort_analytics import TABLES as COHORT_TABLES
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize Firestore
-db = firestore.client()
+# One database client per process, shared by every service (LEARNIX_DB_BACKEND=local needs no network)
+repository = Repository()
 
 # Initialize services
 tutor_ai = TutorAI()
 quiz_generator = QuizGenerator()
 learning_analytics = LearningAnalytics()
+performance_aggregates = PerformanceAggregates(repository)
+
+# Dashboard analytics per user, dropped as soon as that user's new attempts are written
+analytics_cache = UserAnalyticsCache(ttl=float(os.getenv('LEARNIX_ANALYTICS_CACHE_TTL', '30')))
+on_attempts_written(analytics_cache.invalidate)
+
+# Attempts a previous run acknowledged but never wrote are replayed now, not on the next submission
+attempt_writer = get_attempt_writer()
+if attempt_writer is not None:
+    attempt_writer.start()
 
 @app.route('/api/quiz/attempt', methods=['POST'])
 def record_quiz_attempt():
     data = request.json
     attempt = QuizAttempt(data['userId'], data['quizId'], data['answers'], data['score'])
-    db.collection('quiz_attempts').add(attempt.to_dict())
+    # Logged locally and written, with the user's performance aggregate, in the next batch commit
+    try:
+        record_attempt(performance_aggregates, attempt.to_dict())
+    except BufferFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     return jsonify({'message': 'Quiz attempt recorded successfully'}), 201
 
+@app.route('/api/metrics/attempt-writer', methods=['GET'])
+def attempt_writer_stats():
+    writer = get_attempt_writer()
+    if writer is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify({'enabled': True, **writer.stats()}), 200
+
 @app.route('/api/analytics/performance/<user_id>', methods=['GET'])
 def get_performance_analysis(user_id):
-    performance_data = learning_analytics.analyze_performance(user_id)
+    performance_data = analytics_cache.get('performance', user_id, lambda: learning_analytics.analyze_performance(user_id))
     return jsonify(performance_data), 200
 
 @app.route('/api/tutor/conversation', methods=['POST'])
@@ -39,9 +63,32 @@ def ai_tutor_conversation():
 
 @app.route('/api/analytics/reports/<user_id>', methods=['GET'])
 def get_user_reports(user_id):
-    reports = learning_analytics.generate_reports(user_id)
+    # Only the read is cached: every request still stores its report
+    performance_data = analytics_cache.get('performance', user_id, lambda: learning_analytics.analyze_performance(user_id))
+    reports = learning_analytics.generate_report(user_id, performance_data)
     return jsonify(reports), 200
 
+@app.route('/api/metrics/analytics-cache', methods=['GET'])
+def analytics_cache_stats():
+    return jsonify(analytics_cache.stats()), 200
+
+@app.route('/api/analytics/cohort', methods=['GET'])
+def get_cohort_analytics():
+    # Materialized by python -m analytics.cohort_analytics
+    snapshot = repository.cohort_analytics().document('latest').get()
+    if not snapshot.exists:
+        return jsonify({'error': 'Cohort analytics have not been computed yet'}), 404
+    return jsonify(snapshot.to_dict()), 200
+
+@app.route('/api/analytics/cohort/<table>/<key>', methods=['GET'])
+def get_cohort_row(table, key):
+    if table not in COHORT_TABLES:
+        return jsonify({'error': f'Unknown cohort table: {table}'}), 404
+    snapshot = repository.cohort_table(table).document(key).get()
+    if not snapshot.exists:
+        return jsonify({'error': f'No cohort analytics for {key}'}), 404
+    return jsonify(snapshot.to_dict()), 200
+
 @app.route('/api/quiz/adaptive', methods=['POST'])
 def generate_adaptive_quiz():
     user_id = request.json.get('userId')
@@ -1,35 +1,37 @@
 from google.cloud import firestore
+from analytics.performance_aggregates import PerformanceAggregates
+from data_access.repository import Repository
+from data_access.write_behind import record_attempt
 
 class QuizAttempt:
-    def __init__(self, user_id, quiz_id, answers, score, timestamp):
+    def __init__(self, user_id, quiz_id, answers, score, timestamp=firestore.SERVER_TIMESTAMP):
         self.user_id = user_id
         self.quiz_id = quiz_id
         self.answers = answers
         self.score = score
         self.timestamp = timestamp
 
-    def save_to_firestore(self):
-        db = firestore.Client()
-        doc_ref = db.collection('quiz_attempts').add({
+    def to_dict(self):
+        return {
             'user_id': self.user_id,
             'quiz_id': self.quiz_id,
             'answers': self.answers,
             'score': self.score,
             'timestamp': self.timestamp
-        })
-        return doc_ref.id
+        }
+
+    def save_to_firestore(self):
+        return record_attempt(PerformanceAggregates(Repository()), self.to_dict())
 
 class PerformanceAnalysis:
     def __init__(self, user_id):
         self.user_id = user_id
 
     def analyze_performance(self):
-        db = firestore.Client()
-        attempts = db.collection('quiz_attempts').where('user_id', '==', self.user_id).stream()
-        scores = [attempt.to_dict()['score'] for attempt in attempts]
+        performance_data = PerformanceAggregates(Repository()).get(self.user_id)
         return {
-            'average_score': sum(scores) / len(scores) if scores else 0,
-            'total_attempts': len(scores)
+            'average_score': performance_data['average_score'],
+            'total_attempts': performance_data['total_attempts']
         }
 
 class AITutorConversation:
@@ -38,8 +40,7 @@ class AITutorConversation:
         self.conversation = conversation
 
     def save_conversation(self):
-        db = firestore.Client()
-        doc_ref = db.collection('tutor_conversations').add({
+        _, doc_ref = Repository().tutor_conversations().add({
             'user_id': self.user_id,
             'conversation': self.conversation
         })
@@ -0,0 +1,42 @@
+import json
+import os
+from typing import Any, Dict, Iterable, List
+
+
+class JsonLinesLog:
+    """Append-only JSON-lines file shared by several processes.
+
+    Each process appends whole lines in a single write, so concurrent
+    writers never interleave inside a line, and reads only the lines added
+    since its previous read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offset = 0
+
+    def read_new(self) -> List[Dict[str, Any]]:
+        """Records appended (by anyone) since the last call"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Only consume complete lines; a concurrent writer may be mid-line
+        end = data.rfind(b'\n') + 1
+        self._offset += end
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records
+
+    def append(self, records: Iterable[Dict[str, Any]]) -> None:
+        lines = ''.join(json.dumps(record) + '\n' for record in records)
+        if not lines:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
@@ -0,0 +1,20 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+
+def use_scratch_stores() -> str:
+    """Point main's caches, indexes and question bank at a fresh temp dir, removed at exit.
+
+    Must be called before main is imported: main opens its stores at import
+    time, and benchmark runs would otherwise write synthetic questions into
+    the real ones.
+    """
+    directory = tempfile.mkdtemp(prefix='mcq-bench-')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    os.environ['QUIZ_CACHE_DIR'] = os.path.join(directory, 'cache')
+    os.environ['QUESTION_BANK_PATH'] = os.path.join(directory, 'questions.db')
+    for name in ('DISTRACTOR_INDEX_PATH', 'QUESTION_INDEX_PATH'):
+        os.environ.pop(name, None)
+    return directory
@@ -0,0 +1,184 @@
+"""Sentence classifier benchmark.
+
+Compares the single-pass compiled classifier against the original
+per-finder re.search loops, on ordinary sentences and on pathological
+ones (long unpunctuated runs, digit runs, repeated near-miss keywords)
+that made the uncompiled lazy patterns backtrack quadratically.
+
+Run from backend-python/:  python -m benchmarks.bench_classifier
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks import use_scratch_stores
+
+# main opens its stores on import; keep them away from the real ones
+use_scratch_stores()
+
+from main import SimpleMCQGenerator
+
+
+def legacy_classify(sentences: List[str]) -> Dict[str, List[Dict]]:
+    """The finders as they were before the single-pass classifier, for reference timings"""
+    definition_patterns = [
+        r'(.+?)\s+is\s+(.+)', r'(.+?)\s+are\s+(.+)', r'(.+?)\s+means\s+(.+)', r'(.+?)\s+refers to\s+(.+)',
+        r'(.+?)\s+can be defined as\s+(.+)', r'(.+?)\s+is known as\s+(.+)', r'(.+?)\s+represents\s+(.+)',
+        r'(.+?)\s+involves\s+(.+)'
+    ]
+    cause_effect_patterns = [
+        r'(.+?)\s+causes?\s+(.+)', r'(.+?)\s+results? in\s+(.+)', r'(.+?)\s+leads? to\s+(.+)',
+        r'because of\s+(.+?),\s+(.+)', r'due to\s+(.+?),\s+(.+)', r'as a result of\s+(.+?),\s+(.+)',
+        r'(.+?)\s+produces?\s+(.+)', r'(.+?)\s+creates?\s+(.+)'
+    ]
+    comparison_keywords = [
+        'different from', 'differs from', 'unlike', 'in contrast to', 'whereas', 'however',
+        'on the other hand', 'compared to', 'similar to', 'like', 'than', 'versus', 'vs',
+        'while', 'although', 'but', 'conversely'
+    ]
+    process_keywords = [
+        'first', 'second', 'third', 'then', 'next', 'finally', 'after', 'before', 'during',
+        'process', 'step', 'stage', 'phase', 'procedure', 'method', 'approach', 'technique'
+    ]
+    factual_indicators = ['approximately', 'exactly', 'about', 'nearly', 'over', 'under', 'between', 'around']
+
+    found = {key: [] for key in ('definition_sentences', 'comparison_sentences', 'cause_effect_sentences', 'process_sentences', 'factual_sentences')}
+    for sentence in sentences:
+        for pattern in definition_patterns:
+            match = re.search(pattern, sentence, re.IGNORECASE)
+            if match and len(match.group(1).split()) <= 6 and len(match.group(2).split()) >= 3:
+                found['definition_sentences'].append({'sentence': sentence, 'term': match.group(1).strip()})
+                break
+    for sentence in sentences:
+        sentence_lower = sentence.lower()
+        for keyword in comparison_keywords:
+            if keyword in sentence_lower and len(sentence.split()) > 8:
+                found['comparison_sentences'].append({'sentence': sentence, 'comparison_type': keyword})
+                break
+    for sentence in sentences:
+        for pattern in cause_effect_patterns:
+            match = re.search(pattern, sentence, re.IGNORECASE)
+            if match:
+                found['cause_effect_sentences'].append({'sentence': sentence})
+                break
+    for sentence in sentences:
+        sentence_lower = sentence.lower()
+        keyword_count = sum(1 for keyword in process_keywords if keyword in sentence_lower)
+        if keyword_count >= 1 and len(sentence.split()) > 6:
+            found['process_sentences'].append({'sentence': sentence, 'keyword_count': keyword_count})
+    for sentence in sentences:
+        has_number = bool(re.search(r'\d+', sentence))
+        has_date = bool(re.search(r'\b\d{4}\b|\b\d{1,2}\/\d{1,2}\/\d{2,4}\b', sentence))
+        has_percentage = bool(re.search(r'\d+\s*%', sentence))
+        has_indicator = any(indicator in sentence.lower() for indicator in factual_indicators)
+        if (has_number or has_date or has_percentage or has_indicator) and len(sentence.split()) >= 6:
+            found['factual_sentences'].append({'sentence': sentence})
+    return found
+
+
+ORDINARY_SENTENCES = [
+    "Photosynthesis is the process by which green plants convert light energy into chemical energy.",
+    "The mitochondria is known as the powerhouse of the cell in most organisms.",
+    "Increased temperature causes the reaction rate to rise significantly in most experiments.",
+    "In 1953 scientists described the structure of DNA using approximately 40 images.",
+    "Unlike plant cells, animal cells do not have a rigid cell wall around the membrane.",
+    "First the sample is heated, then the solution is filtered during the next stage of the procedure.",
+    "Due to the lack of oxygen, the cells switch to anaerobic respiration and produce lactic acid.",
+    "About 70 % of the surface of the Earth is covered by water in oceans and seas.",
+]
+
+
+def pathological_sentences(size: int) -> Dict[str, str]:
+    """Sentences of roughly `size` characters that defeat the lazy (.+?) patterns"""
+    words = max(1, size // 6)
+    return {
+        # No verb anywhere: every start position scans to the end for every pattern
+        'no_verb': ' '.join(['word'] * words),
+        # Near-misses for every keyword ('this', 'island', 'causeway', 'leader')
+        'near_miss': ' '.join(['this island causeway leader'] * max(1, words // 4)),
+        # A verb at the very end, so every lazy group has to grow to the full length first
+        'late_verb': ' '.join(['token'] * words) + ' is',
+        # Long digit run without a percent sign: \d+\s*% backtracks on every start
+        'digit_run': '1' * size + ' items',
+        # Leading causal phrase with no clause comma to close it
+        'open_clause': 'because of ' + ' '.join(['reason'] * words),
+    }
+
+
+def time_call(fn: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: List[int], repeat: int, legacy_max_size: int) -> Dict:
+    generator = SimpleMCQGenerator()
+    results = {'ordinary': {}, 'pathological': {}}
+
+    corpus = ORDINARY_SENTENCES * 500
+    results['ordinary']['sentences'] = len(corpus)
+    results['ordinary']['compiled_s'] = time_call(lambda: generator._classify_sentences(corpus), repeat)
+    if legacy_max_size > 0:
+        results['ordinary']['legacy_s'] = time_call(lambda: legacy_classify(corpus), repeat)
+
+    for size in sizes:
+        for name, sentence in pathological_sentences(size).items():
+            row = results['pathological'].setdefault(name, {})
+            entry = {'compiled_s': time_call(lambda: generator._classify_sentences([sentence]), repeat)}
+            if size <= legacy_max_size:
+                entry['legacy_s'] = time_call(lambda: legacy_classify([sentence]), repeat)
+            row[str(size)] = entry
+
+    # Growth of the compiled classifier from the smallest to the largest input;
+    # linear behaviour keeps this close to the size ratio
+    size_ratio = sizes[-1] / sizes[0]
+    results['growth'] = {
+        name: {
+            'size_ratio': size_ratio,
+            'time_ratio': row[str(sizes[-1])]['compiled_s'] / max(row[str(sizes[0])]['compiled_s'], 1e-9)
+        }
+        for name, row in results['pathological'].items()
+    }
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 4000, 32000], help='pathological sentence lengths in characters')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy-max-size', type=int, default=4000,
+                        help='largest pathological input to run the legacy finders on (they are quadratic); 0 skips them')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args(argv)
+
+    results = run(sorted(args.sizes), args.repeat, args.legacy_max_size)
+
+    ordinary = results['ordinary']
+    print(f"ordinary ({ordinary['sentences']} sentences): compiled {ordinary['compiled_s'] * 1000:.1f} ms", end='')
+    print(f", legacy {ordinary['legacy_s'] * 1000:.1f} ms" if 'legacy_s' in ordinary else '')
+    for name, row in results['pathological'].items():
+        for size, entry in row.items():
+            line = f"{name:>12} {size:>7} chars: compiled {entry['compiled_s'] * 1000:8.2f} ms"
+            if 'legacy_s' in entry:
+                line += f", legacy {entry['legacy_s'] * 1000:10.2f} ms"
+            print(line)
+    for name, growth in results['growth'].items():
+        print(f"{name:>12} growth: {growth['time_ratio']:.1f}x time for {growth['size_ratio']:.0f}x input")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    # Fail loudly if any pathological input grows clearly worse than linearly
+    worst = max(growth['time_ratio'] / growth['size_ratio'] for growth in results['growth'].values())
+    return 0 if worst < 3 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
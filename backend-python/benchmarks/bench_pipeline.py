@@ -0,0 +1,216 @@
+"""MCQ pipeline benchmark.
+
+Times every stage of the upload pipeline on the synthetic corpus:
+PDF text extraction, tokenization, each _find_* method, each _generate_*
+method, and end-to-end POST /upload through the FastAPI test client
+(also with the large-document map-reduce mode forced on when the analysis
+pool has more than one worker; set MCQ_WORKERS to compare core counts).
+Reports MB/s of text and questions/s, writes machine-readable JSON, and
+can compare a run against a stored baseline.
+
+Run from backend-python/:
+    python -m benchmarks.bench_pipeline --sizes 10k 100k 1m --output results.json
+    python -m benchmarks.bench_pipeline --baseline results.json --fail-on-regression
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import nlp_resources
+
+from benchmarks import use_scratch_stores
+
+# Keep the benchmark's caches and question bank away from the real ones; must happen before importing main
+use_scratch_stores()
+# Every upload is timed cold: page partials left by an earlier repeat or run would turn the upload stages into cache hits
+os.environ['MCQ_PAGE_CACHE'] = '0'
+
+import main
+from benchmarks.corpus import SIZES, make_document
+
+QUESTION_COUNT = 15
+
+FINDERS = ['_find_definition_sentences', '_find_comparison_sentences', '_find_cause_effect_sentences',
+           '_find_process_sentences', '_find_factual_sentences']
+
+# Generators with the per-type counts generate_mcq_questions asks for
+GENERATORS = {
+    '_generate_definition_questions': max(2, QUESTION_COUNT // 4),
+    '_generate_factual_questions': max(2, QUESTION_COUNT // 3),
+    '_generate_application_questions': max(1, QUESTION_COUNT // 5),
+    '_generate_analysis_questions': max(1, QUESTION_COUNT // 6),
+    '_generate_comparison_questions': max(1, QUESTION_COUNT // 8),
+}
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> tuple:
+    """(best wall time, last result) over repeat runs"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_size(label: str, repeat: int, client, seed: int) -> Dict[str, Any]:
+    generator = main.mcq_generator
+    pdf = make_document(SIZES[label], seed)
+    stages: Dict[str, float] = {}
+
+    # The pipeline reads PDFs from (memory-mapped) files, as uploads are spooled to disk
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as pdf_file:
+        pdf_file.write(pdf)
+        pdf_file.flush()
+        stages['extract_text_from_pdf'], text = best_of(lambda: main.extract_text_from_pdf(pdf_file.name), repeat)
+        pages = list(main.iter_pdf_pages(pdf_file.name))
+    text_mb = len(text.encode('utf-8')) / (1024 * 1024)
+
+    stages['sentence_tokenize'], sentences = best_of(lambda: list(generator.iter_sentences(pages)), repeat)
+    stages['word_tokenize'], _ = best_of(lambda: [nlp_resources.word_tokenize(s.lower()) for s in sentences], repeat)
+
+    for finder in FINDERS:
+        stages[finder], _ = best_of(lambda: getattr(generator, finder)(sentences), repeat)
+
+    stages['extract_content'], content = best_of(lambda: generator.extract_content_from_pages(pages), repeat)
+
+    for name, count in GENERATORS.items():
+        random.seed(seed)
+        stages[name], _ = best_of(lambda: getattr(generator, name)(content, count), repeat)
+
+    random.seed(seed)
+    stages['generate_mcq_questions'], questions = best_of(lambda: generator.generate_mcq_questions(content, QUESTION_COUNT), repeat)
+
+    result = {
+        'text_bytes': len(text),
+        'pdf_bytes': len(pdf),
+        'pages': len(pages),
+        'sentences': len(sentences),
+        'questions': len(questions),
+        'stages': stages,
+    }
+
+    if client is not None:
+        def upload():
+            main.quiz_cache.clear()
+            response = client.post('/upload', files={'file': (f'{label}.pdf', pdf, 'application/pdf')})
+            response.raise_for_status()
+            return response.json()['data']['metadata']['total_questions']
+        stages['upload_end_to_end'], result['upload_questions'] = best_of(upload, repeat)
+        
+        if main.analysis_pool.max_workers > 1:
+            # Same upload with the large-document mode forced on, to see how it scales with workers
+            limits = main.MAP_REDUCE_MIN_BYTES, main.MAP_REDUCE_MIN_PAGES
+            main.MAP_REDUCE_MIN_BYTES, main.MAP_REDUCE_MIN_PAGES = 0, 0
+            try:
+                stages['upload_map_reduce'], _ = best_of(upload, repeat)
+            finally:
+                main.MAP_REDUCE_MIN_BYTES, main.MAP_REDUCE_MIN_PAGES = limits
+
+    result['throughput_mb_s'] = {
+        stage: text_mb / seconds for stage, seconds in stages.items()
+        if seconds > 0 and stage in ('extract_text_from_pdf', 'sentence_tokenize', 'word_tokenize', 'extract_content', 'upload_end_to_end', 'upload_map_reduce')
+    }
+    result['questions_per_s'] = {
+        'generate_mcq_questions': len(questions) / stages['generate_mcq_questions'] if stages['generate_mcq_questions'] else None,
+    }
+    if 'upload_end_to_end' in stages:
+        result['questions_per_s']['upload_end_to_end'] = result['upload_questions'] / stages['upload_end_to_end']
+    return result
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Stage-by-stage time ratios against the baseline; ratio > 1 + threshold is a regression"""
+    rows = []
+    for label, result in current['results'].items():
+        base = baseline.get('results', {}).get(label)
+        if not base:
+            continue
+        for stage, seconds in result['stages'].items():
+            base_seconds = base['stages'].get(stage)
+            if not base_seconds:
+                continue
+            ratio = seconds / base_seconds
+            rows.append({
+                'size': label,
+                'stage': stage,
+                'baseline_s': base_seconds,
+                'current_s': seconds,
+                'ratio': ratio,
+                'regression': ratio > 1 + threshold,
+            })
+    return rows
+
+
+def main_cli(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['10k', '100k', '1m'], choices=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-upload', action='store_true', help='skip the end-to-end /upload stage')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against results previously written with --output')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown that counts as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'results': {},
+    }
+
+    client = None
+    if not args.no_upload:
+        from fastapi.testclient import TestClient
+        client = TestClient(main.app)
+        client.__enter__()
+
+    try:
+        for label in args.sizes:
+            result = bench_size(label, args.repeat, client, args.seed)
+            report['results'][label] = result
+            print(f"== {label}: {result['text_bytes']} chars, {result['pages']} pages, {result['sentences']} sentences")
+            for stage, seconds in result['stages'].items():
+                throughput = result['throughput_mb_s'].get(stage)
+                extra = f"  {throughput:8.2f} MB/s" if throughput else ''
+                print(f"   {stage:<34} {seconds * 1000:10.2f} ms{extra}")
+            for stage, rate in result['questions_per_s'].items():
+                print(f"   {stage:<34} {rate:10.1f} questions/s")
+    finally:
+        if client is not None:
+            client.__exit__(None, None, None)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print(f"== compared with {args.baseline}")
+        for row in rows:
+            flag = '  REGRESSION' if row['regression'] else ''
+            print(f"   {row['size']:>5} {row['stage']:<34} {row['ratio']:6.2f}x{flag}")
+        if args.fail_on_regression and any(row['regression'] for row in rows):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,155 @@
+"""Tokenizer benchmark.
+
+Times the tokenization stage three ways on the synthetic corpus: the
+original two-pass scheme (punkt sentences, then nltk.word_tokenize on
+each lowercased sentence, which runs punkt again), the single-pass punkt
+tokenizer the pipeline uses by default, and the compiled-regex mode
+(MCQ_TOKENIZER=regex). Accuracy of each mode is reported against the
+original: sentence boundaries (precision / recall over sentence
+strings), the counted word frequencies, and the top-30 key terms.
+
+A hand-written sample with abbreviations, decimals, initials and quotes
+is included, since the generated corpus has none and would flatter the
+regex mode; its sentences are scored against the correct segmentation,
+so punkt's own mistakes show up there too.
+
+Run from backend-python/:
+    python -m benchmarks.bench_tokenizer --sizes 100k 1m --json tokenizer.json
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+import nlp_resources
+from benchmarks import use_scratch_stores
+from benchmarks.corpus import SIZES, generate_text, paginate
+
+# main opens its stores on import; keep them away from the real ones
+use_scratch_stores()
+
+from main import SimpleMCQGenerator
+from text_tokenizers import get_tokenizer
+
+# Correct segmentation, one sentence per line
+EDGE_SENTENCES = """Dr. Smith measured 3.5 ml of the solution at 10 a.m. on Jan. 5.
+The result, i.e. the yield, was 42.7% higher than expected.
+"Is this correct?" she asked.
+J. R. R. Tolkien wrote fiction, e.g. novels and poems; his work vs. that of C. S. Lewis is often compared.
+The U.S. economy grew by approx. 2.1 percent.
+Mitochondria produce ATP!
+Photosynthesis converts light energy into chemical energy (see Fig. 3).
+It doesn't happen at night.
+Prof. Brown's well-known theory explains why the rate-limiting step matters.""".splitlines()
+
+
+class LegacyTokenizer:
+    """Sentences and words as extract_content produced them before the single-pass tokenizer:
+    punkt, then nltk.word_tokenize (punkt again, then Treebank) on each lowercased sentence"""
+
+    name = 'legacy'
+
+    def tokenize(self, text: str) -> Tuple[List[str], List[List[str]]]:
+        sentences = nlp_resources.sent_tokenize(text)
+        return sentences, [self.words(sentence) for sentence in sentences]
+
+    def words(self, sentence: str) -> List[str]:
+        return nlp_resources.word_tokenize(' '.join(sentence.split()).lower())
+
+
+def pipeline_tokenize(generator: SimpleMCQGenerator, pages: List[str]) -> Tuple[List[str], List[List[str]]]:
+    sentences: List[str] = []
+    words: List[List[str]] = []
+    for batch, batch_words in generator.iter_page_tokens(pages):
+        sentences.extend(batch)
+        words.extend(batch_words)
+    return sentences, words
+
+
+def word_freq(words: List[List[str]]) -> Counter:
+    """The counts _analyze_batch keeps: alphabetic, longer than three letters, not a stop word"""
+    stop_words = nlp_resources.stop_words()
+    return Counter(w for sentence in words for w in sentence if w.isalpha() and len(w) > 3 and w not in stop_words)
+
+
+def accuracy(reference: Tuple[List[str], List[List[str]]], candidate: Tuple[List[str], List[List[str]]],
+             gold_sentences: List[str] = None) -> Dict[str, float]:
+    """Agreement of a candidate's sentences (with the gold ones when known, else the reference's) and word counts"""
+    ref_sentences, cand_sentences = Counter(gold_sentences or reference[0]), Counter(candidate[0])
+    common = sum((ref_sentences & cand_sentences).values())
+    ref_freq, cand_freq = word_freq(reference[1]), word_freq(candidate[1])
+    ref_top = {word for word, _ in ref_freq.most_common(30)}
+    cand_top = {word for word, _ in cand_freq.most_common(30)}
+    return {
+        'sentences': sum(cand_sentences.values()),
+        'sentence_precision': common / max(1, sum(cand_sentences.values())),
+        'sentence_recall': common / max(1, sum(ref_sentences.values())),
+        # Share of counted words that differ (L1 distance over total counts)
+        'word_count_difference': sum(((ref_freq - cand_freq) + (cand_freq - ref_freq)).values()) / max(1, sum(ref_freq.values())),
+        'key_term_overlap': len(ref_top & cand_top) / max(1, len(ref_top)),
+    }
+
+
+def best_time(fn: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(inputs: Dict[str, List[str]], repeat: int) -> Dict[str, Any]:
+    legacy = SimpleMCQGenerator(tokenizer=LegacyTokenizer())
+    generators = {name: SimpleMCQGenerator(tokenizer=get_tokenizer(name)) for name in ('punkt', 'regex')}
+    results = {}
+    for label, pages in inputs.items():
+        gold = EDGE_SENTENCES if label == 'edge_sample' else None
+        legacy_s, reference = best_time(lambda: pipeline_tokenize(legacy, pages), repeat)
+        row: Dict[str, Any] = {'characters': sum(map(len, pages)), 'legacy_s': legacy_s}
+        if gold:
+            row['legacy'] = accuracy(reference, reference, gold)
+        for name, generator in generators.items():
+            seconds, tokens = best_time(lambda: pipeline_tokenize(generator, pages), repeat)
+            row[name] = {'seconds': seconds, 'speedup': legacy_s / seconds, **accuracy(reference, tokens, gold)}
+        results[label] = row
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['100k', '1m'], choices=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args(argv)
+
+    nlp_resources.load()
+    # The sample as PDF extraction would give it: wrapped lines
+    inputs = {'edge_sample': ['\n'.join(lines) for lines in paginate(' '.join(EDGE_SENTENCES), line_width=60)]}
+    for label in args.sizes:
+        inputs[label] = ['\n'.join(lines) for lines in paginate(generate_text(SIZES[label], args.seed))]
+    results = run(inputs, args.repeat)
+
+    for label, row in results.items():
+        print(f"== {label}: {row['characters']} chars, legacy two-pass {row['legacy_s'] * 1000:.1f} ms")
+        for name in ('legacy', 'punkt', 'regex'):
+            if name not in row:
+                continue
+            entry = row[name]
+            timing = f"{entry['seconds'] * 1000:9.1f} ms  {entry['speedup']:5.1f}x" if 'seconds' in entry else ' ' * 19
+            print(f"   {name:<6} {timing}  "
+                  f"sentences P={entry['sentence_precision']:.3f} R={entry['sentence_recall']:.3f}  "
+                  f"word counts differ {entry['word_count_difference'] * 100:.2f}%  "
+                  f"key terms {entry['key_term_overlap'] * 100:.0f}% shared")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
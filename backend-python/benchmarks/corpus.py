@@ -0,0 +1,115 @@
+"""Synthetic, reproducible benchmark corpus.
+
+Generates textbook-like text (definitions, figures, cause/effect,
+comparisons, process steps and filler) at a requested size, and renders
+it as a minimal multi-page PDF that PyPDF2 can extract again.
+"""
+import random
+from typing import List
+
+# Named sizes accepted on the command line, in bytes of text
+SIZES = {
+    '10k': 10 * 1024,
+    '100k': 100 * 1024,
+    '1m': 1024 * 1024,
+    '10m': 10 * 1024 * 1024,
+    '50m': 50 * 1024 * 1024,
+}
+
+TERMS = ['photosynthesis', 'the mitochondrion', 'an enzyme', 'osmosis', 'a catalyst', 'the algorithm',
+         'a database index', 'inflation', 'the market equilibrium', 'a metaphor', 'the feudal system',
+         'a derivative', 'the theorem', 'a protocol', 'the dynasty', 'a hypothesis']
+NOUNS = ['energy', 'cells', 'data', 'revenue', 'pressure', 'temperature', 'the network', 'the empire',
+         'the reaction', 'demand', 'the population', 'the signal', 'the solution', 'the character']
+VERBS = ['increases', 'reduces', 'transforms', 'stabilizes', 'controls', 'measures', 'transports']
+FILLER = ['Students should review this section carefully before the next lecture',
+          'The following paragraphs build on the previous chapter',
+          'Several examples are discussed in the exercises at the end of the unit',
+          'Historians and scientists have debated this topic for a long time']
+
+TEMPLATES = [
+    lambda r: f"{r.choice(TERMS).capitalize()} is a process that {r.choice(VERBS)} {r.choice(NOUNS)} in most systems.",
+    lambda r: f"{r.choice(TERMS).capitalize()} refers to the way {r.choice(NOUNS)} {r.choice(VERBS)} {r.choice(NOUNS)}.",
+    lambda r: f"In {r.randint(1200, 2020)} approximately {r.randint(2, 950)} researchers studied {r.choice(NOUNS)} across {r.randint(2, 60)} regions.",
+    lambda r: f"About {r.randint(1, 99)}% of {r.choice(NOUNS)} is lost when {r.choice(NOUNS)} {r.choice(VERBS)} {r.choice(NOUNS)}.",
+    lambda r: f"Higher {r.choice(NOUNS)} causes {r.choice(NOUNS)} to change rapidly under pressure.",
+    lambda r: f"Due to rising {r.choice(NOUNS)}, {r.choice(NOUNS)} {r.choice(VERBS)} {r.choice(NOUNS)} within weeks.",
+    lambda r: f"Unlike {r.choice(TERMS)}, {r.choice(TERMS)} {r.choice(VERBS)} {r.choice(NOUNS)} without any external input at all.",
+    lambda r: f"First the sample is prepared, then {r.choice(NOUNS)} is measured during the next stage of the procedure.",
+    lambda r: f"{r.choice(FILLER)}.",
+]
+
+
+def generate_text(size_bytes: int, seed: int = 0) -> str:
+    """Deterministic text of roughly size_bytes characters"""
+    rnd = random.Random(seed)
+    parts: List[str] = []
+    length = 0
+    while length < size_bytes:
+        sentence = rnd.choice(TEMPLATES)(rnd)
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return ' '.join(parts)
+
+
+def paginate(text: str, line_width: int = 95, lines_per_page: int = 60) -> List[List[str]]:
+    """Wrap text into fixed-width lines and group them into pages"""
+    lines: List[str] = []
+    current: List[str] = []
+    current_len = 0
+    for word in text.split(' '):
+        if current and current_len + len(word) + 1 > line_width:
+            lines.append(' '.join(current))
+            current, current_len = [], 0
+        current.append(word)
+        current_len += len(word) + 1
+    if current:
+        lines.append(' '.join(current))
+    return [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """Render pages of text lines as a minimal PDF (Helvetica, one text object per line)"""
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    # Page tree object number is known up front: font + (content, page) per page + 1
+    pages_id = 1 + 2 * len(pages) + 1
+    page_ids = []
+    for lines in pages:
+        commands = []
+        y = 800
+        for line in lines:
+            escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            commands.append(f"BT /F1 9 Tf 20 {y} Td ({escaped}) Tj ET")
+            y -= 12
+        stream = '\n'.join(commands).encode('latin-1', 'replace')
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)
+        ))
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    add(b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref)
+    return bytes(out)
+
+
+def make_document(size_bytes: int, seed: int = 0) -> bytes:
+    """Synthetic PDF carrying roughly size_bytes of text"""
+    return make_pdf(paginate(generate_text(size_bytes, seed)))
@@ -0,0 +1,100 @@
+import bisect
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+class Tier:
+    """How much work a quiz may cost: a time budget, early stopping and page sampling"""
+
+    def __init__(self, name: str, budget_seconds: Optional[float], early_stop: bool = False,
+                 max_pages: Optional[int] = None, analysis_share: float = 0.7):
+        self.name = name
+        self.budget_seconds = budget_seconds
+        # Stop reading pages once enough candidates are found for the question count
+        self.early_stop = early_stop
+        # Analyze at most this many pages, sampled in blocks across the document
+        self.max_pages = max_pages
+        # Part of the budget analysis may use; the rest is kept for generation
+        self.analysis_share = analysis_share
+
+
+TIERS = {
+    'fast': Tier('fast', 3.0, early_stop=True, max_pages=40),
+    'standard': Tier('standard', 15.0),
+    'thorough': Tier('thorough', None),
+}
+
+# Consecutive pages per sampled block: sentences running across a page break stay whole inside a block
+SAMPLE_BLOCK_PAGES = 4
+
+
+class Deadline:
+    """A tier's budget turned into absolute wall-clock times, plus a record of what was skipped to meet them.
+
+    Wall-clock (not monotonic) time so the same deadline can be checked in
+    the analysis worker processes it is pickled to. Workers get copies, so
+    what they skip travels back in the quiz metadata, not on this object.
+    """
+
+    def __init__(self, tier: Tier, seconds: Optional[float] = None):
+        self.tier = tier
+        self.seconds = seconds if seconds is not None else tier.budget_seconds
+        self.pages_total: Optional[int] = None
+        self.pages_planned: Optional[int] = None
+        self.pages_skipped = 0
+        self.generators_skipped: List[str] = []
+        self.start()
+
+    def start(self) -> None:
+        """(Re)start the clock, e.g. when a queued job is picked up"""
+        self.started_at = time.time()
+        self.expires_at = None if self.seconds is None else self.started_at + self.seconds
+        self.analysis_until = None if self.seconds is None else self.started_at + self.seconds * self.tier.analysis_share
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def analysis_expired(self) -> bool:
+        return self.analysis_until is not None and time.time() >= self.analysis_until
+
+    @property
+    def cut_short(self) -> bool:
+        """True when time ran out and work was dropped (so the result is not reproducible)"""
+        return bool(self.pages_skipped or self.generators_skipped)
+
+    def sample_pages(self, page_count: int) -> Optional[List[range]]:
+        """Blocks of consecutive pages spread evenly over the document, or None when every page is to be analyzed"""
+        self.pages_total = page_count
+        max_pages = self.tier.max_pages
+        if not max_pages or page_count <= max_pages:
+            return None
+        blocks = max(2, max_pages // SAMPLE_BLOCK_PAGES)
+        step = (page_count - SAMPLE_BLOCK_PAGES) / (blocks - 1)
+        sample = [range(round(block * step), round(block * step) + SAMPLE_BLOCK_PAGES) for block in range(blocks)]
+        self.pages_planned = blocks * SAMPLE_BLOCK_PAGES
+        return sample
+
+    def pages_until_expired(self, pages: Iterable[tuple], planned: Sequence[int]) -> Iterator[tuple]:
+        """Pass (index, text) pages through until the analysis share of the budget is used up.
+
+        planned holds the ascending indices of the pages the run would
+        read; those not reached in time are added to pages_skipped. The
+        first page is always read, so even an expired deadline yields a quiz.
+        """
+        for read, (index, page_text) in enumerate(pages):
+            if read and self.analysis_expired():
+                self.pages_skipped += len(planned) - bisect.bisect_left(planned, index)
+                return
+            yield index, page_text
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            'tier': self.tier.name,
+            'deadline_seconds': self.seconds,
+            'elapsed_seconds': round(time.time() - self.started_at, 4),
+            'deadline_met': self.expires_at is None or time.time() <= self.expires_at,
+            'pages_total': self.pages_total,
+            'pages_planned': self.pages_planned,
+            'pages_skipped': self.pages_skipped,
+            'generators_skipped': self.generators_skipped,
+        }
@@ -0,0 +1,214 @@
+import math
+import re
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from append_log import JsonLinesLog
+
+# Lowercased words of three or more letters; shorter ones carry no topic
+WORD_RE = re.compile(r'[a-z][a-z\-]{2,}')
+
+# Hashed feature space: large enough that unrelated words rarely collide
+N_FEATURES = 1 << 20
+
+# Short function words that would otherwise dominate short definitions
+STOP_WORDS = frozenset("""
+the and that this with from into which what when where while their there these those have has had
+been being are was were will would can could should may might must also than then them they its
+for not but all any each other such only very more most some many much over under about between
+""".split())
+
+
+class _Segment:
+    """Immutable column-sparse block of postings: for each feature, its (document id, weight) pairs"""
+
+    __slots__ = ('features', 'indptr', 'ids', 'weights')
+
+    def __init__(self, features: np.ndarray, ids: np.ndarray, weights: np.ndarray):
+        order = np.argsort(features, kind='stable')
+        features = features[order]
+        self.features, starts = np.unique(features, return_index=True)
+        self.indptr = np.append(starts, len(features))
+        self.ids = ids[order]
+        self.weights = weights[order]
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def merged(self, other: '_Segment') -> '_Segment':
+        return _Segment(
+            np.concatenate([np.repeat(self.features, np.diff(self.indptr)), np.repeat(other.features, np.diff(other.indptr))]),
+            np.concatenate([self.ids, other.ids]),
+            np.concatenate([self.weights, other.weights])
+        )
+
+    def lookup(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(start, stop) posting offsets of each feature; empty ranges for absent ones"""
+        index = np.searchsorted(self.features, features)
+        present = index < len(self.features)
+        present[present] = self.features[index[present]] == features[present]
+        starts = np.where(present, self.indptr[np.minimum(index, len(self.features) - 1)], 0)
+        stops = np.where(present, self.indptr[np.minimum(index + 1, len(self.features))], 0)
+        return starts, stops
+
+
+class DistractorIndex:
+    """Cosine-similarity index over definitions from every analyzed document.
+
+    Definitions are turned into hashed unigram/bigram vectors (sublinear
+    term frequency, L2-normalized when added) and stored column-wise, the
+    layout of a sparse CSC matrix. A lookup only touches the postings of
+    the query's own features, weights them by their current inverse
+    document frequency and accumulates the scores with ``np.bincount``, so
+    it stays in the low milliseconds with hundreds of thousands of stored
+    definitions.
+
+    Each batch of additions becomes a new immutable segment; segments of
+    similar size are merged as they accumulate, so adding never rebuilds
+    the whole index and there are only O(log n) segments to search.
+
+    When ``path`` is given, definitions are also appended to a JSON-lines
+    log there. Every process using the same log picks up the others'
+    additions on its next lookup, and a restarted process reloads them.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._log = JsonLinesLog(path) if path else None
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._entries: List[Tuple[str, str, str]] = []  # (term, definition, subject)
+        self._seen = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _features(text: str) -> Dict[int, float]:
+        words = [word for word in WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
+        counts: Dict[int, int] = {}
+        for gram in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            feature = zlib.crc32(gram.encode('utf-8')) % N_FEATURES
+            counts[feature] = counts.get(feature, 0) + 1
+        return {feature: 1.0 + math.log(count) for feature, count in counts.items()}
+
+    def _insert(self, records: Iterable[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+        """Index (term, definition, subject) records as one new segment; returns the ones that were new"""
+        features, ids, weights = [], [], []
+        added = []
+        for term, definition, subject in records:
+            key = (term.lower(), definition.lower())
+            if key in self._seen:
+                continue
+            vector = self._features(definition)
+            if not vector:
+                continue
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+            doc_id = len(self._entries)
+            features.extend(vector)
+            ids.extend([doc_id] * len(vector))
+            weights.extend(weight / norm for weight in vector.values())
+            self._entries.append((term, definition, subject))
+            self._seen.add(key)
+            added.append((term, definition, subject))
+
+        if added:
+            self._segments.append(_Segment(np.array(features, dtype=np.int64), np.array(ids, dtype=np.int32),
+                                           np.array(weights, dtype=np.float32)))
+            # Binary-counter merging keeps segment sizes roughly doubling from newest to oldest
+            while len(self._segments) > 1 and self._segments[-1].size * 2 >= self._segments[-2].size:
+                newest = self._segments.pop()
+                self._segments[-1] = self._segments[-1].merged(newest)
+        return added
+
+    def sync(self) -> None:
+        """Load definitions other processes appended to the log since the last sync"""
+        if self._log is None:
+            return
+        with self._lock:
+            self._insert((record['term'], record['definition'], record.get('subject', 'general'))
+                         for record in self._log.read_new() if 'term' in record and 'definition' in record)
+
+    def add(self, definitions: Iterable[Dict[str, Any]], subject: str = 'general') -> int:
+        """Add {'term', 'definition'} records; returns how many were new"""
+        with self._lock:
+            self.sync()
+            added = self._insert((record['term'], record['definition'], subject) for record in definitions)
+            if added and self._log is not None:
+                self._log.append({'term': term, 'definition': definition, 'subject': subject}
+                                 for term, definition, subject in added)
+                # Our own lines are already indexed; skip them unless someone else wrote in between
+                self.sync()
+        return len(added)
+
+    def similar(self, definition: str, k: int = 3, exclude_term: Optional[str] = None,
+                max_similarity: float = 0.9, max_length: Optional[int] = None) -> List[str]:
+        """Up to k stored definitions most similar to the given one, without being it.
+
+        Definitions of exclude_term, the definition itself and near
+        paraphrases of it (relative similarity above max_similarity) are
+        skipped, since those would be correct answers too.
+        """
+        with self._lock:
+            self.sync()
+            query = self._features(definition)
+            if not self._entries or not query:
+                return []
+
+            features = np.fromiter(query, dtype=np.int64, count=len(query))
+            tf = np.fromiter(query.values(), dtype=np.float64, count=len(query))
+            ranges = [segment.lookup(features) for segment in self._segments]
+
+            # Document frequency of each query feature across all segments
+            df = sum(stops - starts for starts, stops in ranges)
+            idf = np.log((len(self._entries) + 1) / (df + 1)) + 1.0
+            query_weights = tf * idf * idf
+
+            ids, weights = [], []
+            for segment, (starts, stops) in zip(self._segments, ranges):
+                for i in np.flatnonzero(stops > starts):
+                    ids.append(segment.ids[starts[i]:stops[i]])
+                    weights.append(segment.weights[starts[i]:stops[i]] * query_weights[i])
+            if not ids:
+                return []
+
+            scores = np.bincount(np.concatenate(ids), weights=np.concatenate(weights), minlength=len(self._entries))
+            # Relative similarity: a stored copy of the query itself scores 1.0
+            scores *= math.sqrt(float(tf @ tf)) / float(tf @ (tf * idf * idf))
+
+            candidates = np.flatnonzero(scores > 0)
+            pool = min(len(candidates), k * 8)
+            top = candidates[np.argpartition(-scores[candidates], pool - 1)[:pool]]
+            top = top[np.argsort(-scores[top], kind='stable')]
+
+            exclude_term = exclude_term.lower() if exclude_term else None
+            target = definition.strip().lower()
+            results: List[str] = []
+            seen = {target}
+            for doc_id in top:
+                term, text, _ = self._entries[doc_id]
+                if scores[doc_id] > max_similarity or text.strip().lower() in seen:
+                    continue
+                if exclude_term and term.lower() == exclude_term:
+                    continue
+                if max_length and len(text) >= max_length:
+                    continue
+                seen.add(text.strip().lower())
+                results.append(text)
+                if len(results) == k:
+                    break
+            return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self.sync()
+            return {
+                'definitions': len(self._entries),
+                'segments': len(self._segments),
+                'postings': sum(segment.size for segment in self._segments),
+                'path': self.path
+            }
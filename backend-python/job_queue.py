@@ -0,0 +1,236 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from metrics import Histogram
+
+
+class QueueFull(Exception):
+    """The job queue is at its depth limit; the client should retry later"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class QueueClosed(Exception):
+    """The job queue is not accepting work (not started yet, or shutting down)"""
+
+
+class JobCancelled(Exception):
+    """The job was discarded before it finished, because nobody is waiting for its result any more"""
+
+
+class _PendingJobs(asyncio.Queue):
+    # asyncio.Queue keeps its items in self._queue (the deque its _init/_get/_put hooks use)
+    def remove(self, job: 'Job') -> bool:
+        try:
+            self._queue.remove(job)
+        except ValueError:
+            return False
+        return True
+
+
+class Job:
+    """One queued unit of work and, once it has run, its result or error
+
+    cleanup, if given, is called once the job reaches any final state:
+    finished, failed, cancelled, or dropped when the queue stops.
+    """
+
+    __slots__ = ('id', 'kind', 'info', 'status', 'result', 'error', 'enqueued_at', 'started_at', 'finished_at',
+                 'cleanup', '_run', '_task', '_done')
+
+    def __init__(self, kind: str, run: Callable[[], Awaitable[Any]], info: Dict[str, Any],
+                 cleanup: Optional[Callable[[], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.info = info
+        self.status = 'queued'
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.enqueued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cleanup = cleanup
+        self._run = run
+        self._task: Optional[asyncio.Future] = None
+        self._done = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def queue_wait_seconds(self) -> Optional[float]:
+        return None if self.started_at is None else self.started_at - self.enqueued_at
+
+    @property
+    def service_seconds(self) -> Optional[float]:
+        return None if self.finished_at is None or self.started_at is None else self.finished_at - self.started_at
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the job has finished; returns False on timeout"""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class JobQueue:
+    """Bounded queue of upload jobs drained by a fixed number of workers.
+
+    At most ``concurrency`` jobs run at once and at most ``max_depth`` wait
+    behind them; ``submit`` raises QueueFull beyond that instead of letting
+    work (and the uploaded bytes it holds) pile up in memory. Finished jobs
+    are kept for ``keep_seconds`` (and at most ``max_kept`` of them) so
+    clients can collect their results.
+
+    Queue wait and service time of every job are observed on the given
+    histograms, labelled with the job kind.
+    """
+
+    def __init__(self, concurrency: int = 1, max_depth: int = 32, keep_seconds: float = 3600, max_kept: int = 1000,
+                 queue_wait: Optional[Histogram] = None, service_time: Optional[Histogram] = None):
+        self.concurrency = max(1, concurrency)
+        self.max_depth = max_depth
+        self.keep_seconds = keep_seconds
+        self.max_kept = max_kept
+        self.queue_wait = queue_wait
+        self.service_time = service_time
+        self._queue: Optional[_PendingJobs] = None
+        self._workers: List[asyncio.Task] = []
+        # id -> job, oldest first
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._running = 0
+        # Moving average of service time, for Retry-After hints
+        self._average_service = 0.0
+        self.counters = {'submitted': 0, 'rejected': 0, 'succeeded': 0, 'failed': 0, 'cancelled': 0}
+
+    @property
+    def accepting(self) -> bool:
+        return self._queue is not None
+
+    def start(self) -> None:
+        """Start the workers; must be called from the event loop"""
+        if self._queue is not None:
+            return
+        self._queue = _PendingJobs(maxsize=self.max_depth)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Stop accepting jobs and cancel the workers; queued jobs fail with QueueClosed"""
+        queue, self._queue = self._queue, None
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while queue is not None and not queue.empty():
+            self._finish(queue.get_nowait(), error=QueueClosed("Job queue shut down before the job ran"))
+
+    def submit(self, kind: str, run: Callable[[], Awaitable[Any]], cleanup: Optional[Callable[[], None]] = None,
+               **info: Any) -> Job:
+        """Queue ``run()``; raises QueueFull when max_depth jobs are already waiting"""
+        if self._queue is None:
+            raise QueueClosed("Job queue is not running")
+        self._prune()
+        job = Job(kind, run, info, cleanup)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counters['rejected'] += 1
+            raise QueueFull(self.retry_after()) from None
+        self._jobs[job.id] = job
+        self.counters['submitted'] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def discard(self, job: Job) -> None:
+        """Forget a job whose client has its result or has gone away.
+
+        A job that hasn't finished is cancelled: taken off the queue if it
+        is still waiting, its task cancelled if it is running.
+        """
+        if not job.done:
+            if job.status == 'queued':
+                if self._queue is not None and self._queue.remove(job):
+                    self._finish(job, error=JobCancelled("Job was discarded before it ran"))
+            elif job._task is not None:
+                job._task.cancel()
+        self._jobs.pop(job.id, None)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up, from the recent service time"""
+        waiting = self._queue.qsize() if self._queue is not None else 0
+        return max(1, round(self._average_service * (waiting / self.concurrency + 1)))
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = 'running'
+            job.started_at = time.time()
+            self._running += 1
+            if self.queue_wait is not None:
+                self.queue_wait.observe(job.queue_wait_seconds, kind=job.kind)
+            # Its own task, so discard() can cancel the job without stopping this worker
+            task = job._task = asyncio.ensure_future(job._run())
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                self._running -= 1
+                self._finish(job, error=QueueClosed("Job queue shut down while the job was running"))
+                raise
+            self._running -= 1
+            if task.cancelled():
+                self._finish(job, error=JobCancelled("Job was discarded while it was running"))
+            elif task.exception() is not None:
+                self._finish(job, error=task.exception())
+            else:
+                self._finish(job, result=task.result())
+
+    def _finish(self, job: Job, result: Any = None, error: Optional[BaseException] = None) -> None:
+        job.finished_at = time.time()
+        job.result = result
+        job.error = error
+        if isinstance(error, JobCancelled):
+            job.status = 'cancelled'
+        else:
+            job.status = 'failed' if error is not None else 'succeeded'
+        job._run = None
+        job._task = None
+        self.counters[job.status] += 1
+        if job.service_seconds is not None:
+            self._average_service += 0.2 * (job.service_seconds - self._average_service)
+            if self.service_time is not None:
+                self.service_time.observe(job.service_seconds, kind=job.kind)
+        if job.cleanup is not None:
+            job.cleanup()
+        job._done.set()
+
+    def _prune(self) -> None:
+        """Forget finished jobs past keep_seconds, and the oldest ones beyond max_kept"""
+        cutoff = time.time() - self.keep_seconds
+        finished = [job for job in self._jobs.values() if job.done]
+        excess = len(self._jobs) - self.max_kept
+        for job in finished:
+            if job.finished_at < cutoff or excess > 0:
+                del self._jobs[job.id]
+                excess -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'accepting': self.accepting,
+            'concurrency': self.concurrency,
+            'max_depth': self.max_depth,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'running': self._running,
+            'kept_jobs': len(self._jobs),
+            'average_service_seconds': round(self._average_service, 4),
+            **self.counters
+        }
@@ -0,0 +1,119 @@
+import re
+from collections import deque
+from typing import Dict, Hashable, Iterable, Iterator, List, Set, Tuple
+
+# Words are runs of letters/digits; everything else separates them
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+class KeywordAutomaton:
+    """Word-level Aho-Corasick automaton over a table of labelled keyword phrases.
+
+    Transitions are on whole lowercased words rather than characters, so
+    matches always fall on word boundaries ('war' never matches inside
+    'software') and multi-word phrases ('on the other hand') are single
+    patterns. A scan visits each word of the text once and reports every
+    phrase ending there, overlapping ones included, so its cost does not
+    grow with the number of keywords in the table.
+    """
+
+    def __init__(self, table: Dict[Hashable, Iterable[str]] = None):
+        # phrase -> labels it was registered under
+        self._labels: Dict[str, Set[Hashable]] = {}
+        self._dirty = True
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        self._out: List[List[Tuple[str, int]]] = []
+        self._max_words = 1
+
+        for label, phrases in (table or {}).items():
+            self.add(label, phrases)
+
+    @staticmethod
+    def normalize(phrase: str) -> str:
+        return ' '.join(token.lower() for token in TOKEN_RE.findall(phrase))
+
+    def add(self, label: Hashable, phrases: Iterable[str]) -> None:
+        """Register phrases under a label; the automaton is rebuilt on the next scan"""
+        for phrase in phrases:
+            phrase = self.normalize(phrase)
+            if phrase:
+                self._labels.setdefault(phrase, set()).add(label)
+        self._dirty = True
+
+    def labels(self, phrase: str) -> Set[Hashable]:
+        """Labels a (normalized) phrase was registered under"""
+        return self._labels.get(phrase, set())
+
+    def phrases(self, label: Hashable) -> List[str]:
+        """Every phrase registered under a label"""
+        return [phrase for phrase, labels in self._labels.items() if label in labels]
+
+    def _build(self) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[Tuple[str, int]]] = [[]]
+
+        # Trie of phrases, one edge per word
+        for phrase in self._labels:
+            words = phrase.split()
+            state = 0
+            for word in words:
+                next_state = goto[state].get(word)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][word] = next_state
+                    goto.append({})
+                    out.append([])
+                state = next_state
+            out[state].append((phrase, len(words)))
+
+        # Failure links in breadth-first order; each state also reports the
+        # phrases of the state its failure link points to
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in goto[state].items():
+                queue.append(next_state)
+                link = fail[state]
+                while link and word not in goto[link]:
+                    link = fail[link]
+                fail[next_state] = goto[link].get(word, 0)
+                out[next_state] = out[next_state] + out[fail[next_state]]
+
+        self._goto, self._fail, self._out = goto, fail, out
+        self._max_words = max((len(phrase.split()) for phrase in self._labels), default=1)
+        self._dirty = False
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[str, int, int]]:
+        """Yield (phrase, start, end) character spans for every phrase occurrence in the text"""
+        if self._dirty:
+            self._build()
+        goto, fail, out = self._goto, self._fail, self._out
+
+        state = 0
+        starts = deque(maxlen=self._max_words)
+        for token in TOKEN_RE.finditer(text):
+            word = token.group().lower()
+            starts.append(token.start())
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for phrase, n_words in out[state]:
+                yield phrase, starts[-n_words], token.end()
+
+    def first_matches(self, text: str) -> Dict[str, Tuple[int, int]]:
+        """(start, end) of the first occurrence of each phrase found in the text"""
+        first: Dict[str, Tuple[int, int]] = {}
+        for phrase, start, end in self.iter_matches(text):
+            if phrase not in first:
+                first[phrase] = (start, end)
+        return first
+
+    def label_hits(self, text: str) -> Dict[Hashable, Set[str]]:
+        """Distinct phrases found in the text, grouped by label"""
+        hits: Dict[Hashable, Set[str]] = {}
+        for phrase, _, _ in self.iter_matches(text):
+            for label in self._labels[phrase]:
+                hits.setdefault(label, set()).add(phrase)
+        return hits
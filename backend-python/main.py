@@ -1,27 +1,44 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import time
+
+# Cold-start reference point, reported by /health
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-import PyPDF2
-import io
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import asyncio
+import bisect
+import contextlib
+import itertools
+import logging
+import os
 import re
 import json
 import uuid
-from typing import List, Dict, Any
-import nltk
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, Optional
 from collections import Counter
 from datetime import datetime
 import random
 import string
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+import nlp_resources
+from quiz_cache import QuizCache
+from worker_pool import AnalysisPool
+from keyword_automaton import KeywordAutomaton
+from distractor_index import DistractorIndex
+from sentence_store import SentenceStore
+from text_tokenizers import get_tokenizer
+from page_cache import PageAnalysisCache, page_key
+from near_duplicates import NearDuplicateIndex
+from question_bank import QuestionBank
+from job_queue import Job, JobQueue, QueueClosed, QueueFull
+from deadline import TIERS, Deadline
+from upload_spool import SpooledUpload, UploadSizeLimit, UploadTooLarge, mapped_file, spool_upload, too_large_detail
+from metrics import MetricsRegistry, current_recorder, page_class, recording, size_class, span
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+# Levelled logging; LOG_LEVEL=WARNING silences per-request progress in production
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger('mcq')
 
 app = FastAPI(title="Simple Advanced MCQ Quiz Generator", version="3.1.0")
 
@@ -34,8 +51,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cold-start timeline in seconds since IMPORT_STARTED, reported by /health
+cold_start: Dict[str, Optional[float]] = {'ready_seconds': None, 'first_request_seconds': None}
+
+@app.middleware("http")
+async def record_first_request(request, call_next):
+    if cold_start['first_request_seconds'] is None:
+        cold_start['first_request_seconds'] = round(time.perf_counter() - IMPORT_STARTED, 4)
+    return await call_next(request)
+
+# A sentence that ends here is complete and never continues onto the next page
+SENTENCE_END_RE = re.compile(r'[.!?]["\')\]]*\s*$')
+# An unpunctuated tail longer than this (slides, tables, bullet lists) is a sentence of its own,
+# not carried into the next page, so every page is tokenized once
+MAX_CARRY_CHARS = 2000
+
+# Sentence classifier vocabulary. Lists are in the priority order the
+# matchers try them; all phrases are matched as whole words by the
+# generator's keyword automaton.
+DEFINITION_VERBS = ['is', 'are', 'means', 'refers to', 'can be defined as', 'is known as', 'represents', 'involves']
+
+# (phrases, leading): leading patterns read 'because of <cause>, <effect>',
+# the others '<cause> causes <effect>'
+CAUSE_EFFECT_PATTERNS = [
+    (['cause', 'causes'], False),
+    (['result in', 'results in'], False),
+    (['lead to', 'leads to'], False),
+    (['because of'], True),
+    (['due to'], True),
+    (['as a result of'], True),
+    (['produce', 'produces'], False),
+    (['create', 'creates'], False)
+]
+
+COMPARISON_KEYWORDS = [
+    'different from', 'differs from', 'unlike', 'in contrast to', 'whereas', 'however',
+    'on the other hand', 'compared to', 'similar to', 'like', 'than', 'versus', 'vs',
+    'while', 'although', 'but', 'conversely'
+]
+
+PROCESS_KEYWORDS = [
+    'first', 'second', 'third', 'then', 'next', 'finally', 'after', 'before', 'during',
+    'process', 'step', 'stage', 'phase', 'procedure', 'method', 'approach', 'technique'
+]
+
+FACTUAL_INDICATORS = ['approximately', 'exactly', 'about', 'nearly', 'over', 'under', 'between', 'around']
+
+# Every phrase the sentence matchers look up
+CLASSIFIER_PHRASES = (
+    DEFINITION_VERBS + [phrase for phrases, _ in CAUSE_EFFECT_PATTERNS for phrase in phrases]
+    + COMPARISON_KEYWORDS + PROCESS_KEYWORDS + FACTUAL_INDICATORS
+)
+
+LEADING_ARTICLE_RE = re.compile(r'^(The|A|An)\s+', re.IGNORECASE)
+CLAUSE_COMMA_RE = re.compile(r',\s')
+DIGIT_RE = re.compile(r'\d')
+DATE_RE = re.compile(r'\b\d{4}\b|\b\d{1,2}/\d{1,2}/\d{2,4}\b')
+# Equivalent to \d+\s*% but anchored on a single digit, so long digit runs can't backtrack
+PERCENTAGE_RE = re.compile(r'\d\s*%')
+
+# How many candidates of each kind the analysis keeps
+FINDER_CAPS = {
+    'definition_sentences': 15,
+    'comparison_sentences': 10,
+    'cause_effect_sentences': 10,
+    'process_sentences': 10,
+    'factual_sentences': 15
+}
+
+class QuizGenerationError(Exception):
+    """Pipeline failure with the HTTP status it should surface as.
+
+    Raised instead of HTTPException inside the pipeline because it has to
+    pickle cleanly across the process pool.
+    """
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
 class SimpleMCQGenerator:
-    def __init__(self):
+    def __init__(self, distractor_index: Optional[DistractorIndex] = None,
+                 question_index: Optional[NearDuplicateIndex] = None, tokenizer=None,
+                 page_cache: Optional[PageAnalysisCache] = None):
         # Common academic subjects and their keywords
         self.subject_keywords = {
             'science': ['cell', 'atom', 'molecule', 'energy', 'force', 'reaction', 'organism', 'species', 'theory', 'experiment', 'DNA', 'protein', 'carbon', 'oxygen'],
@@ -52,52 +150,296 @@ class SimpleMCQGenerator:
             'structure', 'function', 'relationship', 'characteristic', 'property', 'feature',
             'advantage', 'disadvantage', 'effect', 'cause', 'result', 'consequence', 'impact'
         ]
+        
+        # One automaton over every keyword table (subject keywords and the
+        # sentence classifier's phrases), so a single scan finds them all
+        self.keyword_automaton = KeywordAutomaton({('subject', subject): keywords for subject, keywords in self.subject_keywords.items()})
+        self.keyword_automaton.add('classifier', CLASSIFIER_PHRASES)
+        
+        # Definitions from every analyzed document, searched for similar-but-wrong options
+        self.distractor_index = distractor_index if distractor_index is not None else DistractorIndex()
+        
+        # MinHash signatures of every generated question, to spot near-copies across uploads
+        self.question_index = question_index if question_index is not None else NearDuplicateIndex()
+        
+        # Splits pages into sentences and their words in one pass (punkt, or the faster regex mode)
+        self.tokenizer = tokenizer if tokenizer is not None else get_tokenizer('punkt')
+        
+        # Per-page analysis partials, so a revised document only re-analyzes its changed pages
+        self.page_cache = page_cache
+    
+    def add_subject_keywords(self, subject: str, keywords: List[str]) -> None:
+        """Extend a subject's keyword table (or add a new subject)"""
+        self.subject_keywords.setdefault(subject, []).extend(keywords)
+        self.keyword_automaton.add(('subject', subject), keywords)
     
     def extract_content(self, text: str) -> Dict[str, Any]:
         """Extract content for question generation"""
+        return self.extract_content_from_pages([text])
+    
+    def iter_page_tokens(self, pages: Iterable[str]) -> Iterator[tuple]:
+        """Yield (sentences, lowercased words of each sentence) for each page as one batch.
+        
+        The last sentence of a page is held back until the next page arrives
+        unless it ends with terminal punctuation or is longer than
+        MAX_CARRY_CHARS, so sentences that run across a page break come out
+        whole.
+        """
+        carry = ""
+        for page_text in pages:
+            sentences, words, carry = self._split_page(carry, page_text)
+            if sentences:
+                yield sentences, words
+        
+        if carry:
+            yield self._last_sentence(carry)
+    
+    def iter_page_sentences(self, pages: Iterable[str]) -> Iterator[List[str]]:
+        """Yield the sentences of each page as one batch"""
+        for sentences, _ in self.iter_page_tokens(pages):
+            yield sentences
+    
+    def _split_page(self, carry: str, page_text: str) -> tuple:
+        """(complete sentences, their words, unfinished last sentence) of a page, continuing the previous page's carry"""
+        chunk = f"{carry}\n{page_text}" if carry else page_text
+        with span('tokenization'):
+            sentences, words = self.tokenizer.tokenize(chunk)
+        
+        carry = ""
+        if sentences and not SENTENCE_END_RE.search(sentences[-1]) and len(sentences[-1]) <= MAX_CARRY_CHARS:
+            carry = sentences.pop()
+            words.pop()
+        
+        # PDF line breaks inside a sentence are layout, not content
+        return [' '.join(sentence.split()) for sentence in sentences], words, carry
+    
+    def _last_sentence(self, carry: str) -> tuple:
+        """The document's unpunctuated last sentence as a one-sentence batch"""
+        sentence = ' '.join(carry.split())
+        with span('tokenization'):
+            return [sentence], [self.tokenizer.words(sentence)]
+    
+    def iter_sentences(self, pages: Iterable[str]) -> Iterator[str]:
+        """Yield sentences one at a time from a stream of page texts"""
+        for page_sentences in self.iter_page_sentences(pages):
+            yield from page_sentences
+    
+    def _early_stop_targets(self, question_count: int) -> Dict[str, int]:
+        """Candidate counts that comfortably cover a generation run of question_count.
         
-        print("📖 Analyzing text content...")
-        
-        # Basic processing
-        sentences = nltk.sent_tokenize(text)
-        words = nltk.word_tokenize(text.lower())
+        The generators drop some candidates (overlong definitions, sentences
+        without a usable number), so the targets keep a 2x margin over what
+        generate_mcq_questions asks for, capped by what the finders keep.
+        """
+        return {
+            'definition_sentences': min(FINDER_CAPS['definition_sentences'], 2 * max(2, question_count // 4)),
+            'factual_sentences': min(FINDER_CAPS['factual_sentences'], 2 * max(2, question_count // 3)),
+            'cause_effect_sentences': min(FINDER_CAPS['cause_effect_sentences'], 2 * max(1, question_count // 6))
+        }
+    
+    def extract_content_from_pages(self, pages: Iterable[str], question_count: Optional[int] = None) -> Dict[str, Any]:
+        """Extract content for question generation from a stream of page texts.
+        
+        Pages are consumed lazily and analyzed one at a time, so the whole
+        document never has to be held as one string. When question_count is
+        given, reading stops as soon as enough definition, factual and
+        cause-effect candidates have been found for that many questions.
+        """
+        
+        logger.debug("📖 Analyzing text content...")
+        
+        stop_words = nlp_resources.stop_words()
+        targets = self._early_stop_targets(question_count) if question_count else None
+        
+        sentences = SentenceStore()
+        word_freq = Counter()
+        entities = {}
+        subject_hits = {subject: set() for subject in self.subject_keywords}
+        found = {key: [] for key in FINDER_CAPS}
+        text_length = 0
+        pages_analyzed = 0
+        early_stopped = False
+        
+        def page_stream():
+            nonlocal text_length, pages_analyzed
+            for page_text in pages:
+                # Account for the newline that used to join pages
+                text_length += len(page_text) + (1 if pages_analyzed else 0)
+                pages_analyzed += 1
+                
+                # Entities don't depend on sentence boundaries
+                for entity in self._extract_simple_entities(page_text):
+                    entities.setdefault(entity, None)
+                
+                yield page_text
         
-        # Remove stopwords and get meaningful words
-        from nltk.corpus import stopwords
-        stop_words = set(stopwords.words('english'))
-        meaningful_words = [w for w in words if w.isalpha() and len(w) > 3 and w not in stop_words]
+        for batch, words in self.iter_page_tokens(page_stream()):
+            indices = sentences.extend(batch)
+            self._analyze_batch(batch, words, word_freq, found, subject_hits, stop_words, indices.start)
+            
+            if targets and all(len(found[key]) >= target for key, target in targets.items()):
+                early_stopped = True
+                break
         
-        # Word frequency analysis
-        word_freq = Counter(meaningful_words)
+        return self._content_result(sentences, word_freq, entities, found, subject_hits, text_length, pages_analyzed, early_stopped)
+    
+    def _analyze_batch(self, batch: List[str], words: List[List[str]], word_freq: Counter, found: Dict[str, List[Dict]],
+                       subject_hits: Dict[str, set], stop_words: frozenset, first_index: int = 0) -> None:
+        """Count the words of a batch of sentences and classify them into found"""
+        # Remove stopwords and count meaningful words
+        with span('word_counting'):
+            for sentence_words in words:
+                word_freq.update(w for w in sentence_words if w.isalpha() and len(w) > 3 and w not in stop_words)
+        
+        # Find different types of sentences (and subject keywords) in one classification pass
+        self._classify_sentences(batch, found, subject_hits, first_index)
+    
+    def _content_result(self, sentences: SentenceStore, word_freq: Counter, entities: Dict[tuple, None],
+                        found: Dict[str, List[Dict]], subject_hits: Dict[str, set], text_length: int,
+                        pages_analyzed: int, early_stopped: bool, pages_reused: int = 0) -> Dict[str, Any]:
         key_terms = [word for word, freq in word_freq.most_common(30)]
         
-        # Extract entities using simple pattern matching
-        entities = self._extract_simple_entities(text)
-        
-        # Find different types of sentences
-        definition_sentences = self._find_definition_sentences(sentences)
-        comparison_sentences = self._find_comparison_sentences(sentences)
-        cause_effect_sentences = self._find_cause_effect_sentences(sentences)
-        process_sentences = self._find_process_sentences(sentences)
-        factual_sentences = self._find_factual_sentences(sentences)
-        
-        # Detect subject area
-        subject_area = self._detect_subject_area(text)
+        for key, records in found.items():
+            for record in records:
+                sentences.mark(record['index'], key)
         
         return {
             'sentences': sentences,
             'key_terms': key_terms,
-            'entities': entities,
-            'definition_sentences': definition_sentences,
-            'comparison_sentences': comparison_sentences,
-            'cause_effect_sentences': cause_effect_sentences,
-            'process_sentences': process_sentences,
-            'factual_sentences': factual_sentences,
-            'subject_area': subject_area,
-            'text_length': len(text),
-            'complexity_score': self._calculate_complexity(sentences, key_terms)
+            'entities': list(entities)[:20],
+            **found,
+            'subject_area': self._pick_subject_area(subject_hits),
+            'text_length': text_length,
+            'complexity_score': self._calculate_complexity(sentences, key_terms),
+            'pages_analyzed': pages_analyzed,
+            'pages_reused': pages_reused,
+            'early_stopped': early_stopped
+        }
+    
+    def _analyze_page(self, index: int, page_text: str, carry: str, stop_words: frozenset) -> Dict[str, Any]:
+        """Everything extract_content_from_pages derives from one page, as a mergeable partial"""
+        sentences, words, next_carry = self._split_page(carry, page_text)
+        word_freq = Counter()
+        found = {key: [] for key in FINDER_CAPS}
+        subject_hits = {}
+        self._analyze_batch(sentences, words, word_freq, found, subject_hits, stop_words)
+        return {
+            'index': index,
+            'carry_in': carry,
+            'carry': next_carry,
+            'length': len(page_text),
+            'entities': list(dict.fromkeys(self._extract_simple_entities(page_text))),
+            'sentences': SentenceStore(sentences),
+            'word_freq': word_freq,
+            'found': found,
+            'subject_hits': subject_hits
         }
     
+    def _analyze_page_cached(self, index: int, page_text: str, carry: str, stop_words: frozenset) -> Dict[str, Any]:
+        """_analyze_page, reusing the page cache's partial when this text and carry were analyzed before"""
+        if self.page_cache is None:
+            return self._analyze_page(index, page_text, carry, stop_words)
+        
+        key = page_key(page_text, carry, self.tokenizer.name)
+        partial = self.page_cache.get(key)
+        if partial is not None:
+            return {**partial, 'index': index, 'length': len(page_text), 'carry_in': carry, 'cached': True}
+        
+        partial = self._analyze_page(index, page_text, carry, stop_words)
+        self.page_cache.put(key, partial)
+        return partial
+    
+    def iter_page_analyses(self, pages: Iterable[tuple]) -> Iterator[Dict[str, Any]]:
+        """Per-page partials for a run of consecutive (index, text) pages, analyzed as they are consumed.
+        
+        The run is analyzed as if it started the document, i.e. with no
+        sentence carried in from the page before it; merge_page_analyses
+        repairs that boundary. Pages found in the page cache are not
+        analyzed again; their partials are marked 'cached'.
+        """
+        stop_words = nlp_resources.stop_words()
+        carry = ""
+        for index, page_text in pages:
+            partial = self._analyze_page_cached(index, page_text, carry, stop_words)
+            carry = partial['carry']
+            yield partial
+    
+    def analyze_pages(self, pages: Iterable[tuple]) -> List[Dict[str, Any]]:
+        """Map step of the large-document mode: per-page partials for a run of (index, text) pages"""
+        return list(self.iter_page_analyses(pages))
+    
+    def merge_page_analyses(self, partials: Iterable[Dict[str, Any]], page_text: Optional[Callable[[int], str]] = None,
+                            question_count: Optional[int] = None) -> Dict[str, Any]:
+        """Combine per-page partials in page order into the document's content analysis.
+        
+        The result is identical to extract_content_from_pages over the same
+        pages (with the same question_count for early stopping; partials
+        are consumed lazily, so no page past the stopping point is
+        analyzed). Where a page was analyzed with a different carried-in
+        sentence than the one the previous page actually leaves (the first
+        page of every map chunk), it is re-analyzed here; page_text(index)
+        supplies its text.
+        """
+        stop_words = nlp_resources.stop_words()
+        targets = self._early_stop_targets(question_count) if question_count else None
+        sentences = SentenceStore()
+        word_freq = Counter()
+        entities = {}
+        subject_hits = {subject: set() for subject in self.subject_keywords}
+        found = {key: [] for key in FINDER_CAPS}
+        processes = []
+        text_length = 0
+        pages_analyzed = 0
+        pages_reused = 0
+        early_stopped = False
+        carry = ""
+        
+        def absorb(partial: Dict[str, Any]) -> None:
+            # Partials number their sentences from 0
+            base = sentences.extend(partial['sentences']).start
+            word_freq.update(partial['word_freq'])
+            for subject, hits in partial['subject_hits'].items():
+                subject_hits.setdefault(subject, set()).update(hits)
+            # Each page kept its own first FINDER_CAPS records, so the document's first ones are among them
+            for key, records in partial['found'].items():
+                records = [{**record, 'index': record['index'] + base} for record in records]
+                if key == 'process_sentences':
+                    processes.extend(records)
+                else:
+                    found[key].extend(records[:FINDER_CAPS[key] - len(found[key])])
+        
+        for partial in partials:
+            if partial['carry_in'] != carry:
+                if page_text is None:
+                    raise ValueError(f"Page {partial['index']} was analyzed with a different carried-in sentence and no page_text was given")
+                partial = self._analyze_page_cached(partial['index'], page_text(partial['index']), carry, stop_words)
+            carry = partial['carry']
+            
+            text_length += partial['length'] + (1 if pages_analyzed else 0)
+            pages_analyzed += 1
+            pages_reused += partial.get('cached', False)
+            for entity in partial['entities']:
+                entities.setdefault(entity, None)
+            absorb(partial)
+            
+            if targets and all(len(found[key]) >= target for key, target in targets.items()):
+                early_stopped = True
+                break
+        
+        if carry and not early_stopped:
+            # The document's last sentence had no terminal punctuation
+            last_sentence, words = self._last_sentence(carry)
+            tail = {'sentences': last_sentence, 'word_freq': Counter(),
+                    'found': {key: [] for key in FINDER_CAPS}, 'subject_hits': {}}
+            self._analyze_batch(last_sentence, words, tail['word_freq'], tail['found'], tail['subject_hits'], stop_words)
+            absorb(tail)
+        
+        # Same stable ranking _classify_sentences applies page by page
+        found['process_sentences'] = sorted(processes, key=lambda x: x['keyword_count'], reverse=True)[:FINDER_CAPS['process_sentences']]
+        
+        return self._content_result(sentences, word_freq, entities, found, subject_hits, text_length,
+                                    pages_analyzed, early_stopped, pages_reused)
+    
     def _extract_simple_entities(self, text: str) -> List[tuple]:
         """Extract entities using simple pattern matching"""
         entities = []
@@ -121,185 +463,360 @@ class SimpleMCQGenerator:
         unique_entities = list(set(entities))
         return unique_entities[:20]
     
+    def _scan_phrases(self, sentence: str) -> Dict[str, tuple]:
+        """(start, end) of the first whole-word occurrence of every known keyword phrase.
+        
+        One automaton scan replaces the per-pattern re.search calls and the
+        per-keyword substring tests; overlapping phrases are all reported
+        ('is known as' also yields 'is').
+        """
+        return self.keyword_automaton.first_matches(sentence)
+    
+    def _match_definition(self, sentence: str, hits: Dict[str, tuple]) -> Optional[Dict]:
+        """Definition record for the sentence, if one of the definition verbs fits"""
+        for verb in DEFINITION_VERBS:
+            if verb not in hits:
+                continue
+            start, end = hits[verb]
+            # The term needs at least one word before the verb, and the verb must be followed by a space
+            if not start or not sentence[end:end + 1].isspace():
+                continue
+            term = sentence[:start].strip()
+            definition = sentence[end:].strip()
+            if len(term.split()) <= 6 and len(definition.split()) >= 3:
+                # Clean up the term
+                term = LEADING_ARTICLE_RE.sub('', term)
+                
+                return {
+                    'term': term,
+                    'definition': definition,
+                    'pattern': 'definition'
+                }
+        return None
+    
+    def _match_cause_effect(self, sentence: str, hits: Dict[str, tuple]) -> Optional[Dict]:
+        """Cause/effect record for the sentence, if one of the causal phrases fits"""
+        for phrases, leading in CAUSE_EFFECT_PATTERNS:
+            found = [hits[phrase] for phrase in phrases if phrase in hits]
+            if not found:
+                continue
+            start, end = min(found)
+            if not sentence[end:end + 1].isspace():
+                continue
+            rest = sentence[end:]
+            
+            if leading:
+                # 'because of <cause>, <effect>'
+                comma = CLAUSE_COMMA_RE.search(rest)
+                if comma is None:
+                    continue
+                cause, effect = rest[:comma.start()], rest[comma.end():]
+            else:
+                # '<cause> causes <effect>'
+                cause, effect = sentence[:start], rest
+            
+            cause, effect = cause.strip(), effect.strip()
+            if cause and effect:
+                return {
+                    'cause': cause,
+                    'effect': effect,
+                    'pattern': 'cause_effect'
+                }
+        return None
+    
+    def _match_comparison(self, sentence: str, hits: Dict[str, tuple], word_count: int) -> Optional[Dict]:
+        """Comparison record for the sentence, keyed by the first comparison keyword it uses"""
+        if word_count <= 8:
+            return None
+        for keyword in COMPARISON_KEYWORDS:
+            if keyword in hits:
+                return {
+                    'comparison_type': keyword,
+                    'pattern': 'comparison'
+                }
+        return None
+    
+    def _match_process(self, sentence: str, hits: Dict[str, tuple], word_count: int) -> Optional[Dict]:
+        """Process record for the sentence, scored by how many process keywords it uses"""
+        if word_count <= 6:
+            return None
+        keyword_count = sum(1 for keyword in PROCESS_KEYWORDS if keyword in hits)
+        if keyword_count >= 1:
+            return {
+                'keyword_count': keyword_count,
+                'pattern': 'process'
+            }
+        return None
+    
+    def _match_factual(self, sentence: str, hits: Dict[str, tuple], word_count: int) -> Optional[Dict]:
+        """Factual record for sentences with numbers, dates, percentages or hedged quantities"""
+        if word_count < 6:
+            return None
+        
+        # Look for sentences with numbers, dates, or specific measurements
+        has_number = DIGIT_RE.search(sentence) is not None
+        has_date = has_number and DATE_RE.search(sentence) is not None
+        has_percentage = has_number and PERCENTAGE_RE.search(sentence) is not None
+        
+        # Look for factual indicators
+        has_indicator = any(indicator in hits for indicator in FACTUAL_INDICATORS)
+        
+        if has_number or has_indicator:
+            return {
+                'has_number': has_number,
+                'has_date': has_date,
+                'has_percentage': has_percentage,
+                'has_indicator': has_indicator,
+                'pattern': 'factual'
+            }
+        return None
+    
+    def _classify_sentences(self, sentences: Iterable[str], found: Optional[Dict[str, List[Dict]]] = None,
+                            subject_hits: Optional[Dict[str, set]] = None, first_index: int = 0) -> Dict[str, List[Dict]]:
+        """Assign every sentence to all of its categories in a single pass.
+        
+        Results are appended to found (so a document can be classified page
+        by page) and each category is held to its FINDER_CAPS limit; once a
+        category is full its matcher is skipped. Subject keywords seen by the
+        same scan are added to subject_hits when it is given.
+        
+        Records refer to their sentence by 'index', its position in the
+        document's sentences when the batch starts at first_index.
+        """
+        if found is None:
+            found = {key: [] for key in FINDER_CAPS}
+        
+        definitions = found['definition_sentences']
+        comparisons = found['comparison_sentences']
+        cause_effects = found['cause_effect_sentences']
+        processes = found['process_sentences']
+        factuals = found['factual_sentences']
+        
+        # When the job is being timed, charge each matcher's calls to its own stage
+        scan_phrases = self._scan_phrases
+        match_definition = self._match_definition
+        match_comparison = self._match_comparison
+        match_cause_effect = self._match_cause_effect
+        match_process = self._match_process
+        match_factual = self._match_factual
+        recorder = current_recorder()
+        if recorder is not None:
+            scan_phrases = recorder.timed('keyword_scan', scan_phrases)
+            match_definition = recorder.timed('find_definition', match_definition)
+            match_comparison = recorder.timed('find_comparison', match_comparison)
+            match_cause_effect = recorder.timed('find_cause_effect', match_cause_effect)
+            match_process = recorder.timed('find_process', match_process)
+            match_factual = recorder.timed('find_factual', match_factual)
+        
+        new_processes = []
+        for index, sentence in enumerate(sentences, first_index):
+            hits = scan_phrases(sentence)
+            word_count = len(sentence.split())
+            
+            if subject_hits is not None:
+                for phrase in hits:
+                    for label in self.keyword_automaton.labels(phrase):
+                        if label != 'classifier':
+                            subject_hits.setdefault(label[1], set()).add(phrase)
+            
+            if len(definitions) < FINDER_CAPS['definition_sentences']:
+                record = match_definition(sentence, hits)
+                if record:
+                    record['index'] = index
+                    definitions.append(record)
+            if len(comparisons) < FINDER_CAPS['comparison_sentences']:
+                record = match_comparison(sentence, hits, word_count)
+                if record:
+                    record['index'] = index
+                    comparisons.append(record)
+            if len(cause_effects) < FINDER_CAPS['cause_effect_sentences']:
+                record = match_cause_effect(sentence, hits)
+                if record:
+                    record['index'] = index
+                    cause_effects.append(record)
+            record = match_process(sentence, hits, word_count)
+            if record:
+                record['index'] = index
+                new_processes.append(record)
+            if len(factuals) < FINDER_CAPS['factual_sentences']:
+                record = match_factual(sentence, hits, word_count)
+                if record:
+                    record['index'] = index
+                    factuals.append(record)
+        
+        # Processes are ranked by keyword count over the whole document (stable, so earlier sentences win ties)
+        if new_processes:
+            processes[:] = sorted(processes + new_processes, key=lambda x: x['keyword_count'], reverse=True)[:FINDER_CAPS['process_sentences']]
+        
+        return found
+    
     def _find_definition_sentences(self, sentences: List[str]) -> List[Dict]:
         """Find sentences that contain definitions"""
-        definition_patterns = [
-            r'(.+?)\s+is\s+(.+)',
-            r'(.+?)\s+are\s+(.+)',
-            r'(.+?)\s+means\s+(.+)',
-            r'(.+?)\s+refers to\s+(.+)',
-            r'(.+?)\s+can be defined as\s+(.+)',
-            r'(.+?)\s+is known as\s+(.+)',
-            r'(.+?)\s+represents\s+(.+)',
-            r'(.+?)\s+involves\s+(.+)'
-        ]
-        
         definitions = []
-        for sentence in sentences:
-            for pattern in definition_patterns:
-                match = re.search(pattern, sentence, re.IGNORECASE)
-                if match and len(match.group(1).split()) <= 6 and len(match.group(2).split()) >= 3:
-                    term = match.group(1).strip()
-                    definition = match.group(2).strip()
-                    
-                    # Clean up the term
-                    term = re.sub(r'^(The|A|An)\s+', '', term, flags=re.IGNORECASE)
-                    
-                    definitions.append({
-                        'sentence': sentence,
-                        'term': term,
-                        'definition': definition,
-                        'pattern': 'definition'
-                    })
+        for index, sentence in enumerate(sentences):
+            record = self._match_definition(sentence, self._scan_phrases(sentence))
+            if record:
+                record['index'] = index
+                definitions.append(record)
+                if len(definitions) == FINDER_CAPS['definition_sentences']:
                     break
-        
-        return definitions[:15]
+        return definitions
     
     def _find_comparison_sentences(self, sentences: List[str]) -> List[Dict]:
         """Find sentences that make comparisons"""
-        comparison_keywords = [
-            'different from', 'differs from', 'unlike', 'in contrast to', 'whereas', 'however',
-            'on the other hand', 'compared to', 'similar to', 'like', 'than', 'versus', 'vs',
-            'while', 'although', 'but', 'conversely'
-        ]
-        
         comparisons = []
-        for sentence in sentences:
-            sentence_lower = sentence.lower()
-            for keyword in comparison_keywords:
-                if keyword in sentence_lower and len(sentence.split()) > 8:
-                    comparisons.append({
-                        'sentence': sentence,
-                        'comparison_type': keyword,
-                        'pattern': 'comparison'
-                    })
+        for index, sentence in enumerate(sentences):
+            record = self._match_comparison(sentence, self._scan_phrases(sentence), len(sentence.split()))
+            if record:
+                record['index'] = index
+                comparisons.append(record)
+                if len(comparisons) == FINDER_CAPS['comparison_sentences']:
                     break
-        
-        return comparisons[:10]
+        return comparisons
     
     def _find_cause_effect_sentences(self, sentences: List[str]) -> List[Dict]:
         """Find cause and effect relationships"""
-        cause_effect_patterns = [
-            r'(.+?)\s+causes?\s+(.+)',
-            r'(.+?)\s+results? in\s+(.+)',
-            r'(.+?)\s+leads? to\s+(.+)',
-            r'because of\s+(.+?),\s+(.+)',
-            r'due to\s+(.+?),\s+(.+)',
-            r'as a result of\s+(.+?),\s+(.+)',
-            r'(.+?)\s+produces?\s+(.+)',
-            r'(.+?)\s+creates?\s+(.+)'
-        ]
-        
         cause_effects = []
-        for sentence in sentences:
-            for pattern in cause_effect_patterns:
-                match = re.search(pattern, sentence, re.IGNORECASE)
-                if match:
-                    cause_effects.append({
-                        'sentence': sentence,
-                        'cause': match.group(1).strip(),
-                        'effect': match.group(2).strip(),
-                        'pattern': 'cause_effect'
-                    })
+        for index, sentence in enumerate(sentences):
+            record = self._match_cause_effect(sentence, self._scan_phrases(sentence))
+            if record:
+                record['index'] = index
+                cause_effects.append(record)
+                if len(cause_effects) == FINDER_CAPS['cause_effect_sentences']:
                     break
-        
-        return cause_effects[:10]
+        return cause_effects
     
     def _find_process_sentences(self, sentences: List[str]) -> List[Dict]:
         """Find sentences describing processes or steps"""
-        process_keywords = [
-            'first', 'second', 'third', 'then', 'next', 'finally', 'after', 'before', 'during',
-            'process', 'step', 'stage', 'phase', 'procedure', 'method', 'approach', 'technique'
-        ]
-        
         processes = []
-        for sentence in sentences:
-            sentence_lower = sentence.lower()
-            keyword_count = sum(1 for keyword in process_keywords if keyword in sentence_lower)
-            if keyword_count >= 1 and len(sentence.split()) > 6:
-                processes.append({
-                    'sentence': sentence,
-                    'keyword_count': keyword_count,
-                    'pattern': 'process'
-                })
-        
-        return sorted(processes, key=lambda x: x['keyword_count'], reverse=True)[:10]
+        for index, sentence in enumerate(sentences):
+            record = self._match_process(sentence, self._scan_phrases(sentence), len(sentence.split()))
+            if record:
+                record['index'] = index
+                processes.append(record)
+        return sorted(processes, key=lambda x: x['keyword_count'], reverse=True)[:FINDER_CAPS['process_sentences']]
     
     def _find_factual_sentences(self, sentences: List[str]) -> List[Dict]:
         """Find sentences with factual information"""
         factual_sentences = []
-        
-        for sentence in sentences:
-            # Look for sentences with numbers, dates, or specific measurements
-            has_number = bool(re.search(r'\d+', sentence))
-            has_date = bool(re.search(r'\b\d{4}\b|\b\d{1,2}\/\d{1,2}\/\d{2,4}\b', sentence))
-            has_percentage = bool(re.search(r'\d+\s*%', sentence))
-            
-            # Look for factual indicators
-            factual_indicators = ['approximately', 'exactly', 'about', 'nearly', 'over', 'under', 'between', 'around']
-            has_indicator = any(indicator in sentence.lower() for indicator in factual_indicators)
-            
-            if (has_number or has_date or has_percentage or has_indicator) and len(sentence.split()) >= 6:
-                factual_sentences.append({
-                    'sentence': sentence,
-                    'has_number': has_number,
-                    'has_date': has_date,
-                    'has_percentage': has_percentage,
-                    'has_indicator': has_indicator,
-                    'pattern': 'factual'
-                })
-        
-        return factual_sentences[:15]
+        for index, sentence in enumerate(sentences):
+            record = self._match_factual(sentence, self._scan_phrases(sentence), len(sentence.split()))
+            if record:
+                record['index'] = index
+                factual_sentences.append(record)
+                if len(factual_sentences) == FINDER_CAPS['factual_sentences']:
+                    break
+        return factual_sentences
     
     def _detect_subject_area(self, text: str) -> str:
         """Detect the subject area of the text"""
-        text_lower = text.lower()
-        subject_scores = {}
-        
-        for subject, keywords in self.subject_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            subject_scores[subject] = score
+        return self._pick_subject_area(self._subject_keyword_hits(text))
+    
+    def _subject_keyword_hits(self, text: str) -> Dict[str, set]:
+        """Subject keywords present in the text, per subject, found in one automaton pass"""
+        subject_hits = {subject: set() for subject in self.subject_keywords}
+        for label, phrases in self.keyword_automaton.label_hits(text).items():
+            if label != 'classifier':
+                subject_hits[label[1]].update(phrases)
+        return subject_hits
+    
+    def _pick_subject_area(self, subject_hits: Dict[str, set]) -> str:
+        """Subject with the most distinct keyword hits"""
+        subject_scores = {subject: len(hits) for subject, hits in subject_hits.items()}
         
         if not subject_scores or max(subject_scores.values()) == 0:
             return 'general'
         
         return max(subject_scores, key=subject_scores.get)
     
-    def _calculate_complexity(self, sentences: List[str], key_terms: List[str]) -> float:
+    def _calculate_complexity(self, sentences: SentenceStore, key_terms: List[str]) -> float:
         """Calculate text complexity score"""
         if not sentences:
             return 0.0
         
-        avg_sentence_length = sum(len(s.split()) for s in sentences) / len(sentences)
+        avg_sentence_length = sum(sentences.word_counts) / len(sentences)
         term_density = len(key_terms) / len(sentences) if sentences else 0
         
         complexity = (avg_sentence_length * 0.1) + (term_density * 0.5)
         return min(complexity, 10.0)
     
-    def generate_mcq_questions(self, content: Dict[str, Any], count: int = 15) -> List[Dict]:
-        """Generate MCQ questions from content"""
+    def generate_mcq_questions(self, content: Dict[str, Any], count: int = 15, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """Generate MCQ questions from content
         
-        print(f"🎯 Generating {count} MCQ questions...")
+        With a deadline, the generators run cheapest first (definition
+        questions, which look up distractors, come last) and once it has
+        expired the remaining ones are skipped, provided there are already
+        enough questions for a quiz; skipped generators are recorded on the
+        deadline.
+        """
+        
+        logger.debug("🎯 Generating %d MCQ questions...", count)
         
         questions = []
         
-        # Generate different types of questions
-        questions.extend(self._generate_definition_questions(content, max(2, count // 4)))
-        questions.extend(self._generate_factual_questions(content, max(2, count // 3)))
-        questions.extend(self._generate_application_questions(content, max(1, count // 5)))
-        questions.extend(self._generate_analysis_questions(content, max(1, count // 6)))
-        questions.extend(self._generate_comparison_questions(content, max(1, count // 8)))
+        # Make this document's definitions available as distractors, here and for later documents
+        self.distractor_index.add(content.get('definition_sentences', []), content.get('subject_area', 'general'))
+        
+        generators = [
+            ('definition', self._generate_definition_questions, max(2, count // 4)),
+            ('factual', self._generate_factual_questions, max(2, count // 3)),
+            ('application', self._generate_application_questions, max(1, count // 5)),
+            ('analysis', self._generate_analysis_questions, max(1, count // 6)),
+            ('comparison', self._generate_comparison_questions, max(1, count // 8))
+        ]
+        if deadline is not None:
+            generators = generators[1:] + generators[:1]
         
-        # Shuffle and select best questions
+        # Generate different types of questions
+        with span('generation'):
+            for name, generate, generator_count in generators:
+                if deadline is not None and deadline.expired() and len(questions) >= 3:
+                    deadline.generators_skipped.append(name)
+                    continue
+                questions.extend(generate(content, generator_count))
+        
+        # Shuffle and select best questions, skipping near-copies of ones already picked
         random.shuffle(questions)
-        selected_questions = questions[:count]
+        with span('deduplication'):
+            selected_questions = self._select_distinct(questions, count)
         
         # Balance difficulty
-        self._balance_difficulty(selected_questions)
+        with span('balancing'):
+            self._balance_difficulty(selected_questions)
         
-        print(f"✅ Generated {len(selected_questions)} MCQ questions")
+        logger.debug("✅ Generated %d MCQ questions", len(selected_questions))
         return selected_questions
     
+    def _select_distinct(self, questions: List[Dict], count: int) -> List[Dict]:
+        """First count questions that are not near-duplicates of each other.
+        
+        Overlapping finders (a definition that is also a cause-effect
+        sentence) produce two versions of the same question; question text
+        plus source sentence is compared with MinHash/LSH. Questions that
+        repeat one generated for an earlier upload get 'duplicate_of' set to
+        that question's id.
+        """
+        generation = NearDuplicateIndex(self.question_index.hasher, self.question_index.bands, self.question_index.threshold)
+        selected = []
+        signatures = []
+        for question in questions:
+            signature = generation.signature(f"{question['question']} {question.get('source_sentence', '')}")
+            if generation.query(signature):
+                continue
+            generation.add(question['id'], signature)
+            selected.append(question)
+            signatures.append(signature)
+            if len(selected) == count:
+                break
+        
+        for question, signature in zip(selected, signatures):
+            matches = self.question_index.query(signature)
+            if matches:
+                question['duplicate_of'] = matches[0][0]
+            else:
+                self.question_index.add(question['id'], signature)
+        return selected
+    
     def _generate_definition_questions(self, content: Dict[str, Any], count: int) -> List[Dict]:
         """Generate definition-based MCQ questions"""
         questions = []
@@ -338,7 +855,7 @@ class SimpleMCQGenerator:
                 'explanation': f"According to the text, {term} is defined as: {correct_definition}",
                 'difficulty': self._determine_difficulty(term, correct_definition),
                 'category': 'definition',
-                'source_sentence': definition['sentence'],
+                'source_sentence': content['sentences'][definition['index']],
                 'bloom_level': 'remember'
             }
             
@@ -352,7 +869,7 @@ class SimpleMCQGenerator:
         factual_sentences = content.get('factual_sentences', [])
         
         for factual in factual_sentences[:count]:
-            sentence = factual['sentence']
+            sentence = content['sentences'][factual['index']]
             
             # Extract numbers or specific facts
             numbers = re.findall(r'\d+(?:\.\d+)?', sentence)
@@ -422,7 +939,7 @@ class SimpleMCQGenerator:
         process_sentences = content.get('process_sentences', [])
         
         for process in process_sentences[:count]:
-            sentence = process['sentence']
+            sentence = content['sentences'][process['index']]
             
             # Extract key concepts from process sentences
             key_concepts = [term for term in content['key_terms'][:10] if term in sentence.lower()]
@@ -473,7 +990,7 @@ class SimpleMCQGenerator:
         cause_effects = content.get('cause_effect_sentences', [])
         
         for cause_effect in cause_effects[:count]:
-            sentence = cause_effect['sentence']
+            sentence = content['sentences'][cause_effect['index']]
             
             question_text = random.choice([
                 "What can be concluded from the relationship described in the text?",
@@ -518,7 +1035,7 @@ class SimpleMCQGenerator:
         comparisons = content.get('comparison_sentences', [])
         
         for comparison in comparisons[:count]:
-            sentence = comparison['sentence']
+            sentence = content['sentences'][comparison['index']]
             comparison_type = comparison['comparison_type']
             
             question_text = f"According to the text, what is the main relationship established by the comparison?"
@@ -555,14 +1072,14 @@ class SimpleMCQGenerator:
     
     def _generate_definition_distractors(self, correct_definition: str, content: Dict[str, Any], term: str) -> List[str]:
         """Generate plausible wrong definitions"""
-        distractors = []
+        # Definitions of other terms that read most like the correct one, from any analyzed document
+        distractors = self.distractor_index.similar(correct_definition, k=3, exclude_term=term, max_length=100)
         
-        # Get other definitions from content
-        other_definitions = [d['definition'] for d in content.get('definition_sentences', [])]
-        other_definitions = [d for d in other_definitions if d != correct_definition and len(d) < 100]
-        
-        if other_definitions:
-            distractors.extend(other_definitions[:2])
+        # Top up with other definitions from content
+        for definition in content.get('definition_sentences', []):
+            other = definition['definition']
+            if len(distractors) < 3 and other != correct_definition and other not in distractors and len(other) < 100:
+                distractors.append(other)
         
         # Generate contextual distractors based on subject area
         subject = content.get('subject_area', 'general')
@@ -631,106 +1148,890 @@ class SimpleMCQGenerator:
                 question['difficulty'] = 'medium'
                 medium_count += 1
 
-# Initialize the generator
-mcq_generator = SimpleMCQGenerator()
+QUIZ_CACHE_DIR = os.getenv('QUIZ_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.quiz_cache'))
+
+# Per-page analyses, shared by every worker process through the directory; MCQ_PAGE_CACHE=0 turns it off
+page_cache = PageAnalysisCache(
+    cache_dir=os.path.join(QUIZ_CACHE_DIR, 'pages'),
+    max_memory_entries=int(os.getenv('MCQ_PAGE_CACHE_MEMORY_ENTRIES', '1024')),
+    max_disk_bytes=int(os.getenv('MCQ_PAGE_CACHE_MAX_BYTES', str(1024 * 1024 * 1024))),
+    max_age_seconds=int(os.getenv('QUIZ_CACHE_MAX_AGE_SECONDS', str(7 * 24 * 3600)))
+) if os.getenv('MCQ_PAGE_CACHE', '1') == '1' else None
+
+# Initialize the generator; the distractor log is shared by every worker process
+mcq_generator = SimpleMCQGenerator(
+    DistractorIndex(os.getenv('DISTRACTOR_INDEX_PATH', os.path.join(QUIZ_CACHE_DIR, 'definitions.jsonl'))),
+    NearDuplicateIndex(path=os.getenv('QUESTION_INDEX_PATH', os.path.join(QUIZ_CACHE_DIR, 'question_signatures.jsonl'))),
+    # MCQ_TOKENIZER=regex trades some sentence-splitting accuracy for speed (see benchmarks/bench_tokenizer.py)
+    get_tokenizer(os.getenv('MCQ_TOKENIZER', 'punkt')),
+    page_cache
+)
+
+def warm_worker() -> None:
+    """Load everything the first job would otherwise pay for: NLTK data, PyPDF2, the keyword automaton"""
+    import PyPDF2  # noqa: F401
+    nlp_resources.load()
+    mcq_generator.tokenizer.tokenize("Warm up the tokenizer. It is ready.")
+    mcq_generator._scan_phrases("Warm up the keyword automaton.")
+    mcq_generator.distractor_index.sync()
+    mcq_generator.question_index.sync()
+
+# CPU-bound pipeline stages run here so the event loop only handles I/O
+analysis_pool = AnalysisPool(
+    max_workers=int(os.getenv('MCQ_WORKERS', str(os.cpu_count() or 1))),
+    initializer=warm_worker,
+    # Prefork: warm once in the parent and fork workers that share it copy-on-write
+    prefork=os.getenv('MCQ_PREFORK', '0') == '1'
+)
+
+# Large-document mode: PDFs with at least this many pages (checked only above
+# the byte size) are analyzed as page ranges in parallel and merged
+MAP_REDUCE_MIN_BYTES = int(os.getenv('MCQ_MAP_REDUCE_MIN_BYTES', str(512 * 1024)))
+MAP_REDUCE_MIN_PAGES = int(os.getenv('MCQ_MAP_REDUCE_MIN_PAGES', '64'))
+# More chunks than workers keeps every worker busy when chunks take uneven time
+MAP_REDUCE_CHUNKS_PER_WORKER = 2
+
+# Batch uploads: documents analyzed at once, and files accepted per request
+BATCH_CONCURRENCY = int(os.getenv('MCQ_BATCH_CONCURRENCY', str(max(1, analysis_pool.max_workers))))
+BATCH_MAX_FILES = int(os.getenv('MCQ_BATCH_MAX_FILES', '50'))
+
+# Uploads are copied in chunks to temp files here and rejected with 413 past the cap
+UPLOAD_SPOOL_DIR = os.getenv('MCQ_UPLOAD_SPOOL_DIR') or None
+MAX_UPLOAD_BYTES = int(os.getenv('MCQ_MAX_UPLOAD_BYTES', str(200 * 1024 * 1024)))
+# Room for the multipart boundaries and part headers around each file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Oversized request bodies are refused before the form parser reads them
+app.add_middleware(UploadSizeLimit, limits={
+    '/upload': MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    '/upload/stream': MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    '/upload/batch': BATCH_MAX_FILES * (MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES),
+})
+
+# Generated quizzes keyed by the SHA-256 of the uploaded PDF
+quiz_cache = QuizCache(
+    cache_dir=QUIZ_CACHE_DIR,
+    max_memory_entries=int(os.getenv('QUIZ_CACHE_MEMORY_ENTRIES', '256')),
+    max_disk_bytes=int(os.getenv('QUIZ_CACHE_MAX_BYTES', str(512 * 1024 * 1024))),
+    max_age_seconds=int(os.getenv('QUIZ_CACHE_MAX_AGE_SECONDS', str(7 * 24 * 3600)))
+)
+
+def quiz_cache_key(content_hash: str, early_stop: bool, deadline: Optional[Deadline] = None) -> str:
+    """Cache key of a quiz: the PDF hash plus the options that change the result"""
+    key = f"{content_hash}-early" if early_stop else content_hash
+    # Tiers that sample pages analyze a different text; a deadline alone only changes a quiz that isn't cached
+    if deadline is not None and deadline.tier.max_pages:
+        key = f"{key}-{deadline.tier.name}"
+    # Quizzes from the default tokenizer keep their original keys
+    if mcq_generator.tokenizer.name != 'punkt':
+        key = f"{key}-{mcq_generator.tokenizer.name}"
+    return key
+
+# Every generated question, queryable later without the PDF
+question_bank = QuestionBank(os.getenv('QUESTION_BANK_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.question_bank', 'questions.db')))
+
+def cacheable(quiz: Dict[str, Any]) -> bool:
+    """A quiz cut short by its deadline depends on how fast the run happened to be, so it is not cached"""
+    schedule = quiz['metadata'].get('schedule')
+    return not (schedule and (schedule['pages_skipped'] or schedule['generators_skipped']))
 
-def extract_text_from_pdf(pdf_content: bytes) -> str:
-    """Extract text from PDF content"""
+def request_deadline(tier: Optional[str], deadline_ms: Optional[int]) -> Optional[Deadline]:
+    """The Deadline for a request's tier and deadline_ms parameters; a deadline without a tier uses the standard tier"""
+    if tier is None and deadline_ms is None:
+        return None
+    return Deadline(TIERS[tier or 'standard'], None if deadline_ms is None else deadline_ms / 1000)
+
+def store_quiz(questions: List[Dict[str, Any]], metadata: Dict[str, Any], file_info: Dict[str, Any]) -> None:
+    """Add a freshly generated quiz to the question bank; a bank failure never fails the upload"""
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
-        text = ""
-        
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            page_text = page.extract_text()
-            if page_text.strip():  # Only add if there's actual content
-                text += page_text + "\n"
-        
-        return text.strip()
+        question_bank.add_quiz(questions, metadata, file_info)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
+        logger.exception("❌ Could not store quiz in the question bank: %s", e)
+
+# Stage and request latencies, exported in the Prometheus text format on /metrics
+metrics_registry = MetricsRegistry()
+stage_duration = metrics_registry.histogram(
+    'mcq_stage_duration_seconds', 'Wall time spent in each pipeline stage per document',
+    labelnames=('stage', 'size_class', 'page_class'))
+request_duration = metrics_registry.histogram(
+    'mcq_request_duration_seconds', 'Time to produce the quiz for one uploaded document',
+    labelnames=('endpoint', 'cache', 'size_class'))
+
+def _cache_metrics() -> List[str]:
+    stats = quiz_cache.stats()
+    lines = []
+    for name in ('memory_hits', 'disk_hits', 'misses', 'writes', 'memory_evictions', 'disk_evictions', 'expirations'):
+        lines.append(f"# TYPE mcq_cache_{name}_total counter")
+        lines.append(f"mcq_cache_{name}_total {stats[name]}")
+    return lines
+
+metrics_registry.add_collector(_cache_metrics)
+
+# Uploads wait here for a slot instead of all being analyzed at once
+job_queue = JobQueue(
+    concurrency=int(os.getenv('MCQ_JOB_CONCURRENCY', str(max(1, analysis_pool.max_workers)))),
+    max_depth=int(os.getenv('MCQ_JOB_QUEUE_DEPTH', '32')),
+    keep_seconds=int(os.getenv('MCQ_JOB_KEEP_SECONDS', '3600')),
+    queue_wait=metrics_registry.histogram(
+        'mcq_job_queue_wait_seconds', 'Time an upload job waited in the queue before a worker picked it up',
+        labelnames=('kind',)),
+    service_time=metrics_registry.histogram(
+        'mcq_job_service_seconds', 'Time a worker spent on an upload job', labelnames=('kind',))
+)
+
+def _job_metrics() -> List[str]:
+    stats = job_queue.stats()
+    lines = []
+    for name in ('queued', 'running'):
+        lines.append(f"# TYPE mcq_jobs_{name} gauge")
+        lines.append(f"mcq_jobs_{name} {stats[name]}")
+    for name in ('submitted', 'rejected', 'succeeded', 'failed', 'cancelled'):
+        lines.append(f"# TYPE mcq_jobs_{name}_total counter")
+        lines.append(f"mcq_jobs_{name}_total {stats[name]}")
+    return lines
+
+metrics_registry.add_collector(_job_metrics)
+
+def record_quiz_timings(quiz: Dict[str, Any], size_bytes: int, pdf_read_seconds: float) -> None:
+    """Move the stage timings off a freshly built quiz into the stage histograms"""
+    timings = quiz.pop('timings', {})
+    timings['pdf_read'] = pdf_read_seconds
+    labels = {'size_class': size_class(size_bytes), 'page_class': page_class(quiz['metadata']['pages_analyzed'])}
+    for stage, seconds in timings.items():
+        stage_duration.observe(seconds, stage=stage, **labels)
+
+async def read_upload(file: UploadFile) -> SpooledUpload:
+    """Spool an uploaded file to disk; an upload over MAX_UPLOAD_BYTES is rejected with 413"""
+    try:
+        return await spool_upload(file, MAX_UPLOAD_BYTES, UPLOAD_SPOOL_DIR)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=too_large_detail(e.max_bytes))
+
+def iter_pdf_page_texts(pdf_path: str, start: int = 0, stop: Optional[int] = None,
+                        indices: Optional[Iterable[int]] = None) -> Iterator[tuple]:
+    """Yield (page index, text) for each non-empty PDF page in [start, stop), extracting pages only as they are consumed
+    
+    indices, when given, lists the pages to read instead of the range.
+    The file is memory-mapped, so the parser reads it through the page
+    cache and no copy of the whole PDF is held by the process.
+    """
+    # Imported on first use so the API process starts without it
+    import PyPDF2
+    
+    try:
+        with mapped_file(pdf_path) as pdf_data:
+            with span('extraction'):
+                pdf_reader = PyPDF2.PdfReader(pdf_data)
+                page_count = len(pdf_reader.pages)
+            
+            if indices is None:
+                indices = range(start, page_count if stop is None else min(stop, page_count))
+            for index in indices:
+                if index >= page_count:
+                    break
+                with span('extraction'):
+                    page_text = pdf_reader.pages[index].extract_text()
+                if page_text.strip():  # Only yield if there's actual content
+                    yield index, page_text
+    except Exception as e:
+        raise QuizGenerationError(400, f"Error reading PDF: {str(e)}")
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[str]:
+    """Yield the text of each non-empty PDF page, extracting pages only as they are consumed"""
+    for _, page_text in iter_pdf_page_texts(pdf_path):
+        yield page_text
+
+def count_pdf_pages(pdf_path: str) -> int:
+    import PyPDF2
+    
+    try:
+        with mapped_file(pdf_path) as pdf_data:
+            return len(PyPDF2.PdfReader(pdf_data).pages)
+    except Exception as e:
+        raise QuizGenerationError(400, f"Error reading PDF: {str(e)}")
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """Extract text from a PDF file"""
+    return "\n".join(iter_pdf_pages(pdf_path)).strip()
+
+def _report_pages(pages: Iterable[tuple], progress: Callable[[Dict[str, Any]], None]) -> Iterator[tuple]:
+    """Pass (index, text) pages through, reporting each one as it is extracted"""
+    for page_number, (index, page_text) in enumerate(pages, 1):
+        progress({'event': 'page', 'page': page_number, 'characters': len(page_text)})
+        yield index, page_text
+
+def iter_sampled_page_analyses(pages: Iterable[tuple], sample: List[range]) -> Iterator[Dict[str, Any]]:
+    """Per-page partials for pages read from a sample of page blocks
+    
+    Each block is analyzed as a run of its own. The unfinished sentence at
+    the end of a block continues on a page that is not read, so it is
+    dropped, and merge_page_analyses sees every block start cleanly.
+    """
+    block_starts = [block.start for block in sample]
+    for _, block in itertools.groupby(pages, key=lambda page: bisect.bisect_right(block_starts, page[0])):
+        previous = None
+        for partial in mcq_generator.iter_page_analyses(block):
+            if previous is not None:
+                yield previous
+            previous = partial
+        if previous is not None:
+            yield {**previous, 'carry': ''}
+
+def build_quiz(pdf_path: str, early_stop: bool = False, deadline: Optional[Deadline] = None,
+               progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Run extraction, analysis and generation for one PDF.
+
+    The result only depends on the PDF file's bytes (and the early-stop mode), so
+    it is what gets cached. Pages are streamed into the analyzer; with
+    early_stop the remaining pages are never extracted once there are
+    enough candidate sentences. progress, when given, is called with a
+    'page' event per extracted page and an 'analysis' event once the
+    analysis is done.
+    
+    With a deadline the work is scheduled to fit it: a tier with a page
+    limit samples blocks of pages across a long document, pages stop being
+    read once the deadline's analysis share is used up, and generation
+    skips what it has no time left for. The quiz is then built from
+    whatever was analyzed, and metadata['schedule'] reports what was
+    skipped.
+    
+    Per-stage wall times are returned under 'timings'; callers strip them
+    before caching and feed them into the stage histograms.
+    """
+    with recording() as recorder:
+        with span('total'):
+            quiz = _build_quiz(pdf_path, early_stop, deadline, progress)
+    quiz['timings'] = recorder.durations
+    return quiz
+
+def _build_quiz(pdf_path: str, early_stop: bool, deadline: Optional[Deadline],
+                progress: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+    question_count = 15
+    
+    if deadline is not None:
+        return _quiz_from_analysis(_analyze_with_deadline(pdf_path, early_stop, deadline, question_count, progress),
+                                   question_count, progress, deadline)
+    
+    pages = iter_pdf_page_texts(pdf_path)
+    if progress:
+        pages = _report_pages(pages, progress)
+    
+    # Extract and analyze page by page
+    if mcq_generator.page_cache is None:
+        content_analysis = mcq_generator.extract_content_from_pages(
+            (page_text for _, page_text in pages), question_count if early_stop else None)
+    else:
+        # Pages seen before (typically in an earlier revision of this PDF) reuse their cached analysis
+        content_analysis = mcq_generator.merge_page_analyses(
+            mcq_generator.iter_page_analyses(pages), question_count=question_count if early_stop else None)
+    return _quiz_from_analysis(content_analysis, question_count, progress)
+
+def _analyze_with_deadline(pdf_path: str, early_stop: bool, deadline: Deadline, question_count: int,
+                           progress: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+    """Content analysis of the pages the deadline leaves time for"""
+    page_count = count_pdf_pages(pdf_path)
+    sample = deadline.sample_pages(page_count)
+    planned = [index for block in sample for index in block] if sample else range(page_count)
+    
+    pages = deadline.pages_until_expired(iter_pdf_page_texts(pdf_path, indices=planned), planned)
+    if progress:
+        pages = _report_pages(pages, progress)
+    
+    partials = iter_sampled_page_analyses(pages, sample) if sample else mcq_generator.iter_page_analyses(pages)
+    return mcq_generator.merge_page_analyses(partials, question_count=question_count if early_stop else None)
+
+def _quiz_from_analysis(content_analysis: Dict[str, Any], question_count: int,
+                        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                        deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    if content_analysis['text_length'] < 150:
+        raise QuizGenerationError(400, "PDF content is too short to generate meaningful questions. Please upload a document with more text content.")
+    
+    logger.info("📄 Extracted %d characters of text from %d pages (%d reused from the page cache)", content_analysis['text_length'],
+                content_analysis['pages_analyzed'], content_analysis['pages_reused'])
+    logger.info("🧠 Content analysis complete - Subject: %s", content_analysis['subject_area'])
+    logger.info("📊 Found %d definitions, %d factual sentences",
+                len(content_analysis['definition_sentences']), len(content_analysis['factual_sentences']))
+    
+    if progress:
+        progress({
+            'event': 'analysis',
+            'subject_area': content_analysis['subject_area'],
+            'text_length': content_analysis['text_length'],
+            'pages_analyzed': content_analysis['pages_analyzed'],
+            'early_stopped': content_analysis['early_stopped'],
+            'candidates': {key: len(content_analysis[key]) for key in FINDER_CAPS}
+        })
+    
+    # Generate MCQ questions
+    questions = mcq_generator.generate_mcq_questions(content_analysis, question_count, deadline)
+    
+    if len(questions) < 3:
+        raise QuizGenerationError(400, "Could not generate enough questions from the PDF content. Please try a different document with more structured information.")
+    
+    quiz = {
+        'questions': questions,
+        'metadata': {
+            'total_questions': len(questions),
+            'difficulty_distribution': {
+                'easy': sum(1 for q in questions if q.get('difficulty') == 'easy'),
+                'medium': sum(1 for q in questions if q.get('difficulty') == 'medium'),
+                'hard': sum(1 for q in questions if q.get('difficulty') == 'hard')
+            },
+            'question_categories': {
+                'definition': sum(1 for q in questions if q.get('category') == 'definition'),
+                'application': sum(1 for q in questions if q.get('category') == 'application'),
+                'analysis': sum(1 for q in questions if q.get('category') == 'analysis'),
+                'factual': sum(1 for q in questions if q.get('category') == 'factual'),
+                'comparison': sum(1 for q in questions if q.get('category') == 'comparison')
+            },
+            'bloom_taxonomy': {
+                'remember': sum(1 for q in questions if q.get('bloom_level') == 'remember'),
+                'understand': sum(1 for q in questions if q.get('bloom_level') == 'understand'),
+                'apply': sum(1 for q in questions if q.get('bloom_level') == 'apply'),
+                'analyze': sum(1 for q in questions if q.get('bloom_level') == 'analyze')
+            },
+            'subject_area': content_analysis['subject_area'],
+            'complexity_score': content_analysis['complexity_score'],
+            'pages_analyzed': content_analysis['pages_analyzed'],
+            'pages_reused': content_analysis['pages_reused'],
+            'early_stopped': content_analysis['early_stopped'],
+            'generated_at': datetime.now().isoformat()
+        },
+        'text_length': content_analysis['text_length']
+    }
+    if deadline is not None:
+        quiz['metadata']['schedule'] = deadline.metadata()
+        if deadline.cut_short:
+            logger.info("⏱️ Deadline of %ss: skipped %d pages and generators %s", deadline.seconds,
+                        deadline.pages_skipped, deadline.generators_skipped)
+    return quiz
+
+def analyze_pdf_page_range(pdf_path: str, start: int, stop: int, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Map task of the large-document mode: per-page partials for pages [start, stop)
+    
+    With a deadline, pages stop being read once its analysis share is used
+    up; the chunk's unfinished last sentence is then dropped, as it
+    continues on a page that was not read.
+    """
+    skipped_before = deadline.pages_skipped if deadline is not None else 0
+    with recording() as recorder:
+        pages = iter_pdf_page_texts(pdf_path, start, stop)
+        if deadline is not None:
+            pages = deadline.pages_until_expired(pages, range(start, min(stop, deadline.pages_total or stop)))
+        partials = mcq_generator.analyze_pages(pages)
+    pages_skipped = deadline.pages_skipped - skipped_before if deadline is not None else 0
+    if pages_skipped and partials:
+        partials[-1] = {**partials[-1], 'carry': ''}
+    return {'partials': partials, 'pages_skipped': pages_skipped, 'timings': recorder.durations}
+
+def reduce_quiz(pdf_path: str, chunks: List[Dict[str, Any]], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Reduce task of the large-document mode: merge the chunks' partials and generate the quiz"""
+    reader = None
+    
+    with contextlib.ExitStack() as stack:
+        def page_text(index: int) -> str:
+            # Only needed for chunk-boundary pages whose carried-in sentence was wrong
+            nonlocal reader
+            if reader is None:
+                import PyPDF2
+                reader = PyPDF2.PdfReader(stack.enter_context(mapped_file(pdf_path)))
+            with span('extraction'):
+                return reader.pages[index].extract_text()
+        
+        with recording() as recorder:
+            content_analysis = mcq_generator.merge_page_analyses(
+                (partial for chunk in chunks for partial in chunk['partials']), page_text)
+            if deadline is not None:
+                deadline.pages_skipped = sum(chunk['pages_skipped'] for chunk in chunks)
+            quiz = _quiz_from_analysis(content_analysis, 15, deadline=deadline)
+    
+    # Stage times summed over every worker that took part
+    timings = recorder.durations
+    for chunk in chunks:
+        for stage, seconds in chunk['timings'].items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+    quiz['timings'] = timings
+    return quiz
+
+async def build_quiz_map_reduce(pdf_path: str, page_count: int, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Analyze page ranges of a large PDF in parallel workers, then merge them into one quiz.
+    
+    The quiz is the same as build_quiz(pdf_path, deadline=deadline) produces in one process.
+    """
+    start = time.perf_counter()
+    if deadline is not None:
+        deadline.pages_total = page_count
+    chunk_pages = -(-page_count // (analysis_pool.max_workers * MAP_REDUCE_CHUNKS_PER_WORKER))
+    chunks = await asyncio.gather(*(
+        analysis_pool.run(analyze_pdf_page_range, pdf_path, first, first + chunk_pages, deadline)
+        for first in range(0, page_count, chunk_pages)
+    ))
+    quiz = await analysis_pool.run(reduce_quiz, pdf_path, chunks, deadline)
+    quiz['timings']['total'] = time.perf_counter() - start
+    logger.info("🧩 Map-reduce analysis of %d pages in %d chunks", page_count, len(chunks))
+    return quiz
+
+async def run_build_quiz(upload: SpooledUpload, early_stop: bool = False,
+                         deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """build_quiz in the analysis pool, split across workers for large documents
+    
+    Workers get the spool file's path and map the file themselves, so the
+    PDF is never pickled across the process boundary.
+    """
+    sampled = deadline is not None and deadline.tier.max_pages
+    if (not early_stop and not sampled and analysis_pool.running and analysis_pool.max_workers > 1
+            and upload.size_bytes >= MAP_REDUCE_MIN_BYTES):
+        page_count = await analysis_pool.run(count_pdf_pages, upload.path)
+        if page_count >= MAP_REDUCE_MIN_PAGES:
+            return await build_quiz_map_reduce(upload.path, page_count, deadline)
+    return await analysis_pool.run(build_quiz, upload.path, early_stop, deadline)
+
+async def generate_quiz_response(upload: SpooledUpload, early_stop: bool = False,
+                                 endpoint: str = 'upload', deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Generate (or fetch from cache) the quiz for one uploaded PDF, shaped as the /upload response
+    
+    The deadline's clock starts here, so time spent queued doesn't count against it.
+    """
+    filename = upload.filename
+    logger.info("📁 Processing PDF: %s (%d bytes)", filename, upload.size_bytes)
+    start = time.perf_counter()
+    if deadline is not None:
+        deadline.start()
+        early_stop = early_stop or deadline.tier.early_stop
+    
+    # Identical uploads (e.g. a whole class submitting the same handout) reuse the cached quiz
+    content_hash = upload.sha256
+    cache_key = quiz_cache_key(content_hash, early_stop, deadline)
+    quiz = quiz_cache.get(cache_key)
+    cache_hit = quiz is not None
+    
+    if cache_hit:
+        logger.info("⚡ Cache hit for %s", content_hash[:12])
+    else:
+        quiz = await run_build_quiz(upload, early_stop, deadline)
+        record_quiz_timings(quiz, upload.size_bytes, upload.read_seconds)
+        if cacheable(quiz):
+            # Disk writes stay off the event loop
+            await asyncio.to_thread(quiz_cache.put, cache_key, quiz)
+    request_duration.observe(time.perf_counter() - start + upload.read_seconds, endpoint=endpoint,
+                             cache='hit' if cache_hit else 'miss', size_class=size_class(upload.size_bytes))
+    
+    questions = quiz['questions']
+    
+    # Prepare quiz data
+    quiz_data = {
+        'questions': questions,
+        'metadata': quiz['metadata'],
+        'file_info': {
+            'filename': filename,
+            'size_bytes': upload.size_bytes,
+            'text_length': quiz['text_length'],
+            'content_hash': content_hash,
+            'cache_hit': cache_hit,
+            'upload_time': datetime.now().isoformat()
+        }
+    }
+    
+    if not cache_hit:
+        # The bank's insert can wait on SQLite's lock, so it runs in a thread
+        await asyncio.to_thread(store_quiz, questions, quiz['metadata'], quiz_data['file_info'])
+    
+    logger.info("✅ Generated %d MCQ questions", len(questions))
+    logger.debug("📊 Categories: %s", quiz_data['metadata']['question_categories'])
+    logger.debug("🎯 Difficulty: %s", quiz_data['metadata']['difficulty_distribution'])
+    
+    return {
+        "success": True,
+        "message": f"Successfully generated {len(questions)} MCQ questions from {filename}",
+        "data": quiz_data
+    }
+
+def submit_upload_job(kind: str, upload: SpooledUpload, early_stop: bool, deadline: Optional[Deadline] = None,
+                      work: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None) -> Job:
+    """Queue the quiz generation for one upload; a full or stopped queue surfaces as 429 / 503
+    
+    The job runs work() if given, generate_quiz_response otherwise. It owns
+    the spooled upload from here on and deletes it once it is over, however
+    it ends (even unrun, when the queue shuts down or the job is discarded).
+    """
+    async def run() -> Dict[str, Any]:
+        try:
+            if work is not None:
+                return await work()
+            return await generate_quiz_response(upload, early_stop, kind, deadline)
+        except QuizGenerationError:
+            raise
+        except Exception as e:
+            logger.exception("❌ Error processing PDF: %s", e)
+            raise
+    
+    try:
+        return job_queue.submit(kind, run, cleanup=upload.close, filename=upload.filename, size_bytes=upload.size_bytes, early_stop=early_stop,
+                                tier=deadline.tier.name if deadline is not None else None)
+    except QueueFull as e:
+        upload.close()
+        raise HTTPException(status_code=429, detail="Too many PDFs are waiting to be processed, retry later",
+                            headers={'Retry-After': str(e.retry_after)})
+    except QueueClosed as e:
+        upload.close()
+        raise HTTPException(status_code=503, detail=str(e))
+
+def job_error(job: Job) -> Dict[str, Any]:
+    """status_code and detail for a failed job, as /upload would have reported them"""
+    if isinstance(job.error, QuizGenerationError):
+        return {'status_code': job.error.status_code, 'detail': job.error.detail}
+    if isinstance(job.error, QueueClosed):
+        return {'status_code': 503, 'detail': str(job.error)}
+    return {'status_code': 500, 'detail': f"Error processing PDF: {str(job.error)}"}
+
+def job_status(job: Job) -> Dict[str, Any]:
+    """Public view of a job: its state, timings and, once finished, the result or error"""
+    status = {
+        'job_id': job.id,
+        'status': job.status,
+        'filename': job.info.get('filename'),
+        'size_bytes': job.info.get('size_bytes'),
+        'queued_at': datetime.fromtimestamp(job.enqueued_at).isoformat(),
+        'queue_wait_seconds': job.queue_wait_seconds,
+        'service_seconds': job.service_seconds
+    }
+    if job.status == 'queued':
+        status['queue'] = {'queued': job_queue.stats()['queued'], 'max_depth': job_queue.max_depth}
+    elif job.status == 'succeeded':
+        status['result'] = job.result
+    elif job.status == 'failed':
+        status['error'] = job_error(job)
+    return status
+
+# Query parameters shared by the upload endpoints
+TIER_QUERY = Query(None, pattern=f"^({'|'.join(TIERS)})$", description="Quality tier: " + ", ".join(TIERS))
+DEADLINE_QUERY = Query(None, ge=100, description="Time budget for generating the quiz, in milliseconds")
 
 @app.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
-    """Upload PDF and generate MCQ quiz"""
+async def upload_pdf(file: UploadFile = File(...), early_stop: bool = False, background: bool = False,
+                     tier: Optional[str] = TIER_QUERY, deadline_ms: Optional[int] = DEADLINE_QUERY):
+    """Upload PDF and generate MCQ quiz
+    
+    With early_stop=true, page extraction stops once enough candidate
+    sentences have been found, which is much faster on long textbooks.
+    
+    tier (fast, standard or thorough) and/or deadline_ms bound how long
+    generation may take: 'fast' stops early and samples pages of long
+    documents, and with any deadline the quiz is built from what could be
+    analyzed in time. metadata.schedule reports what was skipped.
+    
+    Uploads are processed through the job queue, at most
+    MCQ_JOB_CONCURRENCY at a time. With background=true the response is
+    202 with a job id right away; poll GET /jobs/{id} or stream
+    GET /jobs/{id}/stream for the quiz. Otherwise the request waits for
+    its job. When the queue is full the upload is rejected with 429.
+    """
     
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
+    # Spool the PDF to disk
+    upload = await read_upload(file)
+    job = submit_upload_job('background' if background else 'upload', upload, early_stop,
+                            request_deadline(tier, deadline_ms))
+    if background:
+        return JSONResponse(status_code=202, content=job_status(job), headers={'Location': f"/jobs/{job.id}"})
+    
     try:
-        # Read PDF content
-        pdf_content = await file.read()
-        print(f"📁 Processing PDF: {file.filename} ({len(pdf_content)} bytes)")
-        
-        # Extract text
-        text = extract_text_from_pdf(pdf_content)
-        
-        if len(text.strip()) < 150:
-            raise HTTPException(status_code=400, detail="PDF content is too short to generate meaningful questions. Please upload a document with more text content.")
-        
-        print(f"📄 Extracted {len(text)} characters of text")
-        
-        # Analyze content
-        content_analysis = mcq_generator.extract_content(text)
-        print(f"🧠 Content analysis complete - Subject: {content_analysis['subject_area']}")
-        print(f"📊 Found {len(content_analysis['definition_sentences'])} definitions, {len(content_analysis['factual_sentences'])} factual sentences")
-        
-        # Generate MCQ questions
-        questions = mcq_generator.generate_mcq_questions(content_analysis, 15)
-        
-        if len(questions) < 3:
-            raise HTTPException(status_code=400, detail="Could not generate enough questions from the PDF content. Please try a different document with more structured information.")
+        await job.wait()
+    finally:
+        # Nobody polls for a job whose request waited for it (and one whose client left is cancelled)
+        job_queue.discard(job)
+    if job.error is not None:
+        raise HTTPException(**job_error(job))
+    return job.result
+
+@app.post("/upload/batch")
+async def upload_pdf_batch(files: List[UploadFile] = File(...), early_stop: bool = False,
+                           tier: Optional[str] = TIER_QUERY, deadline_ms: Optional[int] = DEADLINE_QUERY):
+    """Upload several PDFs and stream each quiz back as NDJSON as soon as it is ready
+    
+    Each file is a job on the upload queue, and at most BATCH_CONCURRENCY
+    of a batch's files are queued at once; a file the queue turns away gets
+    a 429 (or 503) error line. Every line
+    carries the file's index and filename; failed files produce an error
+    line instead of failing the batch. A final summary line closes the stream.
+    tier and deadline_ms apply to each file on its own.
+    """
+    
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_FILES} files can be uploaded in one batch")
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def process(index: int, file: UploadFile) -> Dict[str, Any]:
+        result = {'index': index, 'filename': file.filename}
+        if not file.filename.endswith('.pdf'):
+            return {**result, 'success': False, 'status_code': 400, 'detail': "Only PDF files are allowed"}
+        
+        async with semaphore:
+            try:
+                job = submit_upload_job('batch', await read_upload(file), early_stop, request_deadline(tier, deadline_ms))
+            except HTTPException as e:
+                return {**result, 'success': False, 'status_code': e.status_code, 'detail': e.detail}
+            try:
+                await job.wait()
+            finally:
+                # Also when the client went away and this task was cancelled: the job stops holding a queue slot
+                job_queue.discard(job)
+            if job.error is not None:
+                return {**result, 'success': False, **job_error(job)}
+            return {**result, **job.result}
+    
+    async def stream_results():
+        tasks = [asyncio.create_task(process(index, file)) for index, file in enumerate(files)]
+        succeeded = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                succeeded += result['success']
+                yield json.dumps(result) + "\n"
+        finally:
+            # Client went away: don't queue files nobody will read
+            for task in tasks:
+                task.cancel()
+        
+        yield json.dumps({'done': True, 'total': len(files), 'succeeded': succeeded, 'failed': len(files) - succeeded}) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+async def job_progress(job: Job, progress: asyncio.Queue) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the progress events a job puts on progress, until the job has finished"""
+    finished = asyncio.ensure_future(job.wait())
+    try:
+        while True:
+            next_event = asyncio.ensure_future(progress.get())
+            await asyncio.wait({next_event, finished}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_event.done():
+                next_event.cancel()
+                break
+            yield next_event.result()
+        while not progress.empty():
+            yield progress.get_nowait()
+    finally:
+        finished.cancel()
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/upload/stream")
+async def upload_pdf_stream(file: UploadFile = File(...), early_stop: bool = True,
+                            tier: Optional[str] = TIER_QUERY, deadline_ms: Optional[int] = DEADLINE_QUERY):
+    """Upload PDF and stream progress and questions back as Server-Sent Events
+    
+    Events: 'page' for each extracted page, 'analysis' when content analysis
+    is done, one 'question' per generated question, then 'done' with the
+    quiz metadata and file info (or 'error'). Early stop is on by default
+    here so the first question arrives quickly on long documents. tier and
+    deadline_ms work as for /upload.
+    
+    A quiz that isn't cached is built by a job on the upload queue, so a
+    full queue rejects the upload with 429 before the stream starts.
+    """
+    
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    
+    upload = await read_upload(file)
+    deadline = request_deadline(tier, deadline_ms)
+    stream_early_stop = early_stop or (deadline is not None and deadline.tier.early_stop)
+    content_hash = upload.sha256
+    cache_key = quiz_cache_key(content_hash, stream_early_stop, deadline)
+    start = time.perf_counter()
+    quiz = quiz_cache.get(cache_key)
+    cache_hit = quiz is not None
+    progress: asyncio.Queue = asyncio.Queue()
+    
+    async def build_with_progress() -> Dict[str, Any]:
+        logger.info("📁 Streaming PDF: %s (%d bytes)", file.filename, upload.size_bytes)
+        if deadline is not None:
+            deadline.start()
+        built = None
+        async for kind, value in analysis_pool.run_with_progress(build_quiz, upload.path, stream_early_stop, deadline):
+            if kind == 'progress':
+                progress.put_nowait(value)
+            else:
+                built = value
+        record_quiz_timings(built, upload.size_bytes, upload.read_seconds)
+        if cacheable(built):
+            await asyncio.to_thread(quiz_cache.put, cache_key, built)
+        return built
+    
+    if cache_hit:
+        upload.close()
+        job = None
+    else:
+        job = submit_upload_job('stream', upload, stream_early_stop, deadline, work=build_with_progress)
+    
+    async def stream_events():
+        nonlocal quiz
+        if job is not None:
+            try:
+                async for value in job_progress(job, progress):
+                    yield _sse(value.pop('event'), value)
+            finally:
+                # A client that leaves mid-stream doesn't keep its job running
+                job_queue.discard(job)
+            if job.error is not None:
+                yield _sse('error', job_error(job))
+                return
+            quiz = job.result
+        request_duration.observe(time.perf_counter() - start + upload.read_seconds, endpoint='stream',
+                                 cache='hit' if cache_hit else 'miss', size_class=size_class(upload.size_bytes))
+        
+        for index, question in enumerate(quiz['questions']):
+            yield _sse('question', {'index': index, 'question': question})
+        
+        file_info = {
+            'filename': file.filename,
+            'size_bytes': upload.size_bytes,
+            'text_length': quiz['text_length'],
+            'content_hash': content_hash,
+            'cache_hit': cache_hit,
+            'upload_time': datetime.now().isoformat()
+        }
+        if not cache_hit:
+            await asyncio.to_thread(store_quiz, quiz['questions'], quiz['metadata'], file_info)
         
-        # Prepare quiz data
-        quiz_data = {
+        yield _sse('done', {'metadata': quiz['metadata'], 'file_info': file_info})
+    
+    return StreamingResponse(stream_events(), media_type="text/event-stream", headers={'Cache-Control': 'no-cache'})
+
+@app.on_event("startup")
+def start_analysis_pool():
+    # Thread mode runs jobs in this process, so warm it here rather than on the first upload
+    if analysis_pool.max_workers <= 0:
+        warm_worker()
+    analysis_pool.start()
+    cold_start['ready_seconds'] = round(time.perf_counter() - IMPORT_STARTED, 4)
+
+@app.on_event("startup")
+async def start_job_queue():
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    # Before the pool goes away, so running jobs aren't cut off mid-analysis
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+def stop_analysis_pool():
+    analysis_pool.shutdown()
+
+@app.get("/jobs/stats")
+def jobs_stats():
+    """Job queue depth, concurrency and outcome counters"""
+    return job_queue.stats()
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """State of an upload job; carries the /upload response once it has succeeded"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, heartbeat: float = Query(15.0, gt=0, le=60)):
+    """Wait for an upload job as Server-Sent Events
+    
+    A 'status' event is sent right away and then every heartbeat seconds
+    while the job is queued or running (keeping proxies from timing out
+    the connection), followed by 'done' with the /upload response or 'error'.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def stream_events():
+        yield _sse('status', job_status(job))
+        while not await job.wait(heartbeat):
+            yield _sse('status', job_status(job))
+        if job.error is not None:
+            yield _sse('error', job_error(job))
+        else:
+            yield _sse('done', job.result)
+    
+    return StreamingResponse(stream_events(), media_type="text/event-stream", headers={'Cache-Control': 'no-cache'})
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Quiz cache hit/miss counters"""
+    return quiz_cache.stats()
+
+@app.get("/questions")
+def search_questions(q: Optional[str] = None, subject_area: Optional[str] = None, difficulty: Optional[str] = None,
+                     category: Optional[str] = None, bloom_level: Optional[str] = None,
+                     limit: int = Query(20, ge=1, le=200), offset: int = Query(0, ge=0),
+                     include_duplicates: bool = False):
+    """Search the question bank by text (question and source sentence) and attributes"""
+    questions = question_bank.search(q, limit=limit, offset=offset, include_duplicates=include_duplicates,
+                                     subject_area=subject_area, difficulty=difficulty,
+                                     category=category, bloom_level=bloom_level)
+    return {"success": True, "count": len(questions), "questions": questions}
+
+@app.get("/questions/stats")
+def question_bank_stats():
+    """Question bank size per subject, difficulty, category and Bloom level"""
+    return question_bank.stats()
+
+@app.get("/questions/{question_id}")
+def get_question(question_id: str):
+    question = question_bank.get(question_id)
+    if question is None:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return question
+
+@app.get("/quiz")
+def assemble_quiz(count: int = Query(15, ge=1, le=100), q: Optional[str] = None, subject_area: Optional[str] = None,
+                  difficulty: Optional[str] = None, category: Optional[str] = None, bloom_level: Optional[str] = None,
+                  seed: Optional[int] = None):
+    """Assemble a quiz from stored questions; no PDF is parsed
+    
+    Near-duplicates of other stored questions are left out. With a seed
+    the same selection comes back every time.
+    """
+    questions = question_bank.assemble_quiz(count, q, seed, subject_area=subject_area, difficulty=difficulty,
+                                            category=category, bloom_level=bloom_level)
+    if not questions:
+        raise HTTPException(status_code=404, detail="No stored questions match these filters")
+    
+    return {
+        "success": True,
+        "message": f"Assembled {len(questions)} MCQ questions from the question bank",
+        "data": {
             'questions': questions,
             'metadata': {
                 'total_questions': len(questions),
-                'difficulty_distribution': {
-                    'easy': sum(1 for q in questions if q.get('difficulty') == 'easy'),
-                    'medium': sum(1 for q in questions if q.get('difficulty') == 'medium'),
-                    'hard': sum(1 for q in questions if q.get('difficulty') == 'hard')
-                },
-                'question_categories': {
-                    'definition': sum(1 for q in questions if q.get('category') == 'definition'),
-                    'application': sum(1 for q in questions if q.get('category') == 'application'),
-                    'analysis': sum(1 for q in questions if q.get('category') == 'analysis'),
-                    'factual': sum(1 for q in questions if q.get('category') == 'factual'),
-                    'comparison': sum(1 for q in questions if q.get('category') == 'comparison')
-                },
-                'bloom_taxonomy': {
-                    'remember': sum(1 for q in questions if q.get('bloom_level') == 'remember'),
-                    'understand': sum(1 for q in questions if q.get('bloom_level') == 'understand'),
-                    'apply': sum(1 for q in questions if q.get('bloom_level') == 'apply'),
-                    'analyze': sum(1 for q in questions if q.get('bloom_level') == 'analyze')
-                },
-                'subject_area': content_analysis['subject_area'],
-                'complexity_score': content_analysis['complexity_score'],
+                'difficulty_distribution': dict(Counter(question.get('difficulty') for question in questions)),
+                'question_categories': dict(Counter(question.get('category') for question in questions)),
+                'bloom_taxonomy': dict(Counter(question.get('bloom_level') for question in questions)),
+                'source': 'question_bank',
                 'generated_at': datetime.now().isoformat()
-            },
-            'file_info': {
-                'filename': file.filename,
-                'size_bytes': len(pdf_content),
-                'text_length': len(text),
-                'upload_time': datetime.now().isoformat()
             }
         }
-        
-        print(f"✅ Generated {len(questions)} MCQ questions")
-        print(f"📊 Categories: {quiz_data['metadata']['question_categories']}")
-        print(f"🎯 Difficulty: {quiz_data['metadata']['difficulty_distribution']}")
-        
-        return {
-            "success": True,
-            "message": f"Successfully generated {len(questions)} MCQ questions from {file.filename}",
-            "data": quiz_data
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"❌ Error processing PDF: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    }
+
+@app.get("/questions/duplicates/stats")
+def question_index_stats():
+    """Size of the near-duplicate index over generated questions"""
+    return mcq_generator.question_index.stats()
+
+@app.get("/distractors/stats")
+def distractor_stats():
+    """Size of the definition index used for distractors"""
+    return mcq_generator.distractor_index.stats()
+
+@app.get("/metrics")
+def metrics():
+    """Per-stage latency histograms and cache counters in the Prometheus text format"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def read_root():
@@ -754,7 +2055,20 @@ def read_root():
             "comparison": "Comparing concepts"
         },
         "endpoints": {
-            "POST /upload": "Upload PDF and generate MCQ quiz",
+            "POST /upload": "Upload PDF and generate MCQ quiz (background=true returns a job id; tier=fast|standard|thorough or deadline_ms bounds the time)",
+            "POST /upload/batch": "Upload several PDFs, quizzes stream back as NDJSON",
+            "POST /upload/stream": "Upload PDF, progress and questions stream back as Server-Sent Events",
+            "GET /jobs/{id}": "State and result of a background upload job",
+            "GET /jobs/{id}/stream": "Wait for a background upload job as Server-Sent Events",
+            "GET /jobs/stats": "Job queue depth and outcome counters",
+            "GET /quiz": "Assemble a quiz from the question bank (filters: subject_area, difficulty, category, bloom_level, q)",
+            "GET /questions": "Search stored questions by text and attributes",
+            "GET /questions/{id}": "One stored question",
+            "GET /questions/stats": "Question bank size per attribute",
+            "GET /cache/stats": "Quiz cache hit/miss counters",
+            "GET /distractors/stats": "Size of the definition index used for distractors",
+            "GET /questions/duplicates/stats": "Size of the near-duplicate index over generated questions",
+            "GET /metrics": "Per-stage latency histograms (Prometheus text format)",
             "GET /health": "Health check endpoint"
         }
     }
@@ -770,7 +2084,10 @@ def health_check():
             "nltk": True,
             "spacy": False,
             "simple_mode": True
-        }
+        },
+        "analysis_pool": analysis_pool.stats(),
+        "job_queue": job_queue.stats(),
+        "cold_start": {**cold_start, 'nltk_offline': nlp_resources.OFFLINE}
     }
 
 if __name__ == "__main__":
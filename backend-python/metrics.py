@@ -0,0 +1,150 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond stages to multi-minute textbooks
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with a fixed label set"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                labels = [f'{name}="{value}"' for name, value in zip(self.labelnames, key)]
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    bucket_labels = labels + [f'le="{le}"']
+                    lines.append(f"{self.name}_bucket{{{','.join(bucket_labels)}}} {cumulative}")
+                label_text = f"{{{','.join(labels)}}}" if labels else ''
+                lines.append(f"{self.name}_sum{label_text} {total}")
+                lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Histograms plus gauge/counter callbacks, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        if name not in self._histograms:
+            self._histograms[name] = Histogram(name, documentation, labelnames, buckets)
+        return self._histograms[name]
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        """Register a callback producing extra exposition lines at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self._histograms.values():
+            lines.extend(histogram.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+class SpanRecorder:
+    """Wall time accumulated per pipeline stage for one job"""
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def timed(self, stage: str, fn: Callable) -> Callable:
+        """Wrap fn so every call adds to the stage's time"""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return wrapper
+
+
+_current_recorder: ContextVar[Optional[SpanRecorder]] = ContextVar('mcq_span_recorder', default=None)
+
+
+def current_recorder() -> Optional[SpanRecorder]:
+    """The recorder of the job running in this thread/process, if it is being timed"""
+    return _current_recorder.get()
+
+
+@contextmanager
+def recording() -> Iterator[SpanRecorder]:
+    """Time every span opened inside the block into a fresh recorder"""
+    recorder = SpanRecorder()
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a stage into the current recorder; free when nothing is recording"""
+    recorder = _current_recorder.get()
+    if recorder is None:
+        yield
+        return
+    with recorder.span(stage):
+        yield
+
+
+def size_class(size_bytes: int) -> str:
+    """Coarse document-size label, so the size dimension keeps a bounded cardinality"""
+    for limit, label in ((100 * 1024, 'lt_100kb'), (1024 * 1024, 'lt_1mb'), (10 * 1024 * 1024, 'lt_10mb')):
+        if size_bytes < limit:
+            return label
+    return 'ge_10mb'
+
+
+def page_class(pages: int) -> str:
+    """Coarse page-count label"""
+    for limit, label in ((10, '1_10'), (100, '11_100'), (500, '101_500')):
+        if pages <= limit:
+            return label
+    return 'gt_500'
@@ -0,0 +1,124 @@
+import re
+import threading
+import zlib
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+from append_log import JsonLinesLog
+
+# Words for shingling; case and punctuation don't make two questions different
+SHINGLE_WORD_RE = re.compile(r'[^\W_]+')
+
+# Mersenne prime for the universal hash family; a * x stays below 2**63 for 32-bit x
+_PRIME = (1 << 31) - 1
+
+
+class MinHasher:
+    """MinHash signatures over word 3-gram shingles"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+    @staticmethod
+    def shingles(text: str, size: int = 3) -> set:
+        words = [word.lower() for word in SHINGLE_WORD_RE.findall(text)]
+        if len(words) <= size:
+            return {' '.join(words)} if words else set()
+        return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = self.shingles(text)
+        if not shingles:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint32)
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        return (((hashes[:, None] * self._a) + self._b) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """Locality-sensitive hashing index of MinHash signatures.
+
+    Signatures are cut into bands; two items land in a common bucket when
+    any band matches exactly, which is likely once their Jaccard
+    similarity approaches (1 / bands) ** (1 / rows). A query only compares
+    against items sharing a bucket, so its cost depends on how many near
+    copies exist, not on the size of the index. Candidates are confirmed
+    with the signature-estimated Jaccard similarity.
+
+    When ``path`` is given, added signatures are appended to a JSON-lines
+    log there and other processes using the same log pick them up on their
+    next query, as with the distractor index.
+    """
+
+    def __init__(self, hasher: Optional[MinHasher] = None, bands: int = 16, threshold: float = 0.6,
+                 path: Optional[str] = None):
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError("bands must divide the signature length")
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        self.threshold = threshold
+        self._log = JsonLinesLog(path) if path else None
+        self._lock = threading.RLock()
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        return self.hasher.signature(text)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _insert(self, key: Hashable, signature: np.ndarray) -> bool:
+        if key in self._signatures:
+            return False
+        self._signatures[key] = signature
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, []).append(key)
+        return True
+
+    def sync(self) -> None:
+        """Load signatures other processes appended to the log since the last sync"""
+        if self._log is None:
+            return
+        with self._lock:
+            for record in self._log.read_new():
+                signature = np.array(record.get('signature', ()), dtype=np.uint32)
+                if len(signature) == self.hasher.num_perm:
+                    self._insert(record['key'], signature)
+
+    def add(self, key: Hashable, signature: np.ndarray) -> None:
+        with self._lock:
+            if self._insert(key, signature) and self._log is not None:
+                self._log.append([{'key': key, 'signature': signature.tolist()}])
+
+    def query(self, signature: np.ndarray) -> List[tuple]:
+        """(key, estimated similarity) of stored items at or above the threshold, most similar first"""
+        with self._lock:
+            self.sync()
+            candidates = set()
+            for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(buckets.get(band_key, ()))
+            matches = []
+            for key in candidates:
+                similarity = float(np.mean(self._signatures[key] == signature))
+                if similarity >= self.threshold:
+                    matches.append((key, similarity))
+            return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self.sync()
+            return {
+                'items': len(self._signatures),
+                'bands': self.bands,
+                'rows': self.rows,
+                'largest_bucket': max((len(keys) for buckets in self._buckets for keys in buckets.values()), default=0)
+            }
@@ -0,0 +1,82 @@
+import logging
+import os
+import threading
+from typing import FrozenSet, List, Optional
+
+logger = logging.getLogger('mcq')
+
+# Set NLTK_OFFLINE=1 in production images that ship their NLTK data: a
+# missing resource then fails startup instead of triggering a download
+OFFLINE = os.getenv('NLTK_OFFLINE', '0') == '1'
+
+_REQUIRED = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+}
+
+_lock = threading.Lock()
+_sentence_tokenizer = None
+_word_tokenizer = None
+_stop_words: Optional[FrozenSet[str]] = None
+
+
+def ensure_downloaded(offline: bool = OFFLINE) -> None:
+    """Make sure the NLTK data the pipeline needs is on disk.
+
+    Nothing is fetched when the data is already installed; with offline
+    set a missing resource raises LookupError rather than going to the
+    network.
+    """
+    import nltk
+
+    for package, path in _REQUIRED.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            if offline:
+                raise
+            logger.warning("NLTK resource %s missing, downloading it", package)
+            nltk.download(package, quiet=True)
+
+
+def load() -> None:
+    """Load punkt and the stopword list once; later calls are free"""
+    global _sentence_tokenizer, _word_tokenizer, _stop_words
+    if _stop_words is not None:
+        return
+    with _lock:
+        if _stop_words is not None:
+            return
+        ensure_downloaded()
+
+        import nltk
+        from nltk.corpus import stopwords
+        from nltk.tokenize import NLTKWordTokenizer
+
+        _sentence_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+        _word_tokenizer = NLTKWordTokenizer()
+        # Assigned last: it doubles as the "loaded" flag
+        _stop_words = frozenset(stopwords.words('english'))
+
+
+def stop_words() -> FrozenSet[str]:
+    load()
+    return _stop_words
+
+
+def sent_tokenize(text: str) -> List[str]:
+    """Same result as nltk.sent_tokenize(text) with the preloaded punkt model"""
+    load()
+    return _sentence_tokenizer.tokenize(text)
+
+
+def treebank_tokenize(sentence: str) -> List[str]:
+    """Treebank word tokens of text that is already a single sentence"""
+    load()
+    return _word_tokenizer.tokenize(sentence)
+
+
+def word_tokenize(text: str) -> List[str]:
+    """Same result as nltk.word_tokenize(text) with the preloaded tokenizers"""
+    load()
+    return [token for sentence in _sentence_tokenizer.tokenize(text) for token in _word_tokenizer.tokenize(sentence)]
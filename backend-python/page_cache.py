@@ -0,0 +1,72 @@
+import hashlib
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+from quiz_cache import QuizCache
+
+# Bump when the per-page analysis changes shape or meaning, so stale partials are never reused
+PAGE_ANALYSIS_VERSION = 1
+
+
+def page_key(page_text: str, carry: str, tokenizer: str) -> str:
+    """Cache key of one page's analysis.
+
+    A page's partial depends on its text, on the unfinished sentence
+    carried in from the page before it, and on the tokenizer. Trailing
+    whitespace on a line is not part of the key: PDF tools add and drop it
+    freely and it never changes a sentence.
+    """
+    normalized = '\n'.join(line.rstrip() for line in page_text.splitlines())
+    digest = hashlib.sha256(f"{PAGE_ANALYSIS_VERSION}\0{tokenizer}\0{carry}\0".encode('utf-8'))
+    digest.update(normalized.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PageAnalysisCache(QuizCache):
+    """Per-page analysis partials, keyed by page_key, so a revised PDF only re-analyzes the pages that changed.
+
+    Partials hold sentence stores and counters, so entries are pickled
+    rather than written as JSON. Every analysis worker process has its own
+    instance over the same directory; a key missing from this process's
+    disk index is looked up on disk before counting as a miss, so pages
+    analyzed by one worker are reused by the others. Every rescan_every
+    writes a worker re-reads the whole directory before evicting, so
+    max_disk_bytes bounds all workers together (overshooting by at most
+    rescan_every entries per worker in between).
+    """
+
+    suffix = '.pkl'
+    rescan_every = 64
+
+    def __init__(self, *args, **kwargs):
+        self._writes_since_scan = 0
+        super().__init__(*args, **kwargs)
+
+    def _evict_disk(self, now: float) -> None:
+        self._writes_since_scan += 1
+        if self._writes_since_scan >= self.rescan_every:
+            self._writes_since_scan = 0
+            self._scan_disk()
+        super()._evict_disk(now)
+
+    def _encode(self, value: Dict[str, Any]) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _decode(self, payload: bytes) -> Dict[str, Any]:
+        try:
+            return pickle.loads(payload)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            raise ValueError(f"Unreadable page analysis: {e}") from e
+
+    def _disk_entry(self, key: str) -> Optional[tuple]:
+        entry = self._disk_index.get(key)
+        if entry is None:
+            try:
+                stat = os.stat(self._path(key))
+            except OSError:
+                return None
+            # Written by another process since this one indexed the directory
+            entry = (stat.st_mtime, stat.st_size)
+            self._index_disk_entry(key, *entry)
+        return entry
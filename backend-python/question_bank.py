@@ -0,0 +1,187 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    content_hash TEXT,
+    filename TEXT,
+    subject_area TEXT,
+    difficulty TEXT,
+    category TEXT,
+    bloom_level TEXT,
+    question TEXT NOT NULL,
+    source_sentence TEXT,
+    duplicate_of TEXT,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_questions_subject_area ON questions (subject_area);
+CREATE INDEX IF NOT EXISTS idx_questions_difficulty ON questions (difficulty);
+CREATE INDEX IF NOT EXISTS idx_questions_category ON questions (category);
+CREATE INDEX IF NOT EXISTS idx_questions_bloom_level ON questions (bloom_level);
+CREATE INDEX IF NOT EXISTS idx_questions_content_hash ON questions (content_hash);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5 (
+    question, source_sentence, content='questions', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+    INSERT INTO questions_fts (rowid, question, source_sentence) VALUES (new.rowid, new.question, new.source_sentence);
+END;
+CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+    INSERT INTO questions_fts (questions_fts, rowid, question, source_sentence)
+    VALUES ('delete', old.rowid, old.question, old.source_sentence);
+END;
+"""
+
+# Columns that can be filtered on; each has its own index
+FILTERS = ('subject_area', 'difficulty', 'category', 'bloom_level')
+
+# Words of a free-text query, searched as FTS5 prefix terms
+QUERY_WORD_RE = re.compile(r'[^\W_]+')
+
+
+class QuestionBank:
+    """Every generated question, kept in SQLite so quizzes can be reassembled without the PDF.
+
+    The database runs in WAL mode, so the API can read while a new quiz is
+    being stored. Each thread gets its own connection. Filters use plain
+    column indexes; free-text search goes through an FTS5 index over the
+    question and its source sentence.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def add_quiz(self, questions: List[Dict[str, Any]], metadata: Dict[str, Any], file_info: Dict[str, Any]) -> int:
+        """Store one generated quiz; returns how many questions were new"""
+        created_at = datetime.now().isoformat()
+        rows = [(
+            question['id'],
+            file_info.get('content_hash'),
+            file_info.get('filename'),
+            metadata.get('subject_area'),
+            question.get('difficulty'),
+            question.get('category'),
+            question.get('bloom_level'),
+            question['question'],
+            question.get('source_sentence'),
+            question.get('duplicate_of'),
+            json.dumps(question),
+            created_at
+        ) for question in questions]
+
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                cursor = connection.executemany(
+                    "INSERT OR IGNORE INTO questions (id, content_hash, filename, subject_area, difficulty, category, "
+                    "bloom_level, question, source_sentence, duplicate_of, data, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                return cursor.rowcount
+
+    @staticmethod
+    def _where(filters: Dict[str, Optional[str]], include_duplicates: bool) -> tuple:
+        clauses, params = [], []
+        for column in FILTERS:
+            value = filters.get(column)
+            if value:
+                clauses.append(f"questions.{column} = ?")
+                params.append(value)
+        if not include_duplicates:
+            clauses.append("questions.duplicate_of IS NULL")
+        return clauses, params
+
+    @staticmethod
+    def _fts_query(text: Optional[str]) -> Optional[str]:
+        """FTS5 query requiring every word of text, each as a prefix"""
+        words = QUERY_WORD_RE.findall(text or '')
+        return ' '.join(f'"{word}"*' for word in words) if words else None
+
+    def get(self, question_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT data, subject_area FROM questions WHERE id = ?", (question_id,)).fetchone()
+        return {**json.loads(row['data']), 'subject_area': row['subject_area']} if row else None
+
+    def search(self, text: Optional[str] = None, limit: int = 20, offset: int = 0,
+               include_duplicates: bool = False, **filters: Optional[str]) -> List[Dict[str, Any]]:
+        """Questions matching the filters and, when given, the words of text (best matches first)"""
+        clauses, params = self._where(filters, include_duplicates)
+        query = self._fts_query(text)
+
+        if query:
+            sql = ("SELECT questions.data, questions.subject_area FROM questions_fts "
+                   "JOIN questions ON questions.rowid = questions_fts.rowid "
+                   "WHERE questions_fts MATCH ?" + ''.join(f" AND {clause}" for clause in clauses) +
+                   " ORDER BY questions_fts.rank LIMIT ? OFFSET ?")
+            params = [query] + params
+        else:
+            sql = ("SELECT data, subject_area FROM questions" + (" WHERE " + " AND ".join(clauses) if clauses else '') +
+                   " ORDER BY rowid DESC LIMIT ? OFFSET ?")
+
+        rows = self._connection().execute(sql, params + [limit, offset]).fetchall()
+        return [{**json.loads(row['data']), 'subject_area': row['subject_area']} for row in rows]
+
+    def assemble_quiz(self, count: int = 15, text: Optional[str] = None, seed: Optional[int] = None,
+                      **filters: Optional[str]) -> List[Dict[str, Any]]:
+        """A random selection of count stored questions matching the filters (and text, when given)"""
+        clauses, params = self._where(filters, include_duplicates=False)
+        query = self._fts_query(text)
+
+        # Pick among matching rowids (index-only), then load just the chosen rows
+        if query:
+            sql = ("SELECT questions.rowid FROM questions_fts JOIN questions ON questions.rowid = questions_fts.rowid "
+                   "WHERE questions_fts MATCH ?" + ''.join(f" AND {clause}" for clause in clauses))
+            params = [query] + params
+        else:
+            sql = "SELECT rowid FROM questions" + (" WHERE " + " AND ".join(clauses) if clauses else '')
+
+        connection = self._connection()
+        rowids = [row[0] for row in connection.execute(sql, params)]
+        chosen = random.Random(seed).sample(rowids, min(count, len(rowids)))
+        if not chosen:
+            return []
+
+        rows = connection.execute(
+            f"SELECT rowid, data, subject_area FROM questions WHERE rowid IN ({','.join('?' * len(chosen))})", chosen).fetchall()
+        by_rowid = {row['rowid']: {**json.loads(row['data']), 'subject_area': row['subject_area']} for row in rows}
+        return [by_rowid[rowid] for rowid in chosen]
+
+    def stats(self) -> Dict[str, Any]:
+        connection = self._connection()
+        stats = {
+            'questions': connection.execute("SELECT COUNT(*) FROM questions").fetchone()[0],
+            'duplicates': connection.execute("SELECT COUNT(*) FROM questions WHERE duplicate_of IS NOT NULL").fetchone()[0],
+            'documents': connection.execute("SELECT COUNT(DISTINCT content_hash) FROM questions").fetchone()[0],
+        }
+        for column in FILTERS:
+            stats[column] = {row[0] or 'unknown': row[1] for row in connection.execute(
+                f"SELECT {column}, COUNT(*) FROM questions GROUP BY {column}")}
+        return stats
+
+    def close(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
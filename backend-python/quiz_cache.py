@@ -0,0 +1,209 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class QuizCache:
+    """Content-addressed cache of generated quizzes.
+
+    Entries are keyed by the SHA-256 of the uploaded PDF bytes. A bounded
+    in-memory LRU tier sits in front of an on-disk tier that survives
+    restarts; the disk tier is evicted by total size and by entry age.
+    """
+
+    # File suffix of disk entries, and how values are written to them
+    suffix = '.json'
+
+    def __init__(self, cache_dir: str, max_memory_entries: int = 256,
+                 max_disk_bytes: int = 512 * 1024 * 1024, max_age_seconds: int = 7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age_seconds = max_age_seconds
+
+        self._lock = threading.Lock()
+        # key -> (stored_at, value), most recently used last
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        # key -> (stored_at, size_bytes), least recently stored first
+        self._disk_index: "OrderedDict[str, tuple]" = OrderedDict()
+        self._disk_bytes = 0
+
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+            'expirations': 0
+        }
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_disk_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def _encode(self, value: Any) -> bytes:
+        return json.dumps(value).encode('utf-8')
+
+    def _decode(self, payload: bytes) -> Any:
+        return json.loads(payload)
+
+    def _disk_entry(self, key: str) -> Optional[tuple]:
+        """(stored_at, size_bytes) of a key's file, if the disk tier has it"""
+        return self._disk_index.get(key)
+
+    def _load_disk_index(self) -> None:
+        """Rebuild the disk index from the files left by a previous run"""
+        self._scan_disk()
+        self._evict_disk(time.time())
+
+    def _scan_disk(self) -> None:
+        """Index every entry file in the cache directory, replacing what was indexed before"""
+        self._disk_index.clear()
+        self._disk_bytes = 0
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-len(self.suffix)], stat.st_size))
+
+        for stored_at, key, size in sorted(entries):
+            self._disk_index[key] = (stored_at, size)
+            self._disk_bytes += size
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.max_age_seconds > 0 and now - stored_at > self.max_age_seconds
+
+    def _index_disk_entry(self, key: str, stored_at: float, size: int) -> None:
+        """Add a file to the disk index at its place in stored_at order, which expiry and eviction rely on"""
+        if key in self._disk_index:
+            self._disk_bytes -= self._disk_index.pop(key)[1]
+        # Usually the newest entry, so at most a few are moved
+        newer = []
+        while self._disk_index and next(reversed(self._disk_index.values()))[0] > stored_at:
+            newer.append(self._disk_index.popitem())
+        self._disk_index[key] = (stored_at, size)
+        for newer_key, newer_entry in reversed(newer):
+            self._disk_index[newer_key] = newer_entry
+        self._disk_bytes += size
+
+    def _remove_disk_entry(self, key: str) -> None:
+        _, size = self._disk_index.pop(key)
+        self._disk_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict_disk(self, now: float) -> None:
+        """Drop expired entries, then the oldest ones until under the size limit"""
+        for key, (stored_at, _) in list(self._disk_index.items()):
+            if not self._is_expired(stored_at, now):
+                break
+            self._remove_disk_entry(key)
+            self.counters['expirations'] += 1
+
+        while self._disk_index and self._disk_bytes > self.max_disk_bytes:
+            key = next(iter(self._disk_index))
+            self._remove_disk_entry(key)
+            self.counters['disk_evictions'] += 1
+
+    def _remember(self, key: str, stored_at: float, value: Dict[str, Any]) -> None:
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.counters['memory_evictions'] += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached quiz for a content hash, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return entry[1]
+                del self._memory[key]
+                self.counters['expirations'] += 1
+
+            disk_entry = self._disk_entry(key)
+            if disk_entry is not None:
+                if self._is_expired(disk_entry[0], now):
+                    self._remove_disk_entry(key)
+                    self.counters['expirations'] += 1
+                else:
+                    try:
+                        with open(self._path(key), 'rb') as f:
+                            value = self._decode(f.read())
+                    except (OSError, ValueError):
+                        self._remove_disk_entry(key)
+                    else:
+                        self._remember(key, disk_entry[0], value)
+                        self.counters['disk_hits'] += 1
+                        return value
+
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a quiz in both tiers"""
+        now = time.time()
+        payload = self._encode(value)
+
+        with self._lock:
+            self._remember(key, now, value)
+
+            # Write to a temp file first so a crash never leaves a torn entry behind
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._path(key))
+            except OSError:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+
+            self._index_disk_entry(key, now, len(payload))
+            self.counters['writes'] += 1
+
+            self._evict_disk(now)
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            for key in list(self._disk_index):
+                self._remove_disk_entry(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            hits = self.counters['memory_hits'] + self.counters['disk_hits']
+            lookups = hits + self.counters['misses']
+            return {
+                **self.counters,
+                'hits': hits,
+                'lookups': lookups,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_entries': len(self._disk_index),
+                'disk_bytes': self._disk_bytes,
+                'max_memory_entries': self.max_memory_entries,
+                'max_disk_bytes': self.max_disk_bytes,
+                'max_age_seconds': self.max_age_seconds
+            }
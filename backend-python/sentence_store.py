@@ -0,0 +1,96 @@
+import bisect
+from array import array
+from typing import Iterable, Iterator, List
+
+# Bit per finder category in SentenceStore.categories
+CATEGORY_BITS = {
+    'definition_sentences': 1,
+    'comparison_sentences': 2,
+    'cause_effect_sentences': 4,
+    'process_sentences': 8,
+    'factual_sentences': 16,
+}
+
+
+class SentenceStore:
+    """The sentences of one document as a single text buffer plus integer columns.
+
+    A list of str pays a full object header per sentence; here each
+    sentence costs four integers: its start and end offset in the buffer,
+    its word count and a bitmask of the finder categories it was selected
+    for. Sentence strings are only sliced out when something asks for
+    one, e.g. when a question quotes its source sentence. Sentences are
+    separated by newlines in the buffer, which they never contain.
+
+    Each extend() call (a page) is stored as one joined chunk, so the
+    per-sentence strings are released as soon as the page is appended,
+    and one non-ASCII page doesn't widen the storage of every other page.
+    """
+
+    def __init__(self, sentences: Iterable[str] = ()):
+        # The buffer, as one chunk per extend() call
+        self._chunks: List[str] = []
+        self._chunk_starts = array('Q')
+        self._size = 0
+        self.starts = array('Q')
+        self.ends = array('Q')
+        self.word_counts = array('I')
+        self.categories = array('B')
+        self.extend(sentences)
+
+    def extend(self, sentences: Iterable[str]) -> range:
+        """Append sentences; returns their indices"""
+        first = len(self.starts)
+        batch = list(sentences)
+        if not batch:
+            return range(first, first)
+        
+        offset = self._size + 1 if self._chunks else 0
+        self._chunk_starts.append(offset)
+        for sentence in batch:
+            self.starts.append(offset)
+            offset += len(sentence)
+            self.ends.append(offset)
+            offset += 1
+            self.word_counts.append(len(sentence.split()))
+            self.categories.append(0)
+        chunk = '\n'.join(batch)
+        self._chunks.append(chunk)
+        self._size = self._chunk_starts[-1] + len(chunk)
+        return range(first, len(self.starts))
+
+    @property
+    def text(self) -> str:
+        """The whole buffer as one string (a copy)"""
+        return '\n'.join(self._chunks)
+
+    def mark(self, index: int, category: str) -> None:
+        self.categories[index] |= CATEGORY_BITS[category]
+
+    def indices(self, category: str) -> List[int]:
+        """Indices of the sentences marked with a category"""
+        bit = CATEGORY_BITS[category]
+        return [index for index, bits in enumerate(self.categories) if bits & bit]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: int) -> str:
+        start, end = self.starts[index], self.ends[index]
+        chunk = bisect.bisect_right(self._chunk_starts, start) - 1
+        offset = self._chunk_starts[chunk]
+        return self._chunks[chunk][start - offset:end - offset]
+
+    def __iter__(self) -> Iterator[str]:
+        chunk, offset = -1, 0
+        for start, end in zip(self.starts, self.ends):
+            while chunk + 1 < len(self._chunks) and self._chunk_starts[chunk + 1] <= start:
+                chunk += 1
+                offset = self._chunk_starts[chunk]
+            yield self._chunks[chunk][start - offset:end - offset]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SentenceStore):
+            return NotImplemented
+        return (self.text == other.text and self.starts == other.starts and self.ends == other.ends
+                and self.categories == other.categories)
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, Optional, Union
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+# Read size when copying an upload to its spool file: bounds the bytes held per upload
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """The upload is over the configured size cap"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(max_bytes)
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    """An uploaded file copied to its own temp file, with its size and SHA-256.
+
+    The file outlives the request (a background job may still need it),
+    so whoever finishes with the upload calls close() to delete it.
+    """
+
+    def __init__(self, filename: str, path: str, size_bytes: int, sha256: str, read_seconds: float):
+        self.filename = filename
+        self.path = path
+        self.size_bytes = size_bytes
+        self.sha256 = sha256
+        self.read_seconds = read_seconds
+
+    def close(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> 'SpooledUpload':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def too_large_detail(max_bytes: int, what: str = 'PDF') -> str:
+    return f"{what} is larger than the {max_bytes // (1024 * 1024)} MB upload limit"
+
+
+class UploadSizeLimit:
+    """ASGI middleware capping the request body of the upload endpoints, by path.
+
+    A Content-Length over the cap is answered with 413 before any of the
+    body is read; a body sent without one is counted as it arrives and cut
+    off with 413 once it passes the cap, so the form parser never spools
+    more than the cap.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope['path']) if scope['type'] == 'http' else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope['headers']).get(b'content-length', b'')
+        if length.isdigit() and int(length) > max_bytes:
+            await JSONResponse({'detail': too_large_detail(max_bytes, 'Request')}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail=too_large_detail(max_bytes, 'Request'))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _copy_to_spool(source: BinaryIO, max_bytes: int, directory: Optional[str], chunk_size: int) -> tuple:
+    """(path, size, SHA-256) of a new temp file holding source's bytes"""
+    digest = hashlib.sha256()
+    size = 0
+    handle, path = tempfile.mkstemp(prefix='upload-', suffix='.pdf', dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as spool:
+            source.seek(0)
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                spool.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, size, digest.hexdigest()
+
+
+async def spool_upload(file: UploadFile, max_bytes: int, directory: Optional[str] = None,
+                       chunk_size: int = CHUNK_SIZE) -> SpooledUpload:
+    """Copy an upload chunk by chunk to a temp file, hashing it on the way.
+
+    The copy runs in a thread, off the event loop. Raises UploadTooLarge
+    (and leaves nothing behind) once more than max_bytes have been read.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    start = time.perf_counter()
+    path, size, sha256 = await asyncio.to_thread(_copy_to_spool, file.file, max_bytes, directory, chunk_size)
+    return SpooledUpload(file.filename, path, size, sha256, time.perf_counter() - start)
+
+
+@contextmanager
+def mapped_file(path: str) -> Iterator[Union[mmap.mmap, io.BytesIO]]:
+    """A read-only, seekable view of a file backed by the page cache instead of a heap copy"""
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            # mmap can't map an empty file; the PDF parser reports it as invalid either way
+            yield io.BytesIO()
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
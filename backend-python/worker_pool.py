@@ -0,0 +1,115 @@
+import asyncio
+import gc
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Optional, Tuple
+
+
+def _noop() -> None:
+    """Submitted once per worker at startup so every process is spawned (and warmed) eagerly"""
+    return None
+
+
+class AnalysisPool:
+    """Process pool for the CPU-bound stages of the upload pipeline.
+
+    PDF parsing and sentence analysis hold the GIL for seconds on large
+    documents, so they run in worker processes and the event loop only
+    awaits the result. With ``max_workers=0`` the work falls back to the
+    loop's default thread executor, which keeps the loop responsive but
+    does not scale across cores.
+
+    With ``prefork=True`` the initializer runs once in the parent and the
+    workers are forked from it, so tokenizer models and keyword tables are
+    shared copy-on-write instead of being loaded again in every worker.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, initializer: Optional[Callable[[], None]] = None,
+                 prefork: bool = False):
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.prefork = prefork and 'fork' in multiprocessing.get_all_start_methods()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Spawn and warm every worker"""
+        if self._executor is not None or self.max_workers <= 0:
+            return
+        if self.prefork:
+            if self.initializer is not None:
+                self.initializer()
+            # Keep the collector from touching (and so un-sharing) the warmed objects in the children
+            gc.freeze()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('fork'))
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=self.initializer)
+        warmups = [self._executor.submit(_noop) for _ in range(self.max_workers)]
+        for future in warmups:
+            future.result()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run ``fn(*args)`` off the event loop and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _channel(self):
+        """Queue a job can report progress on from whichever executor runs it"""
+        if self._executor is None:
+            return queue.Queue()
+        # Plain multiprocessing queues can't be passed to pool jobs; managed ones can
+        if self._manager is None:
+            self._manager = multiprocessing.Manager()
+        return self._manager.Queue()
+
+    async def run_with_progress(self, fn: Callable[..., Any], *args: Any,
+                                poll_interval: float = 0.05) -> AsyncIterator[Tuple[str, Any]]:
+        """Run ``fn(*args, progress)`` off the event loop and stream what it reports.
+
+        ``progress`` is a callable the job uses to report events; each one is
+        yielded as ``('progress', event)`` as soon as it arrives, followed by
+        ``('result', value)`` when the job returns. Exceptions from the job
+        are raised after the events reported before them.
+        """
+        loop = asyncio.get_running_loop()
+        channel = self._channel()
+        job = loop.run_in_executor(self._executor, fn, *args, channel.put)
+
+        try:
+            while True:
+                try:
+                    event = await loop.run_in_executor(None, channel.get, True, poll_interval)
+                except queue.Empty:
+                    if job.done():
+                        break
+                    continue
+                yield 'progress', event
+
+            yield 'result', job.result()
+        finally:
+            if not job.done():
+                job.cancel()
+
+    def stats(self) -> dict:
+        return {
+            'mode': 'process' if self.running else 'thread',
+            'max_workers': self.max_workers,
+            'prefork': self.prefork
+        }